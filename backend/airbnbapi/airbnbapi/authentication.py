@@ -1,6 +1,14 @@
+import copy
+import threading
+import time
 from rest_framework.authentication import BaseAuthentication
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 
 User = get_user_model()
 
@@ -25,4 +33,59 @@ class AdminAuthentication(BaseAuthentication):
         if not user.is_superuser:
             raise AuthenticationFailed("You do not have admin access.")
 
-        return (user, None)
\ No newline at end of file
+        return (user, None)
+
+
+class _UserCache:
+    """Small per-process TTL cache of user rows, keyed by str(id) (token claims may hold either)."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self.entries.get(str(user_id))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        # a copy, so one request can't leak attribute changes into another
+        return copy.copy(entry[1])
+
+    def set(self, user_id, user, ttl):
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[str(user_id)] = (time.monotonic() + ttl, copy.copy(user))
+
+    def forget(self, user_id):
+        with self.lock:
+            self.entries.pop(str(user_id), None)
+
+
+user_cache = _UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that remembers the user row for AUTH_USER_CACHE_TTL
+    seconds instead of reading it on every request. Saving or deleting a user
+    drops the entry in this process (users/signals.py); other workers see the
+    change once their entry expires, so keep the TTL short.
+    """
+
+    def get_user(self, validated_token):
+        ttl = getattr(settings, "AUTH_USER_CACHE_TTL", 60)
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if ttl and user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            if ttl:
+                user_cache.set(user_id, user, ttl)
+            return user
+
+        # the same checks JWTAuthentication runs on a freshly loaded user
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
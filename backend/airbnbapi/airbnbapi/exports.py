@@ -0,0 +1,232 @@
+"""
+Streaming NDJSON / CSV exports.
+
+Each export is a flat list of (column, lookup, convert) read with
+values_list(...).iterator(chunk_size=...): on Postgres that is a server-side
+cursor, so only one chunk of plain tuples is in memory at a time and a
+million-row export costs the same memory as a hundred-row one. Rows are
+encoded and flushed in batches through a StreamingHttpResponse, so the
+client starts receiving data before the query has been fully read.
+"""
+
+import csv
+import json
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import renderers, serializers
+from .fast_serializers import as_date, as_datetime, as_money
+
+# rows encoded per chunk written to the response
+FLUSH_ROWS = 500
+
+
+def as_list(value):
+    return list(value or [])
+
+
+class Export:
+    """One exportable table: a base queryset, its date column and its columns."""
+
+    def __init__(self, name, queryset, date_field, columns):
+        self.name = name
+        self.queryset = queryset
+        self.date_field = date_field
+        self.columns = columns
+        self.headers = [column for column, _, _ in columns]
+
+    def rows(self, queryset=None, start=None, end=None, chunk_size=None):
+        """Yield each row as a list of JSON-ready values, in primary key order."""
+        queryset = self.queryset() if queryset is None else queryset
+        if start:
+            queryset = queryset.filter(**{f"{self.date_field}__date__gte": start})
+        if end:
+            queryset = queryset.filter(**{f"{self.date_field}__date__lte": end})
+        converters = [convert for _, _, convert in self.columns]
+        values = queryset.order_by("pk").values_list(*[lookup for _, lookup, _ in self.columns])
+        chunk_size = chunk_size or getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+        for row in values.iterator(chunk_size=chunk_size):
+            yield [value if convert is None else convert(value) for value, convert in zip(row, converters)]
+
+
+def _bookings():
+    from bookings.models import Booking
+    return Booking.objects.annotate(nights=F("check_out") - F("check_in"))
+
+
+def _listings():
+    from listings.models import HotelsListing
+    return HotelsListing.objects.all()
+
+
+def _payments():
+    from bookings.models import Payment
+    return Payment.objects.all()
+
+
+def _users():
+    from users.models import Users
+    return Users.objects.all()
+
+
+EXPORTS = {
+    export.name: export for export in (
+        Export("bookings", _bookings, "created_at", [
+            ("id", "id", None),
+            ("listing_id", "listing_id", None),
+            ("listing_title", "listing__title", None),
+            ("host_id", "listing__host_id_id", None),
+            ("user_id", "user_id", None),
+            ("user_email", "user__email", None),
+            ("check_in", "check_in", as_date),
+            ("check_out", "check_out", as_date),
+            ("nights", "nights", lambda value: value.days),
+            ("adult", "adult", None),
+            ("children", "children", None),
+            ("infant", "infant", None),
+            ("total_price", "total_price", as_money),
+            ("tax_amount", "tax_amount", as_money),
+            ("total_amount", "total_amount", as_money),
+            ("status", "status", None),
+            ("payment_status", "payment__status", None),
+            ("payment_method", "payment__payment_method", None),
+            ("payment_amount", "payment__amount", as_money),
+            ("created_at", "created_at", as_datetime),
+            ("updated_at", "updated_at", as_datetime),
+        ]),
+        Export("listings", _listings, "created_at", [
+            ("id", "id", None),
+            ("title", "title", None),
+            ("host_id", "host_id_id", None),
+            ("host_username", "host_id__username", None),
+            ("city", "location__city", None),
+            ("state", "location__state", None),
+            ("country", "location__country", None),
+            ("address", "address", None),
+            ("price_per_night", "price_per_night", None),
+            ("multiple_rooms", "multiple_rooms", None),
+            ("offers", "offersOrExtras", as_list),
+            ("review_count", "review_stats__review_count", None),
+            ("created_at", "created_at", as_datetime),
+            ("updated_at", "updated_at", as_datetime),
+        ]),
+        Export("payments", _payments, "created_at", [
+            ("id", "id", None),
+            ("booking_id", "booking_id", None),
+            ("listing_id", "booking__listing_id", None),
+            ("user_id", "booking__user_id", None),
+            ("amount", "amount", as_money),
+            ("status", "status", None),
+            ("payment_method", "payment_method", None),
+            ("provider_payment_id", "provider_payment_id", None),
+            ("created_at", "created_at", as_datetime),
+        ]),
+        Export("users", _users, "date_joined", [
+            ("id", "id", None),
+            ("username", "username", None),
+            ("email", "email", None),
+            ("first_name", "first_name", None),
+            ("last_name", "last_name", None),
+            ("role", "role", None),
+            ("is_active", "is_active", None),
+            ("is_staff", "is_staff", None),
+            ("is_superuser", "is_superuser", None),
+            ("date_joined", "date_joined", as_datetime),
+            ("last_login", "last_login", as_datetime),
+        ]),
+    )
+}
+
+
+class _Echo:
+    """csv.writer target that hands back each line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return "|".join(str(item) for item in value)
+    return "" if value is None else value
+
+
+def encode_ndjson(headers, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(dict(zip(headers, row))))
+        if len(batch) >= FLUSH_ROWS:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def encode_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_csv_value(value) for value in row]))
+        if len(batch) >= FLUSH_ROWS:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """Lets ?format=ndjson / Accept: application/x-ndjson pick the export format; errors render as one line."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode() + b"\n"
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """Lets ?format=csv / Accept: text/csv pick the export format; errors render as key,value lines."""
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict):
+            data = {"detail": data}
+        writer = csv.writer(_Echo())
+        return "".join(
+            writer.writerow([key, " ".join(map(str, value)) if isinstance(value, list) else value])
+            for key, value in data.items()
+        ).encode()
+
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv}
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Optional created_at (date_joined for users) range, both ends inclusive."""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("end must not be before start.")
+        return attrs
+
+
+def stream(export, fmt, queryset=None, start=None, end=None, filename=None):
+    """A StreamingHttpResponse of `export` in `fmt` ("ndjson" or "csv")."""
+    renderer = NDJSONRenderer if fmt == "ndjson" else CSVRenderer
+    response = StreamingHttpResponse(
+        ENCODERS[fmt](export.headers, export.rows(queryset, start, end)),
+        content_type=f"{renderer.media_type}; charset=utf-8",
+    )
+    filename = filename or f"{export.name}-{timezone.localdate().isoformat()}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    # keep proxies from buffering the whole export
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,124 @@
+"""
+Read-only fast path for hot list endpoints.
+
+A FastSerializer is a flat plan of (key, getter) pairs built once at import
+time. Rendering a row is one dict comprehension over already-loaded model
+instances, with none of DRF's per-field bind/get_attribute/to_representation
+work. Every plan mirrors a DRF serializer key for key and value for value,
+so the rendered JSON is byte-identical. `manage.py bench_serializers` checks
+that and measures the speed-up.
+"""
+
+import decimal
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+from . import metrics
+
+TWO_PLACES = decimal.Decimal("0.01")
+
+
+def as_int(value):
+    return None if value is None else int(value)
+
+
+def as_str(value):
+    return None if value is None else str(value)
+
+
+def as_float(value):
+    return None if value is None else float(value)
+
+
+def as_bool(value):
+    return None if value is None else bool(value)
+
+
+def as_date(value):
+    return value.isoformat() if value else None
+
+
+def as_datetime(value):
+    # same as DRF's DateTimeField with the default ISO-8601 format
+    if not value:
+        return None
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def as_money(value):
+    # DecimalField(max_digits=10, decimal_places=2) rendered as a string
+    if value is None:
+        return None
+    if not isinstance(value, decimal.Decimal):
+        value = decimal.Decimal(str(value).strip())
+    context = decimal.getcontext().copy()
+    context.prec = 10
+    return f"{value.quantize(TWO_PLACES, context=context):f}"
+
+
+def attr(name, convert=None):
+    if convert is None:
+        return lambda obj: getattr(obj, name)
+    return lambda obj: convert(getattr(obj, name))
+
+
+def nested(name, plan):
+    def get(obj):
+        value = getattr(obj, name)
+        return None if value is None else {key: field(value) for key, field in plan}
+    return get
+
+
+def nested_many(name, plan):
+    def get(obj):
+        # read prefetch_related() results directly instead of building a related manager per row
+        cache = getattr(obj, "_prefetched_objects_cache", {})
+        items = cache[name] if name in cache else getattr(obj, name).all()
+        return [{key: field(item) for key, field in plan} for item in items]
+    return get
+
+
+class FastSerializer:
+    """Serialize a list of instances with `plan`, a sequence of (key, getter(obj))."""
+    plan = ()
+
+    def __init__(self, instances):
+        self.instances = instances
+
+    @property
+    def data(self):
+        plan = self.plan
+        return [{key: field(obj) for key, field in plan} for obj in self.instances]
+
+
+class FastListMixin:
+    """
+    Use `fast_serializer_class` for plain list GETs. Requests asking for a
+    projection (`?view=`, `?fields=`, `?expand=`) keep the DRF serializer.
+    Turned off with FAST_READ_SERIALIZERS = False.
+    """
+    fast_serializer_class = None
+
+    def use_fast_serializer(self):
+        params = self.request.query_params
+        return (
+            getattr(settings, "FAST_READ_SERIALIZERS", True)
+            and self.fast_serializer_class is not None
+            and not any(params.get(name) for name in ("view", "fields", "expand"))
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_serializer():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        instances = queryset if page is None else page
+        with metrics.timing():
+            data = self.fast_serializer_class(instances).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,201 @@
+"""
+Per-request query count, DB time and serialization time.
+
+QueryMetricsMiddleware wraps every database connection for the length of a
+request (connection.execute_wrapper) and times the DRF render step. The
+"serialize" section is building the response data (`serializer.data`, see
+SerializeTimingMixin) plus rendering it to JSON; queries run while
+serializing count as db. Each response gets a Server-Timing header, e.g.
+
+    Server-Timing: db;dur=4.1;desc="3 queries", serialize;dur=1.2, app;dur=2.0, total;dur=7.3
+
+and the numbers are added up per endpoint ("GET api/listings/<int:pk>/") in
+`registry`, which /api/admin/metrics/ reports. The registry lives in the
+worker process, so each worker reports its own traffic.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Counters for one request; also the execute_wrapper that feeds them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+    def server_timing(self, total):
+        app = max(total - self.db - self.serialize, 0)
+        return ", ".join([
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f"serialize;dur={self.serialize * 1000:.1f}",
+            f"app;dur={app * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+
+@contextmanager
+def timing(section="serialize"):
+    """Add the time spent in the block (minus its queries) to the current request's `section`."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started, db_before = time.perf_counter(), metrics.db
+    try:
+        yield
+    finally:
+        spent = time.perf_counter() - started - (metrics.db - db_before)
+        setattr(metrics, section, getattr(metrics, section) + max(spent, 0))
+
+
+class TimedData:
+    """Serializer mixin: reading `.data` counts as serialize time."""
+
+    @property
+    def data(self):
+        with timing():
+            return super().data
+
+
+_timed_classes = {}
+
+
+def timed(serializer):
+    """Make `serializer.data` count as serialize time; returns the same serializer."""
+    cls = serializer.__class__
+    if not issubclass(cls, TimedData):
+        if cls not in _timed_classes:
+            _timed_classes[cls] = type(cls.__name__, (TimedData, cls), {"__module__": cls.__module__, "__qualname__": cls.__qualname__})
+        serializer.__class__ = _timed_classes[cls]
+    return serializer
+
+
+class SerializeTimingMixin:
+    """
+    For generic views: every serializer from get_serializer() is timed(), so
+    building response data counts as serialize time instead of app time.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        return timed(super().get_serializer(*args, **kwargs))
+
+
+class MetricsRegistry:
+    """Running totals per endpoint, plus the latest durations for percentiles."""
+    samples = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, metrics, total):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    "requests": 0, "queries": 0, "max_queries": 0,
+                    "db": 0.0, "serialize": 0.0, "total": 0.0,
+                    "durations": deque(maxlen=self.samples),
+                }
+            entry["requests"] += 1
+            entry["queries"] += metrics.queries
+            entry["max_queries"] = max(entry["max_queries"], metrics.queries)
+            entry["db"] += metrics.db
+            entry["serialize"] += metrics.serialize
+            entry["total"] += total
+            entry["durations"].append(total)
+
+    def snapshot(self):
+        """One row per endpoint, slowest total time first; times in milliseconds."""
+        with self._lock:
+            entries = [(endpoint, dict(entry, durations=sorted(entry["durations"]))) for endpoint, entry in self._endpoints.items()]
+        rows = []
+        for endpoint, entry in entries:
+            n, durations = entry["requests"], entry["durations"]
+            rows.append({
+                "endpoint": endpoint,
+                "requests": n,
+                "queries_avg": round(entry["queries"] / n, 2),
+                "queries_max": entry["max_queries"],
+                "db_ms_avg": round(entry["db"] * 1000 / n, 2),
+                "serialize_ms_avg": round(entry["serialize"] * 1000 / n, 2),
+                "total_ms_avg": round(entry["total"] * 1000 / n, 2),
+                "total_ms_p50": round(durations[len(durations) // 2] * 1000, 2),
+                "total_ms_p95": round(durations[min(int(len(durations) * 0.95), len(durations) - 1)] * 1000, 2),
+                "total_ms_sum": round(entry["total"] * 1000, 1),
+            })
+        rows.sort(key=lambda row: row["total_ms_sum"], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+registry = MetricsRegistry()
+
+
+def endpoint_name(request):
+    match = getattr(request, "resolver_match", None)
+    # router routes are regexes: "api/bookings/^(?P<pk>[^/.]+)/$"
+    route = match.route.replace("^", "").replace("$", "") if match else "<unmatched>"
+    return f"{request.method} {route}"
+
+
+class QueryMetricsMiddleware:
+    """Measure each request (see the module docstring). Off with REQUEST_METRICS = False."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "REQUEST_METRICS", True):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        # streamed bodies are read after this point; only the view's work is counted
+        if getattr(settings, "SERVER_TIMING_HEADER", True):
+            response["Server-Timing"] = metrics.server_timing(total)
+        registry.record(endpoint_name(request), metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Responses are rendered to JSON right after this hook returns
+        metrics = _current.get()
+        if metrics is not None:
+            started, db_before = time.perf_counter(), metrics.db
+
+            def rendered(response):
+                metrics.serialize += max(time.perf_counter() - started - (metrics.db - db_before), 0)
+
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,162 @@
+import base64
+import json
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Field, Func, Q, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class Row(Func):
+    """A row value, `(a, b, ...)`, for comparing several columns at once."""
+    function = ""
+    output_field = Field()
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a stable (sort_key, id) ordering.
+
+    Sending `?cursor=` (empty for the first page) switches a view to keyset
+    mode: each page is a `WHERE (sort_key, id) < (last_key, last_id)` range
+    read off an index, with no OFFSET and no COUNT(*). Without a cursor the
+    request falls back to `fallback_class` so existing clients keep working.
+
+    Views choose the ordering with `keyset_ordering`, e.g. ("-created_at", "-id").
+    The last entry must be the primary key so the ordering is total.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+    ordering = ("-id",)
+    fallback_class = LimitOffsetPagination
+
+    def __init__(self):
+        self.fallback = None
+
+    def wants_keyset(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_ordering(self, view):
+        ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        assert ordering[-1].lstrip("-") in ("id", "pk"), "keyset_ordering must end with the primary key"
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.wants_keyset(request):
+            if self.fallback_class is None:
+                return None
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def after(self, position):
+        """
+        Rows strictly after `position` in the ordering. When every key sorts the
+        same way this is one row comparison, `(created_at, id) < (%s, %s)`,
+        which Postgres answers as an index range. Mixed directions fall back to
+        an OR-of-ANDs, bounded by the leading key so the index still narrows it.
+        """
+        names = [field.lstrip("-") for field in self.ordering]
+        descending = [field.startswith("-") for field in self.ordering]
+        if len(names) == 1:
+            return Q(**{f"{names[0]}__{'lt' if descending[0] else 'gt'}": position[0]})
+        if len(set(descending)) == 1:
+            lookup = LessThan if descending[0] else GreaterThan
+            return lookup(Row(*map(F, names)), Row(*map(Value, position)))
+
+        condition = Q()
+        for i, name in enumerate(names):
+            ties = dict(zip(names[:i], position[:i]))
+            condition |= Q(**ties, **{f"{name}__{'lt' if descending[i] else 'gt'}": position[i]})
+        return Q(**{f"{names[0]}__{'lte' if descending[0] else 'gte'}": position[0]}) & condition
+
+    def encode_cursor(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip("-"))
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        token = base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode()
+        return token.rstrip("=")
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound("Invalid cursor")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Keyset cursor; send it empty for the first page.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results per keyset page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+        if self.fallback_class is not None:
+            parameters += self.fallback_class().get_schema_operation_parameters(view)
+        return parameters
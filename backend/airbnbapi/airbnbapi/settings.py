@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost, so its numbers cover the whole request (see airbnbapi/metrics.py)
+    "airbnbapi.metrics.QueryMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     'django.middleware.security.SecurityMiddleware',
@@ -122,6 +124,13 @@ cloudinary.config(
 
 DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
 
+# Listing photo uploads (see listings/image_storage.py); LocalImageStorage needs no network
+LISTING_IMAGE_STORAGE = os.getenv("LISTING_IMAGE_STORAGE", "listings.image_storage.CloudinaryImageStorage")
+LISTING_IMAGE_UPLOAD_WORKERS = 8
+# Resized variants (listings/image_variants.py): "background" thread pool, "inline" after commit, or "off"
+LISTING_IMAGE_VARIANTS = os.getenv("LISTING_IMAGE_VARIANTS", "background")
+LISTING_IMAGE_VARIANT_WORKERS = 2
+
 
 
 
@@ -167,11 +176,57 @@ STATIC_URL = "/static/"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+
+# Cache
+# Local memory by default: each worker keeps its own listing-cache versions, so
+# another worker's write reaches it only when its entries expire. With several
+# workers, share one cache whose incr is atomic, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+# (not the file backend: its incr is read-modify-write and loses concurrent bumps).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Seconds an anonymous listing response stays cached (writes invalidate it sooner)
+LISTING_CACHE_TIMEOUT = 300
+# /api/listings/facets/ counts are cached for every caller, so only briefly
+LISTING_FACETS_CACHE_TIMEOUT = 60
+
+# Seconds an authenticated user row is reused per process before re-reading it (0 disables)
+AUTH_USER_CACHE_TTL = 60
+
+# Render plain list GETs with the precompiled serializers in */fast_serializers.py
+FAST_READ_SERIALIZERS = True
+
+# Per-request query count / DB time / serialization time, reported at /api/admin/metrics/
+REQUEST_METRICS = True
+# ...and sent to clients as a Server-Timing header
+SERVER_TIMING_HEADER = True
+
+# Text search configuration for ?q= listing search (listings/text_search.py)
+LISTING_SEARCH_CONFIG = "english"
+
+# GST added to a stay's subtotal when it is quoted (bookings/pricing.py)
+BOOKING_TAX_RATE = os.getenv("BOOKING_TAX_RATE", "0.18")
+
+# Unpaid bookings keep their nights this long before run_booking_lifecycle cancels them
+BOOKING_PENDING_HOLD_MINUTES = int(os.getenv("BOOKING_PENDING_HOLD_MINUTES", "60"))
+
+# Shared secret the payment provider signs its event webhooks with (empty: only superusers may post events)
+PAYMENT_WEBHOOK_SECRET = os.getenv("PAYMENT_WEBHOOK_SECRET", "")
+
+# Rows fetched per server-side cursor round trip by the streaming exports (airbnbapi/exports.py)
+EXPORT_CHUNK_SIZE = 2000
+
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'airbnbapi.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         
 
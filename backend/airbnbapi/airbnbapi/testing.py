@@ -0,0 +1,86 @@
+"""Helpers shared by the apps' tests.py."""
+
+from datetime import date, timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from bookings.models import Booking, Payment
+from listings.models import HotelsListing, Location
+from users.models import Users
+
+
+class QueryBudgetMixin:
+    """
+    Query budgets for TestCases: an endpoint must run at most `budget` queries,
+    and exactly as many after more rows are added, so N+1s fail the test
+    instead of shipping.
+    """
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        return response, len(queries)
+
+    def assertQueryBudget(self, budget, request, grow, status=200):
+        """Call `request`, then `grow()` to seed more data, then `request` again."""
+        counts = []
+        for step in range(2):
+            if step:
+                grow()
+            response, count = self.count_queries(request)
+            self.assertEqual(response.status_code, status, getattr(response, "data", response))
+            counts.append(count)
+        self.assertLessEqual(max(counts), budget, f"{max(counts)} queries, budget {budget}")
+        self.assertEqual(counts[0], counts[1], f"query count grew with the data: {counts}")
+        return response
+
+
+class ListingFixtureMixin:
+    """
+    The host, guest and "Sea view" listing in Goa most tests start from, made
+    once per TestCase class by setUpTestData (and per test on a
+    TransactionTestCase, which flushes them). `listing_fields` overrides the
+    listing's columns; `book()` adds bookings.
+    """
+    listing_fields = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_fixtures()
+
+    @classmethod
+    def create_fixtures(cls):
+        cls.host = Users.objects.create_user(username="host", email="host@example.com", password="x", role="HO")
+        cls.guest = Users.objects.create_user(username="guest", email="guest@example.com", password="x")
+        cls.location = Location.objects.create(city="Goa", state="Goa", country="India", lat=15.5, lon=73.8)
+        cls.listing = HotelsListing.objects.create(**{
+            "title": "Sea view", "location": cls.location, "address": "Beach road", "price_per_night": 1000,
+            "host_id": cls.host, **cls.listing_fields,
+        })
+
+    def setUp(self):
+        if not isinstance(self, TestCase):
+            self.create_fixtures()
+        super().setUp()
+        self.client = APIClient()
+        self.next_check_in = date.today() + timedelta(days=30)
+
+    def book(self, check_in=None, nights=2, listing=None, user=None, payment=True, **fields):
+        """
+        A booking by the guest on the listing, at its nightly price, with a
+        pending card payment unless `payment` is false. Without `check_in` it
+        takes the next dates no earlier book() call has used.
+        """
+        listing = listing or self.listing
+        if check_in is None:
+            check_in = self.next_check_in
+            self.next_check_in += timedelta(days=nights + 1)
+        fields.setdefault("total_price", f"{listing.price_per_night * nights}.00")
+        booking = Booking.objects.create(
+            listing=listing, user=user or self.guest, check_in=check_in, check_out=check_in + timedelta(days=nights), **fields,
+        )
+        if payment:
+            Payment.objects.create(booking=booking, amount=booking.total_amount or booking.total_price, payment_method="card")
+        return booking
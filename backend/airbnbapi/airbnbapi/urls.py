@@ -2,7 +2,7 @@
 from django.contrib import admin
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from users.views import home
-from .views import AdminListingsViewset , AdminUserViewset , AdminListingDetailViewset , AdminUserDetailViewset , AdminBookingViewset , AdminBookingDetailViewset
+from .views import AdminListingsViewset , AdminUserViewset , AdminListingDetailViewset , AdminUserDetailViewset , AdminBookingViewset , AdminBookingDetailViewset , AdminExportView , AdminMetricsView
 from django.urls import path , include
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -50,6 +50,8 @@ urlpatterns = [
     path('api/admin/users/<int:pk>/', AdminUserDetailViewset.as_view() , name="admin_usersDetail_view"),
     path('api/admin/booking/', admin_booking_list , name="admin_users_view"),
     path('api/admin/booking/<int:pk>/', AdminBookingDetailViewset.as_view() , name="admin_usersDetail_view"),
+    path('api/admin/export/<str:kind>/', AdminExportView.as_view() , name="admin_export_view"),
+    path('api/admin/metrics/', AdminMetricsView.as_view() , name="admin_metrics_view"),
 
     # Docs API
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'), # This one Downloads the YAML file to you local device
@@ -1,22 +1,32 @@
-
+import os
 from rest_framework import generics , viewsets ,mixins
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from users.permissions import IsSuperUser , IsSuperUserOrReadOnly
 from rest_framework.authentication import BasicAuthentication
 # from .authentication import AdminAuthentication
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import CachedJWTAuthentication
 from listings.models import HotelsListing
-from listings.serializers import HotelsListingSerializer
+from listings.serializers import HotelsListingSerializer, HotelsListingDetailSerializer
+from listings.views import ListingProjectionMixin
 from users.models import Users
 from users.serializers import UserSerializer
 from bookings.models import Booking
 from bookings.serializers import BookingSerializer
+from bookings.views import ReserveOnSaveMixin
+from .pagination import KeysetPagination
+from . import exports, metrics
+from .metrics import SerializeTimingMixin
 
 
-class AdminListingsViewset(viewsets.ModelViewSet):
-    queryset = HotelsListing.objects.all()
+class AdminListingsViewset(ListingProjectionMixin, SerializeTimingMixin, viewsets.ModelViewSet):
+    queryset = HotelsListing.objects.select_related("location", "host_id", "review_stats").prefetch_related("rooms", "images")
     serializer_class = HotelsListingSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsSuperUserOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("id",)
 
     def get(self , request):
         return self.list(request)
@@ -25,10 +35,10 @@ class AdminListingsViewset(viewsets.ModelViewSet):
         return self.create(request)
 
 
-class AdminListingDetailViewset(generics.GenericAPIView , mixins.RetrieveModelMixin , mixins.UpdateModelMixin , mixins.DestroyModelMixin):
-    queryset = HotelsListing
-    serializer_class = HotelsListingSerializer
-    authentication_classes = [JWTAuthentication]
+class AdminListingDetailViewset(ListingProjectionMixin, SerializeTimingMixin, generics.GenericAPIView , mixins.RetrieveModelMixin , mixins.UpdateModelMixin , mixins.DestroyModelMixin):
+    queryset = HotelsListing.objects.all()
+    serializer_class = HotelsListingDetailSerializer
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsSuperUser]
     
     
@@ -44,11 +54,13 @@ class AdminListingDetailViewset(generics.GenericAPIView , mixins.RetrieveModelMi
     
     
 
-class AdminUserViewset(viewsets.ModelViewSet):
+class AdminUserViewset(SerializeTimingMixin, viewsets.ModelViewSet):
     queryset = Users.objects.all()
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsSuperUser]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("id",)
 
     def get(self , request):
         return self.list(request)
@@ -58,10 +70,10 @@ class AdminUserViewset(viewsets.ModelViewSet):
     
     
 
-class AdminUserDetailViewset(generics.GenericAPIView , mixins.RetrieveModelMixin , mixins.UpdateModelMixin , mixins.DestroyModelMixin):
+class AdminUserDetailViewset(SerializeTimingMixin, generics.GenericAPIView , mixins.RetrieveModelMixin , mixins.UpdateModelMixin , mixins.DestroyModelMixin):
     queryset = Users
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsSuperUser]
     
     
@@ -78,11 +90,13 @@ class AdminUserDetailViewset(generics.GenericAPIView , mixins.RetrieveModelMixin
     
 
     
-class AdminBookingViewset(viewsets.ModelViewSet):
-    queryset = Booking.objects.all()
+class AdminBookingViewset(ReserveOnSaveMixin, SerializeTimingMixin, viewsets.ModelViewSet):
+    queryset = Booking.objects.select_related("listing", "user", "listing__host_id", "payment")
     serializer_class = BookingSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsSuperUser]    
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
     
     def get(self , request):
         return self.list(request)
@@ -92,10 +106,10 @@ class AdminBookingViewset(viewsets.ModelViewSet):
     
   
 
-class AdminBookingDetailViewset(generics.GenericAPIView , mixins.RetrieveModelMixin , mixins.UpdateModelMixin , mixins.DestroyModelMixin):
+class AdminBookingDetailViewset(ReserveOnSaveMixin, SerializeTimingMixin, generics.GenericAPIView , mixins.RetrieveModelMixin , mixins.UpdateModelMixin , mixins.DestroyModelMixin):
     queryset = Booking
     serializer_class = BookingSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsSuperUser]
     
     
@@ -107,5 +121,39 @@ class AdminBookingDetailViewset(generics.GenericAPIView , mixins.RetrieveModelMi
     
     def delete(self , request , pk):
         return self.destroy(request , pk)
-    
-    
\ No newline at end of file
+
+
+
+class AdminExportView(APIView):
+    """
+    Stream a whole table (bookings, listings, payments or users) as NDJSON or
+    CSV: ?format=ndjson|csv (or the Accept header), optional ?start=&end=.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsSuperUser]
+    renderer_classes = [exports.NDJSONRenderer, exports.CSVRenderer]
+
+    def get(self, request, kind):
+        export = exports.EXPORTS.get(kind)
+        if export is None:
+            raise NotFound(f"Unknown export {kind!r}; choose from {', '.join(exports.EXPORTS)}.")
+        params = exports.ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return exports.stream(export, request.accepted_renderer.format, **params.validated_data)
+
+
+
+class AdminMetricsView(APIView):
+    """
+    Query count, DB time, serialization time and latency per endpoint, as seen
+    by this worker process since it started (or since the last DELETE).
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), "endpoints": metrics.registry.snapshot()})
+
+    def delete(self, request):
+        metrics.registry.reset()
+        return Response(status=204)
@@ -1,6 +1,32 @@
+from django import forms
 from django.contrib import admin
-from bookings.models import Booking  , Payment 
+from bookings import availability
+from bookings.models import ACTIVE_BOOKING_STATUSES, Booking  , Payment , BookedNight, NightInventory, PaymentEvent
+
+
+class BookingAdminForm(forms.ModelForm):
+    class Meta:
+        model = Booking
+        fields = "__all__"
+
+    def clean(self):
+        # the check BookingSerializer.validate runs, so taken dates are a form error, not a 500
+        cleaned = super().clean()
+        listing, check_in, check_out = (cleaned.get(field) for field in ("listing", "check_in", "check_out"))
+        active = cleaned.get("status", self.instance.status) in ACTIVE_BOOKING_STATUSES
+        if active and listing and check_in and check_out and check_in < check_out:
+            if not availability.is_available(listing, check_in, check_out, exclude=self.instance):
+                raise forms.ValidationError("Those dates are not available.")
+        return cleaned
+
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    form = BookingAdminForm
+
 
 # Register your models here.
-admin.site.register(Booking)
-admin.site.register(Payment)
\ No newline at end of file
+admin.site.register(Payment)
+admin.site.register(BookedNight)
+admin.site.register(NightInventory)
+admin.site.register(PaymentEvent)
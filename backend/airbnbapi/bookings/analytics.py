@@ -0,0 +1,179 @@
+"""
+Host analytics over ListingDailySummary.
+
+Every Booking write moves the summary rows from the booking's old
+contribution to its new one (see signals.py), so reports read at most one
+row per listing and day, however many bookings a host has.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .availability import nights_between
+from .models import Booking, BookingStatus, ListingDailySummary
+
+# Stays that count as sold nights and revenue
+SOLD_STATUSES = (BookingStatus.CONFIRMED, BookingStatus.COMPLETED)
+# Booking fields the summaries depend on
+SNAPSHOT_FIELDS = ("listing_id", "check_in", "check_out", "status", "total_price", "created_at")
+METRICS = ("room_nights", "revenue", "bookings", "cancellations")
+CENT = Decimal("0.01")
+
+
+def snapshot(booking):
+    """The fields of a Booking (instance or values() dict) that analytics reads."""
+    if booking is None:
+        return None
+    if isinstance(booking, dict):
+        return {field: booking[field] for field in SNAPSHOT_FIELDS}
+    return {field: getattr(booking, field) for field in SNAPSHOT_FIELDS}
+
+
+def contribution(snap):
+    """What one booking adds to its listing's days: {(listing_id, day): {metric: value}}."""
+    totals = defaultdict(dict)
+    if not snap or not snap["created_at"]:
+        return totals
+    listing_id = snap["listing_id"]
+
+    booked_on = totals[listing_id, timezone.localdate(snap["created_at"])]
+    booked_on["bookings"] = 1
+    if snap["status"] == BookingStatus.CANCELLED:
+        booked_on["cancellations"] = 1
+
+    nights = nights_between(snap["check_in"], snap["check_out"])
+    if snap["status"] in SOLD_STATUSES and nights:
+        # split the price evenly; the last night takes the rounding remainder
+        total = Decimal(snap["total_price"])
+        per_night = (total / len(nights)).quantize(CENT)
+        for i, night in enumerate(nights):
+            day = totals[listing_id, night]
+            day["room_nights"] = day.get("room_nights", 0) + 1
+            share = total - per_night * (len(nights) - 1) if i == len(nights) - 1 else per_night
+            day["revenue"] = day.get("revenue", 0) + share
+    return totals
+
+
+def apply_change(before=None, after=None):
+    """Move the summaries from `before` to `after`, both snapshot()s (None for create/delete)."""
+    apply_changes([(before, after)])
+
+
+def apply_changes(changes):
+    """apply_change() for many (before, after) pairs at once, e.g. after a bulk update()."""
+    totals = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for before, after in changes:
+        for sign, snap in ((-1, before), (1, after)):
+            for key, values in contribution(snap).items():
+                for metric, value in values.items():
+                    totals[key][metric] += sign * value
+    deltas = {}
+    for key, delta in totals.items():
+        delta = {metric: value for metric, value in delta.items() if value}
+        if delta:
+            deltas[key] = delta
+    if not deltas:
+        return
+
+    # one UPDATE per distinct delta: a stay's nights, and most bookings in a batch, share one
+    groups = defaultdict(lambda: defaultdict(list))
+    for (listing_id, day), delta in deltas.items():
+        groups[tuple(sorted(delta.items()))][listing_id].append(day)
+    with transaction.atomic():
+        ListingDailySummary.objects.bulk_create(
+            [ListingDailySummary(listing_id=listing_id, day=day) for listing_id, day in deltas],
+            ignore_conflicts=True,
+        )
+        for delta, days_by_listing in groups.items():
+            where = Q()
+            for listing_id, days in days_by_listing.items():
+                where |= Q(listing_id=listing_id, day__in=days)
+            ListingDailySummary.objects.filter(where).update(
+                **{metric: F(metric) + value for metric, value in delta}
+            )
+
+
+def rebuild(listing_ids=None):
+    """Recompute the summaries from the Booking table, for all listings or the given ones."""
+    bookings = Booking.objects.all()
+    summaries = ListingDailySummary.objects.all()
+    if listing_ids is not None:
+        bookings = bookings.filter(listing_id__in=listing_ids)
+        summaries = summaries.filter(listing_id__in=listing_ids)
+
+    totals = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for row in bookings.values(*SNAPSHOT_FIELDS).iterator(chunk_size=2000):
+        for key, values in contribution(snapshot(row)).items():
+            for metric, value in values.items():
+                totals[key][metric] += value
+
+    with transaction.atomic():
+        summaries.delete()
+        ListingDailySummary.objects.bulk_create(
+            [ListingDailySummary(listing_id=listing_id, day=day, **values) for (listing_id, day), values in totals.items()],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def _ratio(part, whole, places=4):
+    return round(part / whole, places) if whole else None
+
+
+def _money(value):
+    return str(Decimal(value).quantize(CENT))
+
+
+def _summarise(rows, rooms, days):
+    room_nights = sum(row.room_nights for row in rows)
+    revenue = sum((row.revenue for row in rows), Decimal("0"))
+    bookings = sum(row.bookings for row in rows)
+    cancellations = sum(row.cancellations for row in rows)
+    return {
+        "room_nights": room_nights,
+        "revenue": _money(revenue),
+        "average_daily_rate": _money(revenue / room_nights) if room_nights else None,
+        "occupancy": _ratio(room_nights, rooms * days),
+        "bookings": bookings,
+        "cancellations": cancellations,
+        "cancellation_rate": _ratio(cancellations, bookings),
+    }
+
+
+def report(listings, start, end):
+    """Analytics for `listings` over the days start..end (inclusive)."""
+    days = (end - start).days + 1
+    rows = defaultdict(list)
+    summaries = ListingDailySummary.objects.filter(listing__in=listings, day__gte=start, day__lte=end).order_by("day")
+    for row in summaries:
+        rows[row.listing_id].append(row)
+
+    result, all_rows, all_rooms = [], [], 0
+    for listing in listings:
+        rooms = max(listing.multiple_rooms, 1)
+        listing_rows = rows.get(listing.id, [])
+        by_month = defaultdict(Decimal)
+        for row in listing_rows:
+            by_month[row.day.strftime("%Y-%m")] += row.revenue
+        result.append({
+            "id": listing.id,
+            "title": listing.title,
+            "rooms": rooms,
+            **_summarise(listing_rows, rooms, days),
+            "revenue_by_month": {month: _money(value) for month, value in sorted(by_month.items())},
+            "nightly": [
+                {"date": row.day.isoformat(), "rooms_sold": row.room_nights, "occupancy": _ratio(row.room_nights, rooms)}
+                for row in listing_rows if row.room_nights
+            ],
+        })
+        all_rows += listing_rows
+        all_rooms += rooms
+
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "totals": _summarise(all_rows, all_rooms, days),
+        "listings": result,
+    }
@@ -0,0 +1,146 @@
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from django.db import OperationalError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from listings.models import HotelsListing
+from .models import ACTIVE_BOOKING_STATUSES, BookedNight, NightInventory
+
+# deadlock_detected, serialization_failure
+RETRYABLE_SQLSTATES = {"40P01", "40001"}
+
+
+# Saving any of these fields can change which nights a booking holds.
+AVAILABILITY_FIELDS = {"listing", "check_in", "check_out", "status"}
+
+
+class Unavailable(Exception):
+    """Some of the nights have no room left."""
+
+
+def nights_between(check_in, check_out):
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+
+def rooms_per_night():
+    # every listing offers at least one room a night
+    return Greatest(F("listing__multiple_rooms"), 1)
+
+
+def full_nights(check_in, check_out):
+    """Inventory rows in [check_in, check_out) with no room left."""
+    return NightInventory.objects.filter(
+        night__gte=check_in, night__lt=check_out, held__gte=rooms_per_night(),
+    )
+
+
+def is_available(listing, check_in, check_out, exclude=None):
+    full = dict(full_nights(check_in, check_out).filter(listing=listing).values_list("night", "held"))
+    if not full:
+        return True
+    if exclude is None or not exclude.pk:
+        return False
+    # a booking being moved doesn't compete with the room it already holds
+    own = set(BookedNight.objects.filter(booking=exclude, listing=listing, night__in=full).values_list("night", flat=True))
+    rooms = max(listing.multiple_rooms, 1)
+    return all(night in own and held - 1 < rooms for night, held in full.items())
+
+
+def hold(listing_id, nights):
+    """
+    Take one room on each of `nights`, or none at all: one conditional UPDATE
+    that only raises `held` where a room is left. Must run in a transaction.
+    """
+    if not nights:
+        return
+    NightInventory.objects.bulk_create(
+        [NightInventory(listing_id=listing_id, night=night) for night in nights], ignore_conflicts=True,
+    )
+    rooms = HotelsListing.objects.filter(pk=listing_id).values("multiple_rooms")
+    taken = NightInventory.objects.filter(
+        listing_id=listing_id, night__in=nights, held__lt=Greatest(Subquery(rooms), 1),
+    ).update(held=F("held") + 1)
+    if taken != len(nights):
+        raise Unavailable()
+
+
+def release(booked):
+    """Give back the rooms held by the BookedNight rows in `booked`, then delete them."""
+    same_night = booked.filter(listing_id=OuterRef("listing_id"), night=OuterRef("night"))
+    counts = same_night.order_by().values("listing_id", "night").annotate(n=Count("id")).values("n")
+    NightInventory.objects.filter(Exists(same_night)).update(held=F("held") - Subquery(counts))
+    return booked.delete()[0]
+
+
+def sync_booking(booking, created=False):
+    """
+    Make the nights held by a booking match its dates and status.
+    Pending and confirmed bookings hold their nights, every other status frees
+    them. Raises Unavailable if a newly needed night has no room left; the
+    rooms already taken are then rolled back with the enclosing transaction.
+    """
+    with transaction.atomic(savepoint=False):
+        if booking.status not in ACTIVE_BOOKING_STATUSES:
+            release(BookedNight.objects.filter(booking=booking))
+            return
+
+        wanted = set(nights_between(booking.check_in, booking.check_out))
+        held = {} if created else dict(BookedNight.objects.filter(booking=booking).values_list("night", "listing_id"))
+        stale = [night for night, listing_id in held.items() if night not in wanted or listing_id != booking.listing_id]
+        if stale:
+            release(BookedNight.objects.filter(booking=booking, night__in=stale))
+        new = sorted(night for night in wanted if night not in held or night in stale)
+        hold(booking.listing_id, new)
+        BookedNight.objects.bulk_create([
+            BookedNight(listing_id=booking.listing_id, booking=booking, night=night) for night in new
+        ])
+
+
+def release_bookings(booking_ids):
+    """Free the nights of bookings whose status was changed with a bulk update()."""
+    return release(BookedNight.objects.filter(booking_id__in=booking_ids))
+
+
+def rebuild_inventory(listing_ids=None):
+    """Recount NightInventory.held from BookedNight, for all listings or the given ones."""
+    booked = BookedNight.objects.all()
+    inventory = NightInventory.objects.all()
+    if listing_ids is not None:
+        booked = booked.filter(listing_id__in=listing_ids)
+        inventory = inventory.filter(listing_id__in=listing_ids)
+    counts = Counter(booked.values_list("listing_id", "night").iterator())
+    with transaction.atomic():
+        inventory.delete()
+        NightInventory.objects.bulk_create(
+            [NightInventory(listing_id=listing_id, night=night, held=n) for (listing_id, night), n in counts.items()],
+            batch_size=1000,
+        )
+    return len(counts)
+
+
+def _cause(exc):
+    return exc.__cause__ or exc
+
+
+def reserve(write, retries=3):
+    """
+    Run `write` (anything that creates a booking or moves its nights) in its own
+    transaction and return its result.
+
+    Taking the rooms is a conditional UPDATE on NightInventory, so of two
+    writes racing for the last room the second finds none left, its whole
+    transaction rolls back (booking row included) and Unavailable is raised
+    for the caller to answer (bookings.views.reserve makes it the API's 400).
+    Deadlocks and serialization failures are retried up to `retries` times
+    with jitter.
+    """
+    for attempt in range(retries):
+        try:
+            with transaction.atomic():
+                return write()
+        except OperationalError as exc:
+            if getattr(_cause(exc), "pgcode", None) not in RETRYABLE_SQLSTATES or attempt == retries - 1:
+                raise
+            time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
@@ -0,0 +1,87 @@
+"""
+A local stand-in for the payment provider, for tests and replay_payment_events.
+
+It makes the events a provider would send for a set of bookings (failed
+attempts, a payment, sometimes a refund) and delivers them the way providers
+do: interleaved across bookings, in bursts, with some events sent more than
+once. Each booking's own events keep their order, so the final payment
+states are known up front (expected()).
+"""
+
+import itertools
+import json
+import random
+from .models import PaymentMethod, PaymentStatus
+from .payment_events import sign
+
+
+class FakePaymentProvider:
+
+    def __init__(self, seed=None, failure_rate=0.2, refund_rate=0.05, duplicate_rate=0.3, secret=None):
+        self.random = random.Random(seed)
+        self.failure_rate = failure_rate
+        self.refund_rate = refund_rate
+        self.duplicate_rate = duplicate_rate
+        self.secret = secret
+        self.ids = itertools.count(1)
+        self.final = {}
+
+    def events_for(self, bookings):
+        """Each booking's events in order; `bookings` are (booking_id, amount) pairs."""
+        rng = self.random
+        timelines = []
+        for booking_id, amount in bookings:
+            pay_id = f"fake_pay_{next(self.ids)}"
+            method = rng.choice(PaymentMethod.values)
+            events = []
+            while rng.random() < self.failure_rate:
+                events.append(self.event(booking_id, pay_id, PaymentStatus.FAILED, amount, method))
+            events.append(self.event(booking_id, pay_id, PaymentStatus.PAID, amount, method))
+            if rng.random() < self.refund_rate:
+                events.append(self.event(booking_id, pay_id, PaymentStatus.REFUNDED, amount, method))
+            self.final[booking_id] = events[-1]["status"]
+            timelines.append(events)
+        return timelines
+
+    def event(self, booking_id, pay_id, status, amount, method):
+        return {
+            "event_id": f"evt_{next(self.ids)}",
+            "booking": booking_id,
+            "provider_payment_id": pay_id,
+            "status": status,
+            "amount": str(amount),
+            "payment_method": method,
+        }
+
+    def burst(self, timelines, batch_size=100):
+        """
+        Deliver the timelines as batches: bookings interleaved at random, and
+        duplicate_rate of the events sent again a little later.
+        """
+        rng = self.random
+        queues = [list(events) for events in timelines if events]
+        stream, redeliver = [], []
+        while queues:
+            queue = rng.choice(queues)
+            event = queue.pop(0)
+            if not queue:
+                queues.remove(queue)
+            stream.append(event)
+            if rng.random() < self.duplicate_rate:
+                redeliver.append((len(stream) + rng.randint(1, batch_size), event))
+                redeliver.sort(key=lambda item: item[0])
+            # a redelivery never arrives before its original
+            while redeliver and redeliver[0][0] <= len(stream):
+                stream.append(dict(redeliver.pop(0)[1]))
+        stream += [dict(event) for _, event in redeliver]
+        for start in range(0, len(stream), batch_size):
+            yield stream[start:start + batch_size]
+
+    def expected(self):
+        """{booking_id: payment status} once every event has been applied."""
+        return dict(self.final)
+
+    def signed(self, batch):
+        """(body, headers) for POSTing a batch to /api/bookings/payments/events/."""
+        body = json.dumps(batch).encode()
+        return body, {"Content-Type": "application/json", "X-Payment-Signature": sign(body, self.secret)}
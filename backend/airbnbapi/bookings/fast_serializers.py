@@ -0,0 +1,64 @@
+from django.core.exceptions import ObjectDoesNotExist
+from airbnbapi.fast_serializers import (
+    FastSerializer, as_datetime, as_date, as_int, as_money, as_str, attr, nested,
+)
+from listings.fast_serializers import host_of
+
+# Plans mirror the DRF serializers in bookings.serializers field for field.
+
+
+LISTING_INFO_PLAN = (
+    ("id", attr("id", as_int)),
+    ("title", attr("title", as_str)),
+    ("address", attr("address", as_str)),
+    ("price_per_night", attr("price_per_night", as_int)),
+    ("host", host_of),
+)
+
+PAYMENT_PLAN = (
+    ("id", attr("id", as_int)),
+    ("booking", attr("booking_id")),
+    ("amount", attr("amount", as_money)),
+    ("status", attr("status", as_str)),
+    ("payment_method", attr("payment_method", as_str)),
+    ("provider_payment_id", attr("provider_payment_id", as_str)),
+    ("created_at", attr("created_at", as_datetime)),
+)
+
+
+def user_of(booking):
+    user = booking.user
+    return {"id": user.id, "username": user.username, "email": user.email}
+
+
+def payment_of(booking, payment=nested("payment", PAYMENT_PLAN)):
+    try:
+        return payment(booking)
+    except ObjectDoesNotExist:
+        return None
+
+
+BOOKING_PLAN = (
+    ("id", attr("id", as_int)),
+    ("listing", attr("listing_id")),
+    ("listing_info", nested("listing", LISTING_INFO_PLAN)),
+    ("user", user_of),
+    ("check_in", attr("check_in", as_date)),
+    ("check_out", attr("check_out", as_date)),
+    ("adult", attr("adult", as_int)),
+    ("children", attr("children", as_int)),
+    ("infant", attr("infant", as_int)),
+    ("total_price", attr("total_price", as_money)),
+    ("tax_amount", attr("tax_amount", as_money)),
+    ("total_amount", attr("total_amount", as_money)),
+    ("status", attr("status", as_str)),
+    ("nights", attr("nights")),
+    ("payment", payment_of),
+    ("created_at", attr("created_at", as_datetime)),
+    ("updated_at", attr("updated_at", as_datetime)),
+)
+
+
+class FastBookingSerializer(FastSerializer):
+    """BookingSerializer, read-only."""
+    plan = BOOKING_PLAN
@@ -0,0 +1,123 @@
+"""
+Booking lifecycle: move bookings along once time has passed.
+
+    expire_pending     PENDING bookings older than the payment hold window
+                       are CANCELLED and their pending payment FAILED
+    complete_stays     CONFIRMED bookings whose check-out day has come are
+                       COMPLETED
+    prune_inventory    past NightInventory rows with nothing held are deleted
+
+Each step works through bounded batches: one locked SELECT of ids (SKIP
+LOCKED, so it never waits on a booking that a request is changing) and one
+UPDATE per batch, then frees the nights and moves the analytics summaries
+the way the Booking signals would have for a save(). Run by the
+run_booking_lifecycle command.
+"""
+
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from listings import response_cache
+from . import analytics, availability
+from .models import ACTIVE_BOOKING_STATUSES, Booking, BookingStatus, NightInventory, Payment, PaymentStatus
+
+
+def pending_hold():
+    """How long an unpaid booking keeps its nights (BOOKING_PENDING_HOLD_MINUTES)."""
+    return timedelta(minutes=getattr(settings, "BOOKING_PENDING_HOLD_MINUTES", 60))
+
+
+def apply_status(rows, status):
+    """
+    Bulk counterpart of booking.status = status; booking.save() for `rows`,
+    values() dicts of locked bookings with "id" and analytics.SNAPSHOT_FIELDS:
+    one UPDATE, then the nights and analytics the Booking signals would have moved.
+    """
+    if not rows:
+        return
+    ids = [row["id"] for row in rows]
+    Booking.objects.filter(pk__in=ids).update(status=status, updated_at=timezone.now())
+    if status not in ACTIVE_BOOKING_STATUSES:
+        availability.release_bookings(ids)
+    analytics.apply_changes(
+        (analytics.snapshot(row), dict(analytics.snapshot(row), status=status)) for row in rows
+    )
+    response_cache.bump_availability()
+
+
+def _transition(bookings, status, batch_size):
+    """
+    Set `status` on one batch of `bookings` (a queryset of candidates).
+    Returns the ids that changed; empty when nothing is left.
+    """
+    with transaction.atomic():
+        rows = list(
+            bookings.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values("id", *analytics.SNAPSHOT_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return []
+        ids = [row["id"] for row in rows]
+        apply_status(rows, status)
+        if status == BookingStatus.CANCELLED:
+            Payment.objects.filter(booking_id__in=ids, status=PaymentStatus.PENDING).update(status=PaymentStatus.FAILED)
+        return ids
+
+
+def _run(bookings, status, batch_size, max_batches):
+    changed = batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = _transition(bookings, status, batch_size)
+        if not ids:
+            break
+        changed += len(ids)
+        batches += 1
+    return changed, batches
+
+
+def expire_pending(now=None, hold=None, batch_size=1000, max_batches=None):
+    """Cancel PENDING bookings created before now - hold. Returns (bookings, batches)."""
+    now = now or timezone.now()
+    hold = pending_hold() if hold is None else hold
+    stale = Booking.objects.filter(status=BookingStatus.PENDING, created_at__lt=now - hold)
+    return _run(stale, BookingStatus.CANCELLED, batch_size, max_batches)
+
+
+def complete_stays(today=None, batch_size=1000, max_batches=None):
+    """Complete CONFIRMED bookings whose check-out is today or earlier. Returns (bookings, batches)."""
+    today = today or timezone.localdate()
+    finished = Booking.objects.filter(status=BookingStatus.CONFIRMED, check_out__lte=today)
+    return _run(finished, BookingStatus.COMPLETED, batch_size, max_batches)
+
+
+def prune_inventory(today=None, batch_size=1000, max_batches=None):
+    """Delete NightInventory rows for past nights that hold no room. Returns (rows, batches)."""
+    today = today or timezone.localdate()
+    deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(NightInventory.objects.filter(night__lt=today, held__lte=0).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += NightInventory.objects.filter(pk__in=ids, held__lte=0).delete()[0]
+        batches += 1
+    return deleted, batches
+
+
+def run(batch_size=1000, hold=None, max_batches=None):
+    """One pass of every step; returns {step: {"rows", "batches", "seconds"}}."""
+    now = timezone.now()
+    today = timezone.localdate(now)
+    steps = (
+        ("expired", lambda: expire_pending(now, hold, batch_size, max_batches)),
+        ("completed", lambda: complete_stays(today, batch_size, max_batches)),
+        ("pruned", lambda: prune_inventory(today, batch_size, max_batches)),
+    )
+    report = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        rows, batches = step()
+        report[name] = {"rows": rows, "batches": batches, "seconds": round(time.perf_counter() - started, 3)}
+    return report
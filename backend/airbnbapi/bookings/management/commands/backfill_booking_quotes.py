@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from bookings import pricing
+
+
+class Command(BaseCommand):
+    help = "Store tax_amount and total_amount on bookings made before quotes were stored."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        done = pricing.backfill(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Stored quotes for {done} bookings."))
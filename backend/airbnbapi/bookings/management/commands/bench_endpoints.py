@@ -0,0 +1,246 @@
+import json
+import platform
+import random
+import re
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from bookings.models import Booking
+from listings.models import HotelsListing, Location
+
+Users = get_user_model()
+
+QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API through its real URL routes, in process with the Django test "
+        "client or against a running server (--base-url), and print p50/p95/p99 latency "
+        "and throughput per endpoint as JSON. Run it on data from seed_scale; the same "
+        "--seed picks the same listings, users and dates, so two runs can be compared "
+        "with --compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Timed requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per endpoint first.")
+        parser.add_argument("--concurrency", type=int, default=1, help="Parallel clients (with --base-url only).")
+        parser.add_argument("--base-url", help="Benchmark a running server, e.g. http://127.0.0.1:8000.")
+        parser.add_argument("--only", nargs="+", help="Endpoint names to run (default: all).")
+        parser.add_argument("--writes", action="store_true", help="Also time POST /api/bookings/ (in process; rolled back).")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--output", help="Write the JSON report to this file as well.")
+        parser.add_argument("--compare", help="A previous --output file to print changes against.")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] > 1 and not options["base_url"]:
+            raise CommandError("--concurrency needs --base-url; the in-process client runs one request at a time.")
+        if options["writes"] and options["base_url"]:
+            raise CommandError("--writes only runs in process, where the bookings it makes are rolled back.")
+        self.random = random.Random(options["seed"])
+        self.base_url = options["base_url"]
+        endpoints = self.endpoints(options["writes"])
+        if options["only"]:
+            unknown = set(options["only"]) - {e["name"] for e in endpoints}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}.")
+            endpoints = [e for e in endpoints if e["name"] in options["only"]]
+
+        results = []
+        # the in-process client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for endpoint in endpoints:
+                results.append(self.run(endpoint, options["requests"], options["warmup"], options["concurrency"]))
+                self.stderr.write(
+                    f"{endpoint['name']:<24} p50 {results[-1]['p50_ms']:>8.2f}ms  p95 {results[-1]['p95_ms']:>8.2f}ms  "
+                    f"{results[-1]['throughput_rps']:>8.1f} req/s  {results[-1]['errors']} errors"
+                )
+
+        report = {
+            "meta": {
+                "mode": "http" if self.base_url else "client",
+                "base_url": self.base_url,
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "seed": options["seed"],
+                "python": platform.python_version(),
+                "rows": {
+                    "listings": HotelsListing.objects.count(),
+                    "bookings": Booking.objects.count(),
+                    "users": Users.objects.count(),
+                },
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "endpoints": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+        if options["compare"]:
+            self.compare(options["compare"], results)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def endpoints(self, writes):
+        """Requests to time, filled in from whatever data is in the database."""
+        rng = self.random
+        listing_ids = list(HotelsListing.objects.order_by("id").values_list("id", flat=True)[:5000])
+        booking = Booking.objects.order_by("-id").select_related("listing__host_id", "user").first()
+        admin = Users.objects.filter(is_superuser=True).order_by("id").first()
+        if not listing_ids or booking is None:
+            raise CommandError("No listings or bookings to benchmark; run seed_scale first.")
+        guest, host = booking.user, booking.listing.host_id
+        city = quote(Location.objects.filter(hotelslisting__isnull=False).order_by("id").values_list("city", flat=True).first() or "")
+        listing = lambda: rng.choice(listing_ids)  # noqa: E731
+        check_in = date.today() + timedelta(days=30)
+
+        endpoints = [
+            # anonymous listing reads are answered from the response cache
+            ("listings_anon", None, lambda: "/api/listings/"),
+            ("listings_keyset", None, lambda: "/api/listings/?cursor="),
+            ("listings_auth", guest, lambda: "/api/listings/"),
+            ("listing_detail", guest, lambda: f"/api/listings/{listing()}/"),
+            ("listing_reviews", None, lambda: f"/api/listings/{listing()}/reviews/"),
+            ("search", guest, lambda: f"/api/listings/search/?city={city}&guests=2"),
+            ("text_search", guest, lambda: "/api/listings/?q=sea+view+villa"),
+            ("amenity_filter", guest, lambda: "/api/listings/search/?amenities=wifi,pool&amenities_any=gym,kitchen"),
+            # facet counts are cached for every caller; the guest count varies the key so most requests query
+            ("facets", guest, lambda: f"/api/listings/facets/?guests={rng.randint(1, 500)}&amenities_any=wifi,pool"),
+            ("search_dates", guest, lambda: f"/api/listings/search/?city={city}&check_in={check_in}&check_out={check_in + timedelta(days=3)}"),
+            ("nearby", guest, lambda: "/api/listings/nearby/?lat=15.49&lon=73.82&radius=25"),
+            ("bookings", guest, lambda: "/api/bookings/"),
+            ("bookings_host", host, lambda: "/api/bookings/?role=host"),
+            ("booking_detail", guest, lambda: f"/api/bookings/{booking.id}/"),
+            ("host_analytics", host, lambda: "/api/bookings/analytics/"),
+            # one results page worth of listings priced at once
+            ("batch_quotes", None, lambda: f"/api/bookings/quotes/?listings={','.join(map(str, rng.sample(listing_ids, min(100, len(listing_ids)))))}"
+                                           f"&check_in={check_in}&check_out={check_in + timedelta(days=3)}&guests=2"),
+        ]
+        if admin is not None:
+            endpoints += [
+                ("admin_listings", admin, lambda: "/api/admin/listings/"),
+                ("admin_users", admin, lambda: "/api/admin/users/"),
+                ("admin_bookings", admin, lambda: "/api/admin/booking/"),
+            ]
+        endpoints = [
+            {"name": name, "method": "GET", "user": user, "path": path, "body": None}
+            for name, user, path in endpoints
+        ]
+        if writes:
+            stays = iter(range(10**6))
+            endpoints.append({
+                "name": "booking_create", "method": "POST", "user": guest,
+                "path": lambda: "/api/bookings/",
+                # a far-future night nobody else holds, one per request
+                "body": lambda: self.stay(listing(), date.today() + timedelta(days=400 + next(stays))),
+            })
+        return endpoints
+
+    def stay(self, listing_id, check_in):
+        return {"listing": listing_id, "check_in": str(check_in), "check_out": str(check_in + timedelta(days=1)), "total_price": "1"}
+
+    def headers(self, user):
+        if user is None:
+            return {}
+        return {"Authorization": f"{settings.SIMPLE_JWT['AUTH_HEADER_TYPES'][0]} {AccessToken.for_user(user)}"}
+
+    def run(self, endpoint, requests, warmup, concurrency):
+        headers = self.headers(endpoint["user"])
+        send = self.http_request if self.base_url else self.client_request
+        if not self.base_url:
+            self.client = Client(raise_request_exception=False, **{f"HTTP_{k.upper().replace('-', '_')}": v for k, v in headers.items()})
+
+        def one(_):
+            path = endpoint["path"]()
+            body = endpoint["body"]() if endpoint["body"] else None
+            started = time.perf_counter()
+            status, timing = send(endpoint["method"], path, body, headers)
+            return time.perf_counter() - started, status, timing, path
+
+        # in process, nothing the benchmark writes is kept
+        with nullcontext() if self.base_url else transaction.atomic():
+            for i in range(warmup):
+                one(i)
+            started = time.perf_counter()
+            if concurrency > 1:
+                with ThreadPoolExecutor(concurrency) as pool:
+                    samples = list(pool.map(one, range(requests)))
+            else:
+                samples = [one(i) for i in range(requests)]
+            elapsed = time.perf_counter() - started
+            if not self.base_url:
+                transaction.set_rollback(True)
+
+        latencies = sorted(sample[0] * 1000 for sample in samples)
+        queries = [int(m.group(1)) for _, _, timing, _ in samples if (m := QUERIES.search(timing or ""))]
+        return {
+            "name": endpoint["name"],
+            "method": endpoint["method"],
+            "path": samples[0][3],
+            "requests": requests,
+            "errors": sum(1 for sample in samples if sample[1] >= 400),
+            "statuses": sorted({sample[1] for sample in samples}),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "max_ms": round(latencies[-1], 3),
+            "throughput_rps": round(requests / elapsed, 1),
+            "queries_avg": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    def client_request(self, method, path, body, headers):
+        if method == "GET":
+            response = self.client.get(path)
+        else:
+            response = self.client.generic(method, path, json.dumps(body), content_type="application/json")
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response.status_code, response.get("Server-Timing")
+
+    def http_request(self, method, path, body, headers):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.base_url.rstrip("/") + path, data=data, method=method,
+            headers={**headers, **({"Content-Type": "application/json"} if data else {})},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get("Server-Timing")
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code, exc.headers.get("Server-Timing")
+
+    def compare(self, path, results):
+        with open(path) as f:
+            baseline = {row["name"]: row for row in json.load(f)["endpoints"]}
+        self.stderr.write(f"\n{'endpoint':<24}{'p50 before':>12}{'after':>10}{'p95 before':>12}{'after':>10}{'change':>9}")
+        for row in results:
+            before = baseline.get(row["name"])
+            if before is None:
+                continue
+            change = (row["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0
+            self.stderr.write(
+                f"{row['name']:<24}{before['p50_ms']:>12.2f}{row['p50_ms']:>10.2f}"
+                f"{before['p95_ms']:>12.2f}{row['p95_ms']:>10.2f}{change:>+8.0f}%"
+            )
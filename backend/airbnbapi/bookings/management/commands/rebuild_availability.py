@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bookings.availability import nights_between, rebuild_inventory
+from bookings.models import BookedNight, Booking
+
+
+class Command(BaseCommand):
+    help = "Rebuild booked nights and the per-night room inventory from pending and confirmed bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        bookings = (
+            Booking.objects.active()
+            .order_by("created_at", "id")
+            .values_list("id", "listing_id", "check_in", "check_out")
+        )
+
+        rows = []
+        with transaction.atomic():
+            BookedNight.objects.all().delete()
+            for booking_id, listing_id, check_in, check_out in bookings.iterator(chunk_size=batch_size):
+                rows.extend(
+                    BookedNight(listing_id=listing_id, booking_id=booking_id, night=night)
+                    for night in nights_between(check_in, check_out)
+                )
+                if len(rows) >= batch_size:
+                    BookedNight.objects.bulk_create(rows)
+                    rows = []
+            BookedNight.objects.bulk_create(rows)
+            nights = rebuild_inventory()
+
+        held = BookedNight.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt availability: {held} booked nights over {nights} listing-nights."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from bookings import analytics
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-listing daily booking summaries behind host analytics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("listing_ids", nargs="*", type=int, help="Only rebuild these listings.")
+
+    def handle(self, *args, **options):
+        rows = analytics.rebuild(options["listing_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily summary rows."))
@@ -0,0 +1,91 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from contextlib import nullcontext
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from bookings import payment_events
+from bookings.fake_provider import FakePaymentProvider
+from bookings.models import Booking, BookingStatus, Payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Pay pending bookings through the payment event path with a fake provider: events "
+        "are delivered in batches, interleaved and partly duplicated, and the whole burst is "
+        "replayed --replays times. Prints per-pass counts and throughput as JSON and checks "
+        "the final payment states. In process the changes are rolled back unless --commit; "
+        "--base-url posts signed batches to a running server instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bookings", type=int, default=1000, help="Pending bookings to pay.")
+        parser.add_argument("--batch-size", type=int, default=100, help="Events per delivery.")
+        parser.add_argument("--replays", type=int, default=2, help="Times the whole burst is delivered.")
+        parser.add_argument("--duplicate-rate", type=float, default=0.3)
+        parser.add_argument("--failure-rate", type=float, default=0.2)
+        parser.add_argument("--refund-rate", type=float, default=0.05)
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--base-url", help="POST to a running server, e.g. http://127.0.0.1:8000.")
+        parser.add_argument("--commit", action="store_true", help="Keep the in-process changes.")
+
+    def handle(self, *args, **options):
+        if options["base_url"] and not settings.PAYMENT_WEBHOOK_SECRET:
+            raise CommandError("--base-url signs its requests with PAYMENT_WEBHOOK_SECRET; set it first.")
+        bookings = list(
+            Booking.objects.filter(status=BookingStatus.PENDING).order_by("id")
+            .values_list("id", "total_price")[:options["bookings"]]
+        )
+        if not bookings:
+            raise CommandError("No pending bookings to pay; run seed_scale first.")
+
+        provider = FakePaymentProvider(
+            options["seed"], options["failure_rate"], options["refund_rate"], options["duplicate_rate"],
+        )
+        self.provider = provider
+        timelines = provider.events_for(bookings)
+        batches = list(provider.burst(timelines, options["batch_size"]))
+        deliver = self.post if options["base_url"] else payment_events.ingest
+        self.base_url = options["base_url"]
+
+        passes = []
+        with nullcontext() if options["base_url"] or options["commit"] else transaction.atomic():
+            for replay in range(options["replays"]):
+                counts, started = Counter(), time.perf_counter()
+                for batch in batches:
+                    counts.update(result["result"] for result in deliver(batch))
+                elapsed = time.perf_counter() - started
+                events = sum(counts.values())
+                passes.append({
+                    "pass": replay + 1, "events": events, "batches": len(batches), **counts,
+                    "seconds": round(elapsed, 3), "events_per_second": round(events / elapsed, 1),
+                })
+                self.stderr.write(f"pass {replay + 1}: {dict(counts)} in {elapsed:.2f}s")
+
+            actual = dict(Payment.objects.filter(booking_id__in=provider.expected()).values_list("booking_id", "status"))
+            mismatched = sum(1 for booking_id, status in provider.expected().items() if actual.get(booking_id) != status)
+            if not (options["base_url"] or options["commit"]):
+                transaction.set_rollback(True)
+
+        self.stdout.write(json.dumps({
+            "bookings": len(bookings),
+            "events": sum(len(events) for events in timelines),
+            "passes": passes,
+            "mismatched_payments": mismatched,
+        }, indent=2))
+        if mismatched:
+            raise CommandError(f"{mismatched} payments did not end in the expected state.")
+
+    def post(self, batch):
+        body, headers = self.provider.signed(batch)
+        request = urllib.request.Request(
+            self.base_url.rstrip("/") + "/api/bookings/payments/events/", data=body, method="POST", headers=headers,
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return json.load(response)["results"]
+        except urllib.error.HTTPError as exc:
+            raise CommandError(f"{exc.code} from the server: {exc.read()[:200]!r}")
@@ -0,0 +1,42 @@
+import json
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from bookings import lifecycle
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire unpaid PENDING bookings older than the hold window, complete stays whose "
+        "check-out has passed and prune empty past inventory rows, in batches. Runs once, "
+        "or every --every seconds as a long-lived worker (cron or a process manager)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--hold-minutes", type=int, help="Default: BOOKING_PENDING_HOLD_MINUTES.")
+        parser.add_argument("--max-batches", type=int, help="Stop each step after this many batches.")
+        parser.add_argument("--every", type=float, help="Repeat every N seconds instead of running once.")
+        parser.add_argument("--json", action="store_true", help="Print each pass as one JSON line.")
+
+    def handle(self, *args, **options):
+        hold = timedelta(minutes=options["hold_minutes"]) if options["hold_minutes"] is not None else None
+        while True:
+            started = time.perf_counter()
+            report = lifecycle.run(options["batch_size"], hold, options["max_batches"])
+            self.write(report, time.perf_counter() - started, options["json"])
+            if not options["every"]:
+                return
+            # don't hold a connection open while sleeping
+            close_old_connections()
+            time.sleep(options["every"])
+
+    def write(self, report, elapsed, as_json):
+        if as_json:
+            self.stdout.write(json.dumps({**report, "seconds": round(elapsed, 3)}))
+            return
+        self.stdout.write(
+            ", ".join(f"{step} {r['rows']} ({r['batches']} batches, {r['seconds']:.2f}s)" for step, r in report.items())
+            + f" in {elapsed:.2f}s"
+        )
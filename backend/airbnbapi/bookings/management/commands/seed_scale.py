@@ -0,0 +1,289 @@
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, time as day_time, timedelta
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from bookings import analytics, availability, pricing
+from bookings.models import ACTIVE_BOOKING_STATUSES, BookedNight, Booking, BookingStatus, Payment, PaymentMethod, PaymentStatus
+from listings import response_cache, review_stats, text_search
+from listings.geo import cell_for
+from listings.models import HotelImages, HotelsListing, Location, Review, RoomList
+
+Users = get_user_model()
+
+# rows per table at --scale 1; --scale 100 gives about a million bookings
+BASE = {
+    "hosts": 100,
+    "guests": 2000,
+    "locations": 150,
+    "listings": 1000,
+    "bookings": 10000,
+}
+CITIES = [
+    ("Goa", "Goa", "India", 15.49, 73.82), ("Mumbai", "Maharashtra", "India", 19.07, 72.88),
+    ("Jaipur", "Rajasthan", "India", 26.91, 75.79), ("Manali", "Himachal Pradesh", "India", 32.24, 77.19),
+    ("Lisbon", "Lisboa", "Portugal", 38.72, -9.14), ("Barcelona", "Catalonia", "Spain", 41.39, 2.17),
+    ("Paris", "Ile-de-France", "France", 48.86, 2.35), ("Bali", "Bali", "Indonesia", -8.41, 115.19),
+    ("Kyoto", "Kyoto", "Japan", 35.01, 135.77), ("Cape Town", "Western Cape", "South Africa", -33.92, 18.42),
+    ("New York", "New York", "USA", 40.71, -74.01), ("Mexico City", "CDMX", "Mexico", 19.43, -99.13),
+]
+OFFERS = ["wifi", "pool", "parking", "kitchen", "air conditioning", "breakfast", "gym", "pets allowed", "washer", "sea view"]
+TITLES = ["Cozy", "Sunny", "Quiet", "Modern", "Rustic", "Spacious", "Charming", "Bright"]
+KINDS = ["studio", "loft", "villa", "cottage", "apartment", "guest house", "hotel", "cabin"]
+# length of stay in nights, and how common each is
+STAY_NIGHTS = (1, 2, 3, 4, 5, 7, 10, 14)
+STAY_WEIGHTS = (10, 20, 20, 15, 12, 10, 8, 5)
+MEAN_NIGHTS = sum(n * w for n, w in zip(STAY_NIGHTS, STAY_WEIGHTS)) / sum(STAY_WEIGHTS)
+PAYMENT_STATUS = {
+    BookingStatus.PENDING: PaymentStatus.PENDING,
+    BookingStatus.CONFIRMED: PaymentStatus.PAID,
+    BookingStatus.COMPLETED: PaymentStatus.PAID,
+    BookingStatus.CANCELLED: PaymentStatus.REFUNDED,
+}
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the created_at values we set instead of stamping now()."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+def batched(items, size):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed realistic data in bulk for load tests: hosts, guests, locations, listings "
+        "with rooms and images, reviews, bookings and payments. Volumes scale with --scale "
+        "(1 = 1,000 listings and 10,000 bookings; 100 = about a million bookings) and the "
+        "same --seed always produces the same data. Availability, review and analytics "
+        "tables are rebuilt for the seeded listings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1.0)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--tag", default="seed", help="Prefix for seeded usernames, so several runs can coexist.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--reviews-per-listing", type=int, default=6, help="Average; the actual count is random.")
+        parser.add_argument("--images-per-listing", type=int, default=3)
+        for name in BASE:
+            parser.add_argument(f"--{name}", type=int, help=f"Override the scaled number of {name}.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.tag = options["tag"]
+        counts = {name: options[name] or max(1, round(base * options["scale"])) for name, base in BASE.items()}
+        if Users.objects.filter(username__startswith=f"{self.tag}-").exists():
+            raise CommandError(f"Users tagged '{self.tag}' already exist; pass another --tag.")
+        self.stdout.write("Seeding " + ", ".join(f"{n} {name}" for name, n in counts.items()))
+
+        started = time.perf_counter()
+        self.today = timezone.localdate()
+        self.timed("users", lambda: self.seed_users(counts["hosts"], counts["guests"]))
+        self.timed("locations", lambda: self.seed_locations(counts["locations"]))
+        self.timed("listings", lambda: self.seed_listings(counts["listings"], options["images_per_listing"]))
+        self.timed("reviews", lambda: self.seed_reviews(options["reviews_per_listing"]))
+        self.timed("bookings", lambda: self.seed_bookings(counts["bookings"]))
+        self.timed("derived tables", self.rebuild)
+        response_cache.bump_all()
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s."))
+
+    def timed(self, label, step):
+        started = time.perf_counter()
+        rows = step()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"  {label:<15} {rows:>9} rows  {elapsed:7.1f}s  {rows / max(elapsed, 1e-9):9.0f} rows/s")
+
+    def bulk(self, model, objects, **kwargs):
+        created = []
+        for batch in batched(objects, self.batch_size):
+            created += model.objects.bulk_create(batch, batch_size=self.batch_size, **kwargs)
+        return created
+
+    def seed_users(self, hosts, guests):
+        # hashing once keeps this fast; every seeded account logs in with "seed-password"
+        password = make_password("seed-password")
+        joined = timezone.now() - timedelta(days=3 * 365)
+        date_joined = Users._meta.get_field("date_joined")
+
+        def users(prefix, n, role):
+            for i in range(n):
+                username = f"{self.tag}-{prefix}{i}"
+                yield Users(
+                    username=username, email=f"{username}@example.com", password=password, role=role,
+                    is_staff=role == Users.Role.Host,
+                    date_joined=joined + timedelta(minutes=self.random.randrange(3 * 365 * 24 * 60)),
+                )
+
+        with explicit_timestamps(date_joined):
+            self.host_ids = [u.id for u in self.bulk(Users, users("host", hosts, Users.Role.Host))]
+            self.guest_ids = [u.id for u in self.bulk(Users, users("guest", guests, Users.Role.Guest))]
+        return hosts + guests
+
+    def seed_locations(self, n):
+        def locations():
+            for _ in range(n):
+                city, state, country, lat, lon = self.random.choice(CITIES)
+                lat = round(lat + self.random.uniform(-0.2, 0.2), 5)
+                lon = round(lon + self.random.uniform(-0.2, 0.2), 5)
+                yield Location(city=city, state=state, country=country, lat=lat, lon=lon, geo_cell=cell_for(lat, lon))
+
+        self.location_ids = [location.id for location in self.bulk(Location, locations())]
+        return n
+
+    def seed_listings(self, n, images_per_listing):
+        rng = self.random
+        self.listings = []  # (id, rooms per night, price per night)
+        rows = 0
+        for batch in batched(range(n), self.batch_size):
+            listings, rooms = [], []
+            for _ in batch:
+                hotel = rng.random() < 0.1
+                listings.append(HotelsListing(
+                    title=f"{rng.choice(TITLES)} {rng.choice(KINDS)}",
+                    description="Seeded listing.",
+                    multiple_rooms=rng.randint(2, 20) if hotel else 1,
+                    location_id=rng.choice(self.location_ids),
+                    address=f"{rng.randint(1, 999)} Seed street",
+                    price_per_night=rng.randrange(500, 15000, 50),
+                    host_id_id=rng.choice(self.host_ids),
+                    offersOrExtras=rng.sample(OFFERS, rng.randint(0, 5)),
+                ))
+                rooms.append([
+                    RoomList(bedroom=bedrooms, bathroom=rng.randint(1, bedrooms), beds=bedrooms + rng.randint(0, 2), guest=bedrooms * 2)
+                    for bedrooms in [rng.randint(1, 4) for _ in range(rng.randint(1, 3))]
+                ])
+            with transaction.atomic():
+                HotelsListing.objects.bulk_create(listings)
+                RoomList.objects.bulk_create([room for listing_rooms in rooms for room in listing_rooms])
+                HotelsListing.rooms.through.objects.bulk_create([
+                    HotelsListing.rooms.through(hotelslisting_id=listing.id, roomlist_id=room.id)
+                    for listing, listing_rooms in zip(listings, rooms) for room in listing_rooms
+                ])
+                HotelImages.objects.bulk_create([
+                    HotelImages(hotel_id=listing.id, image=f"seed/listing_{listing.id}_{k}")
+                    for listing in listings for k in range(images_per_listing)
+                ])
+            self.listings += [(listing.id, max(listing.multiple_rooms, 1), listing.price_per_night) for listing in listings]
+            rows += len(listings) * (1 + images_per_listing) + 2 * sum(map(len, rooms))
+        return rows
+
+    def seed_reviews(self, per_listing):
+        rng = self.random
+        today = timezone.now()
+        created_at = Review._meta.get_field("created_at")
+
+        def reviews():
+            for listing_id, _, _ in self.listings:
+                for user_id in rng.sample(self.guest_ids, min(len(self.guest_ids), rng.randint(0, 2 * per_listing))):
+                    yield Review(
+                        hotel_id=listing_id, user_id=user_id, rating=rng.choices(range(1, 6), weights=(1, 1, 3, 6, 6))[0],
+                        cleanliness=rng.randint(1, 5), location=rng.randint(1, 5), service=rng.randint(1, 5),
+                        comment="Seeded review.", created_at=today - timedelta(days=rng.randrange(2 * 365)),
+                    )
+
+        with explicit_timestamps(created_at):
+            return len(self.bulk(Review, reviews()))
+
+    def stays(self, total):
+        """
+        Yield (listing_id, price, check_in, check_out) for about `total` stays,
+        spread over the last two years and the next one. Each room of a listing
+        gets its own run of back-to-back stays, so no night is ever oversold.
+        """
+        rng = self.random
+        start, span = self.today - timedelta(days=730), 1095
+        per_listing = Counter(rng.choices(range(len(self.listings)), k=total))
+        for index, (listing_id, rooms, price) in enumerate(self.listings):
+            count = per_listing.get(index, 0)
+            for room in range(rooms):
+                n = count // rooms + (room < count % rooms)
+                if not n:
+                    continue
+                # average free days between stays so that n stays fill the window
+                gap = max(span / (n + 1) - MEAN_NIGHTS, 0)
+                day = start + timedelta(days=rng.randint(0, int(gap)))
+                for _ in range(n):
+                    nights = rng.choices(STAY_NIGHTS, weights=STAY_WEIGHTS)[0]
+                    check_in, check_out = day, day + timedelta(days=nights)
+                    if check_out > start + timedelta(days=span):
+                        break
+                    yield listing_id, price, check_in, check_out
+                    day = check_out + timedelta(days=rng.randint(0, int(2 * gap)))
+
+    def status_for(self, check_in, check_out):
+        rng = self.random.random()
+        if check_out <= self.today:
+            return BookingStatus.COMPLETED if rng < 0.88 else BookingStatus.CANCELLED
+        if check_in <= self.today:
+            return BookingStatus.CONFIRMED
+        return BookingStatus.CONFIRMED if rng < 0.6 else BookingStatus.PENDING if rng < 0.85 else BookingStatus.CANCELLED
+
+    def seed_bookings(self, total):
+        rng = self.random
+        now = timezone.now()
+        timestamps = (Booking._meta.get_field("created_at"), Payment._meta.get_field("created_at"))
+        rows = 0
+        with explicit_timestamps(*timestamps):
+            for batch in batched(self.stays(total), self.batch_size):
+                bookings = []
+                for listing_id, price, check_in, check_out in batch:
+                    status = self.status_for(check_in, check_out)
+                    if status == BookingStatus.PENDING:
+                        # unpaid holds are recent; older ones would have expired
+                        created_at = now - timedelta(minutes=rng.randrange(48 * 60))
+                    else:
+                        booked = timezone.make_aware(datetime.combine(check_in, day_time(12))) - timedelta(days=rng.randint(1, 90))
+                        created_at = min(booked, now - timedelta(minutes=rng.randrange(1, 60)))
+                    bookings.append(Booking(
+                        listing_id=listing_id, user_id=rng.choice(self.guest_ids),
+                        check_in=check_in, check_out=check_out,
+                        adult=rng.randint(1, 4), children=rng.choice((0, 0, 0, 1, 2)), infant=rng.choice((0, 0, 0, 0, 1)),
+                        status=status, created_at=created_at,
+                        **pricing.quote(price, check_in, check_out).booking_fields(),
+                    ))
+                with transaction.atomic():
+                    Booking.objects.bulk_create(bookings)
+                    Payment.objects.bulk_create([
+                        Payment(
+                            booking_id=booking.id, amount=booking.total_amount, status=PAYMENT_STATUS[booking.status],
+                            payment_method=rng.choice(PaymentMethod.values), created_at=booking.created_at,
+                            provider_payment_id=None if booking.status == BookingStatus.PENDING else f"seed_{booking.id}",
+                        )
+                        for booking in bookings
+                    ])
+                    booked_nights = BookedNight.objects.bulk_create([
+                        BookedNight(listing_id=booking.listing_id, booking_id=booking.id, night=night)
+                        for booking in bookings if booking.status in ACTIVE_BOOKING_STATUSES
+                        for night in availability.nights_between(booking.check_in, booking.check_out)
+                    ], batch_size=self.batch_size)
+                rows += 2 * len(bookings) + len(booked_nights)
+        return rows
+
+    def rebuild(self):
+        rows = 0
+        listing_ids = [listing_id for listing_id, _, _ in self.listings]
+        for ids in batched(listing_ids, 1000):
+            rows += availability.rebuild_inventory(ids)
+            rows += analytics.rebuild(ids)
+            review_stats.rebuild(ids)
+            rows += text_search.update(ids)
+        return rows
@@ -1,6 +1,6 @@
 from decimal import Decimal
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from listings.models import HotelsListing
 # Create your models here.
 
@@ -11,6 +11,20 @@ class BookingStatus(models.TextChoices):
     COMPLETED = "completed", "Completed"
 
 
+# Bookings in these states hold their dates; cancelled and completed ones don't.
+ACTIVE_BOOKING_STATUSES = (BookingStatus.PENDING, BookingStatus.CONFIRMED)
+
+
+class BookingQuerySet(models.QuerySet):
+
+    def active(self):
+        return self.filter(status__in=ACTIVE_BOOKING_STATUSES)
+
+    def overlapping(self, check_in, check_out):
+        # Half-open ranges: a check_out on someone's check_in day is not a clash.
+        return self.filter(check_in__lt=check_out, check_out__gt=check_in)
+
+
 class Booking(models.Model):
     listing = models.ForeignKey(HotelsListing, on_delete=models.CASCADE,related_name="bookings",)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,related_name="bookings",)
@@ -22,8 +36,12 @@ class Booking(models.Model):
     children = models.PositiveIntegerField(default=0)
     infant = models.PositiveIntegerField(default=0)
 
-    # Calculated server-side (nights × listing.price_per_night)
+    # The quote the booking was made at (bookings/pricing.py): total_price is
+    # nights × listing.price_per_night, total_amount adds tax_amount and is what is paid.
+    # Bookings from before quotes were stored have no tax/total until backfill_booking_quotes runs.
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    tax_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
 
     status = models.CharField(
@@ -31,11 +49,16 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BookingQuerySet.as_manager()
+
 
     class Meta:
         indexes = [
         models.Index(fields=["listing", "check_in", "check_out"]),
         models.Index(fields=["user", "status"]),
+        # keyset pagination over (-created_at, -id)
+        models.Index(fields=["user", "-created_at", "-id"]),
+        models.Index(fields=["-created_at", "-id"]),
         ]
         ordering = ["-created_at"]
 
@@ -43,11 +66,84 @@ class Booking(models.Model):
     def __str__(self):
         return f"Booking #{self.pk} for {self.listing.title} by {self.user}"
 
+    def save(self, *args, **kwargs):
+        # one transaction with the post_save that takes the nights, so a booking
+        # whose nights are gone (availability.Unavailable) is never left behind;
+        # no savepoint, as in Model.save_base: a caller's transaction rolls back whole
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
 
     @property
     def nights(self) -> int:
         return (self.check_out - self.check_in).days
+
+
+class BookedNight(models.Model):
+    """
+    One row per night held by an active booking: which booking holds which
+    nights, so they can be given back to NightInventory on cancel or change.
+    """
+    listing = models.ForeignKey(HotelsListing, on_delete=models.CASCADE, related_name="booked_nights")
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name="booked_nights")
+    night = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["booking", "night"], name="unique_booking_night"),
+        ]
+        indexes = [
+            models.Index(fields=["listing", "night"]),
+        ]
+
+    def __str__(self):
+        return f"{self.night} held by Booking #{self.booking_id}"
+
+
+class NightInventory(models.Model):
+    """
+    Rooms held per listing and night. A listing offers `multiple_rooms` rooms
+    a night; a booking takes one by raising `held` with a conditional UPDATE
+    (see bookings.availability), and a night is full once held reaches it.
+    Rows are created on first use, so a missing row means nothing is held.
+    """
+    listing = models.ForeignKey(HotelsListing, on_delete=models.CASCADE, related_name="night_inventory")
+    night = models.DateField()
+    held = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "night"], name="unique_inventory_night"),
+        ]
+
+    def __str__(self):
+        return f"{self.held} rooms held at listing {self.listing_id} on {self.night}"
     
+class ListingDailySummary(models.Model):
+    """
+    Per listing and day booking totals for host analytics, kept in step with
+    Booking writes by bookings.analytics (rebuild with rebuild_host_analytics).
+
+    room_nights / revenue count confirmed and completed stays on the night
+    they are spent; bookings / cancellations count bookings on the day they
+    were made, so cancellations / bookings is that day's cancellation rate.
+    """
+    listing = models.ForeignKey(HotelsListing, on_delete=models.CASCADE, related_name="daily_summaries")
+    day = models.DateField()
+    room_nights = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0"))
+    bookings = models.IntegerField(default=0)
+    cancellations = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "day"], name="unique_listing_day_summary"),
+        ]
+
+    def __str__(self):
+        return f"Listing {self.listing_id} on {self.day}"
+
+
 class PaymentStatus(models.TextChoices):
     PENDING = "pending", "Pending"
     PAID = "paid", "Paid"
@@ -71,8 +167,43 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        constraints = [
+            # one Payment per provider payment, so provider events can be matched by its id
+            models.UniqueConstraint(
+                fields=["provider_payment_id"],
+                condition=models.Q(provider_payment_id__isnull=False) & ~models.Q(provider_payment_id=""),
+                name="unique_provider_payment_id",
+            ),
+        ]
 
 
     def __str__(self):
         return f"Payment {self.status} {self.amount} for Booking {self.booking_id}"
+
+
+class PaymentEventResult(models.TextChoices):
+    APPLIED = "applied", "Applied"
+    # valid, but did not change the payment (e.g. "failed" after "paid")
+    IGNORED = "ignored", "Ignored"
+
+
+class PaymentEvent(models.Model):
+    """
+    A payment provider event, stored once. event_id is the provider's event id
+    (or the client's Idempotency-Key); a redelivered event finds its row and is
+    skipped. See bookings/payment_events.py.
+    """
+    event_id = models.CharField(max_length=100, unique=True)
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name="events")
+    status = models.CharField(max_length=10, choices=PaymentStatus.choices)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    provider_payment_id = models.CharField(max_length=100, blank=True, default="")
+    result = models.CharField(max_length=10, choices=PaymentEventResult.choices)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-received_at"]
+
+    def __str__(self):
+        return f"PaymentEvent {self.event_id} {self.status} ({self.result})"
     
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+Payment provider events: paid, failed and refunded, one at a time or in batches.
+
+Every event has an event_id (the provider's, or the client's Idempotency-Key)
+that is stored in PaymentEvent under a unique index, so a redelivered or
+retried event is answered "duplicate" and changes nothing. A batch is
+applied in one transaction:
+
+    1. lock the bookings and payments it touches, in id order, so two
+       deliveries of the same events queue up instead of both applying
+    2. drop the event ids already stored
+    3. replay the rest in order on the locked payments, in memory
+    4. write back with one bulk UPDATE of payments, one UPDATE per booking
+       status (lifecycle.apply_status) and one INSERT of the events
+
+Payment moves:  pending/failed -> paid or failed,  paid -> refunded.
+Booking moves:  paid confirms a pending booking, refunded cancels a pending
+or confirmed one and frees its nights; failed leaves the booking pending so
+the guest can retry until run_booking_lifecycle expires it.
+"""
+
+import hashlib
+import hmac
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+from . import analytics, lifecycle
+from .models import Booking, BookingStatus, Payment, PaymentEvent, PaymentEventResult, PaymentMethod, PaymentStatus
+
+DUPLICATE = "duplicate"
+REJECTED = "rejected"
+
+PAYMENT_MOVES = {
+    PaymentStatus.PENDING: {PaymentStatus.PAID, PaymentStatus.FAILED},
+    PaymentStatus.FAILED: {PaymentStatus.PAID, PaymentStatus.FAILED},
+    PaymentStatus.PAID: {PaymentStatus.REFUNDED},
+    PaymentStatus.REFUNDED: set(),
+}
+BOOKING_MOVES = {
+    PaymentStatus.PAID: ({BookingStatus.PENDING}, BookingStatus.CONFIRMED),
+    PaymentStatus.REFUNDED: ({BookingStatus.PENDING, BookingStatus.CONFIRMED}, BookingStatus.CANCELLED),
+}
+
+
+def sign(body, secret=None):
+    """Hex HMAC-SHA256 of a request body, as sent in X-Payment-Signature."""
+    secret = settings.PAYMENT_WEBHOOK_SECRET if secret is None else secret
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def signature_matches(body, signature):
+    secret = getattr(settings, "PAYMENT_WEBHOOK_SECRET", "")
+    return bool(secret and signature) and hmac.compare_digest(sign(body, secret), signature)
+
+
+class PaymentEventSerializer(serializers.Serializer):
+    """One provider event; the booking is named directly or by its provider_payment_id."""
+    event_id = serializers.CharField(max_length=100, required=False)
+    booking = serializers.IntegerField(required=False)
+    provider_payment_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    status = serializers.ChoiceField(choices=[PaymentStatus.PAID, PaymentStatus.FAILED, PaymentStatus.REFUNDED])
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+    payment_method = serializers.ChoiceField(choices=PaymentMethod.choices, required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("provider_payment_id", "")
+        if "booking" not in attrs and not attrs["provider_payment_id"]:
+            raise serializers.ValidationError("Give booking or provider_payment_id.")
+        if "event_id" not in attrs:
+            # without an event id, the same outcome for the same payment counts as a retry
+            source = attrs["provider_payment_id"] or f"booking-{attrs['booking']}"
+            attrs["event_id"] = f"{source}:{attrs['status']}"
+        return attrs
+
+
+def validate_events(data):
+    """
+    Validate each event on its own, so one bad event does not sink a batch.
+    Returns (events, results): valid event dicts with their position, and the
+    results list with the rejected positions already filled in.
+    """
+    events, results = [], [None] * len(data)
+    for position, item in enumerate(data):
+        serializer = PaymentEventSerializer(data=item)
+        if serializer.is_valid():
+            events.append(dict(serializer.validated_data, position=position))
+        else:
+            event_id = item.get("event_id") if isinstance(item, dict) else None
+            results[position] = {"event_id": event_id, "result": REJECTED, "errors": serializer.errors}
+    return events, results
+
+
+def _result(event, result, payment=None, detail=None):
+    row = {"event_id": event["event_id"], "result": str(result)}
+    if payment is not None:
+        row.update(booking=payment.booking_id, payment_status=payment.status)
+    if detail:
+        row["detail"] = detail
+    return row
+
+
+def ingest(data):
+    """
+    Apply a list of raw event dicts (see the module docstring). Returns one
+    result per event, in order: {"event_id", "result", ...} where result is
+    applied, ignored, duplicate or rejected.
+    """
+    events, results = validate_events(data)
+
+    # a repeat inside the batch is a duplicate of its first copy
+    first = {}
+    for event in events:
+        if event["event_id"] in first:
+            results[event["position"]] = _result(event, DUPLICATE)
+        else:
+            first[event["event_id"]] = event
+    events = list(first.values())
+    if not events:
+        return results
+
+    with transaction.atomic():
+        by_provider_id = dict(
+            Payment.objects.filter(provider_payment_id__in={e["provider_payment_id"] for e in events if e["provider_payment_id"]})
+            .values_list("provider_payment_id", "booking_id")
+        )
+        for event in events:
+            owner = by_provider_id.get(event["provider_payment_id"])
+            if "booking" not in event:
+                event["booking"] = owner
+            elif owner is not None and owner != event["booking"]:
+                # the provider id already belongs to another booking's payment
+                event["booking"] = None
+
+        booking_ids = {event["booking"] for event in events if event["booking"] is not None}
+        bookings = {
+            row["id"]: row for row in
+            Booking.objects.select_for_update().filter(pk__in=booking_ids).order_by("id")
+            .values("id", "total_amount", *analytics.SNAPSHOT_FIELDS)
+        }
+        payments = {
+            payment.booking_id: payment for payment in
+            Payment.objects.select_for_update().filter(booking_id__in=bookings).order_by("id")
+        }
+        # every booking gets its payment on creation; cover any made before that
+        missing = [
+            Payment(booking_id=booking_id, amount=row["total_amount"] or row["total_price"], status=PaymentStatus.PENDING, payment_method=PaymentMethod.CARD)
+            for booking_id, row in bookings.items() if booking_id not in payments
+        ]
+        for payment in Payment.objects.bulk_create(missing):
+            payments[payment.booking_id] = payment
+
+        # read after the locks, so a concurrent delivery of these events has committed
+        seen = set(PaymentEvent.objects.filter(event_id__in=first).order_by().values_list("event_id", flat=True))
+
+        booking_status = {booking_id: row["status"] for booking_id, row in bookings.items()}
+        changed_payments, new_events = {}, []
+        for event in events:
+            payment = payments.get(event["booking"])
+            if payment is None:
+                results[event["position"]] = _result(event, REJECTED, detail="No booking matches this event.")
+                continue
+            if event["event_id"] in seen:
+                results[event["position"]] = _result(event, DUPLICATE, payment)
+                continue
+
+            detail = None
+            if event["status"] in PAYMENT_MOVES[payment.status]:
+                result = PaymentEventResult.APPLIED
+                payment.status = event["status"]
+                if event.get("amount") is not None:
+                    payment.amount = event["amount"]
+                if event.get("payment_method"):
+                    payment.payment_method = event["payment_method"]
+                if event["provider_payment_id"]:
+                    payment.provider_payment_id = event["provider_payment_id"]
+                changed_payments[payment.pk] = payment
+
+                sources, target = BOOKING_MOVES.get(event["status"], (set(), None))
+                if booking_status[payment.booking_id] in sources:
+                    booking_status[payment.booking_id] = target
+                elif event["status"] == PaymentStatus.PAID and booking_status[payment.booking_id] == BookingStatus.CANCELLED:
+                    detail = "The booking was already cancelled; the payment needs a refund."
+            else:
+                result = PaymentEventResult.IGNORED
+                detail = f"A {payment.status} payment cannot become {event['status']}."
+
+            new_events.append(PaymentEvent(
+                event_id=event["event_id"], payment=payment, status=event["status"], amount=event.get("amount"),
+                provider_payment_id=event["provider_payment_id"], result=result,
+            ))
+            results[event["position"]] = _result(event, result, payment, detail)
+
+        if changed_payments:
+            Payment.objects.bulk_update(
+                changed_payments.values(), ["status", "amount", "payment_method", "provider_payment_id"]
+            )
+        for target in (BookingStatus.CONFIRMED, BookingStatus.CANCELLED):
+            lifecycle.apply_status(
+                [row for booking_id, row in bookings.items() if booking_status[booking_id] == target and row["status"] != target],
+                target,
+            )
+        PaymentEvent.objects.bulk_create(new_events)
+    return results
@@ -1,4 +1,6 @@
 from rest_framework.permissions import BasePermission
+from listings.permissions import is_host
+from .payment_events import signature_matches
 
 
 
@@ -11,4 +13,19 @@ class IsBookingOwnerOrHost(BasePermission):
         if obj.user_id == request.user.id:
             return True
         # host of the listing (HotelsListing.host_id is the FK field name)
-        return getattr(obj.listing, "host_id_id", None) == request.user.id
\ No newline at end of file
+        return getattr(obj.listing, "host_id_id", None) == request.user.id
+
+
+class IsHost(BasePermission):
+
+    def has_permission(self, request, view):
+        return is_host(request.user)
+
+
+class IsPaymentProvider(BasePermission):
+    """A body signed with PAYMENT_WEBHOOK_SECRET (X-Payment-Signature), or a superuser replaying events."""
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_superuser:
+            return True
+        return signature_matches(request.body, request.headers.get("X-Payment-Signature", ""))
@@ -0,0 +1,119 @@
+"""
+Booking prices.
+
+quote() is the only place a stay is priced. A booking stores its quote when
+it is made (total_price is the subtotal, plus tax_amount and total_amount,
+which its payment is for), and everything after that reads the stored
+numbers: a listing's price change never reprices an existing booking, and
+showing a booking or payment never writes. quote_listings() prices one stay
+across many listings at once, with their availability, for result pages.
+"""
+
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Round
+
+CENT = Decimal("0.01")
+
+
+def tax_rate():
+    """GST on a stay (BOOKING_TAX_RATE)."""
+    return Decimal(str(getattr(settings, "BOOKING_TAX_RATE", "0.18")))
+
+
+def _money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class Quote:
+    nights: int
+    price_per_night: Decimal
+    subtotal: Decimal
+    tax: Decimal
+    total: Decimal
+
+    def booking_fields(self):
+        """The Booking fields this quote is stored in."""
+        return {"total_price": self.subtotal, "tax_amount": self.tax, "total_amount": self.total}
+
+    def as_dict(self):
+        """API form, money as strings like the DecimalFields elsewhere."""
+        return {
+            "nights": self.nights,
+            "price_per_night": f"{self.price_per_night:f}",
+            "subtotal": f"{self.subtotal:f}",
+            "tax_amount": f"{self.tax:f}",
+            "total_amount": f"{self.total:f}",
+        }
+
+
+def from_subtotal(subtotal, nights=0, price_per_night=0):
+    """A quote around a known subtotal: tax rounded to the cent, then added on."""
+    subtotal = _money(subtotal)
+    tax = _money(subtotal * tax_rate())
+    return Quote(nights, _money(price_per_night), subtotal, tax, subtotal + tax)
+
+
+def quote(price_per_night, check_in, check_out):
+    """Price `check_in` to `check_out` at `price_per_night`."""
+    nights = max((check_out - check_in).days, 0)
+    return from_subtotal(Decimal(price_per_night) * nights, nights, price_per_night)
+
+
+def quote_listings(listing_ids, check_in, check_out, guests=None):
+    """
+    Availability and a quote for each of `listing_ids` over the same stay, in
+    two queries however many listings there are: one for the listings with
+    their guest capacity, one grouped count of their full nights. Returns
+    ({listing_id: result}, ids that don't exist).
+    """
+    from listings.models import HotelsListing, RoomList
+    from .availability import full_nights
+
+    capacity = RoomList.objects.filter(hotels=OuterRef("pk")).values("hotels").annotate(total=Sum("guest")).values("total")
+    listings = (
+        HotelsListing.objects.filter(pk__in=listing_ids)
+        .annotate(capacity=Coalesce(Subquery(capacity, output_field=IntegerField()), 0))
+        .values_list("id", "price_per_night", "capacity")
+    )
+    full = dict(
+        full_nights(check_in, check_out).filter(listing_id__in=listing_ids)
+        .values("listing_id").annotate(n=Count("id")).values_list("listing_id", "n")
+    )
+    results = {}
+    for listing_id, price, capacity in listings:
+        fits = guests is None or capacity >= guests
+        results[listing_id] = {
+            "listing": listing_id,
+            "available": fits and not full.get(listing_id),
+            "full_nights": full.get(listing_id, 0),
+            "max_guests": capacity,
+            "quote": quote(price, check_in, check_out).as_dict(),
+        }
+    return results, [listing_id for listing_id in listing_ids if listing_id not in results]
+
+
+def backfill(batch_size=1000):
+    """
+    Store a quote on bookings from before quotes were stored, taking their
+    total_price as the subtotal, one UPDATE per batch; their pending payments
+    are set to the new total. Returns the number of bookings filled in.
+    """
+    from .models import Booking, Payment, PaymentStatus
+
+    tax = Round(F("total_price") * tax_rate(), 2)
+    done = 0
+    while True:
+        with transaction.atomic():
+            ids = list(Booking.objects.filter(total_amount__isnull=True).order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return done
+            Booking.objects.filter(pk__in=ids).update(tax_amount=tax, total_amount=F("total_price") + tax)
+            Payment.objects.filter(booking_id__in=ids, status=PaymentStatus.PENDING).update(
+                amount=Subquery(Booking.objects.filter(pk=OuterRef("booking_id")).values("total_amount")),
+            )
+        done += len(ids)
@@ -1,7 +1,9 @@
+from datetime import date, timedelta
 from decimal import Decimal
 from rest_framework import serializers
 from listings.models import HotelsListing
 from .models import Booking, BookingStatus, Payment, PaymentStatus
+from . import availability, pricing
 from decimal import Decimal
 
 
@@ -63,15 +65,14 @@ class PaymentSerializer(serializers.ModelSerializer):
     
 
 class BookingSerializer(serializers.ModelSerializer):
-    listing = serializers.PrimaryKeyRelatedField(queryset=HotelsListing.objects.all())
+    listing = serializers.PrimaryKeyRelatedField(queryset=HotelsListing.objects.select_related("host_id"))
     listing_info = SimpleListingSerializer(source="listing", read_only=True)
 
     user = serializers.SerializerMethodField(read_only=True)
     nights = serializers.SerializerMethodField(read_only=True)
-    payment = PaymentSerializer(required=False)
+    # written as a payment event (ReserveOnSaveMixin.perform_update, payment_events.py), never directly
+    payment = PaymentSerializer(read_only=True)
 
-    # NEW FIELD
-    tax_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Booking
@@ -87,6 +88,7 @@ class BookingSerializer(serializers.ModelSerializer):
             "infant",
             "total_price",
             "tax_amount",
+            "total_amount",
             "status",
             "nights",
             "payment",
@@ -100,7 +102,9 @@ class BookingSerializer(serializers.ModelSerializer):
             "user",
             "listing_info",
             "nights",
+            "total_price",
             "tax_amount",
+            "total_amount",
         ]
 
     def get_user(self, obj):
@@ -127,21 +131,8 @@ class BookingSerializer(serializers.ModelSerializer):
 
         # Prevent overlapping reservations only for new/updated bookings
         if listing and check_in and check_out:
-            qs = Booking.objects.filter(
-                listing=listing,
-                status__in=[
-                    BookingStatus.PENDING,
-                    BookingStatus.CONFIRMED,
-                    BookingStatus.COMPLETED,
-                    BookingStatus.CANCELLED
-                ],
-                check_in__lt=check_out,
-                check_out__gt=check_in,
-            )
-            # exclude self during update
-            if instance:
-                qs = qs.exclude(pk=instance.pk)
-            if qs.exists():
+            # nights held by this booking don't block its own update
+            if not availability.is_available(listing, check_in, check_out, exclude=instance):
                 raise serializers.ValidationError("Those dates are not available.")
 
         return attrs
@@ -151,75 +142,65 @@ class BookingSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         user = request.user if request else None
 
-        payment_data = validated_data.pop("payment", None)
         listing = validated_data["listing"]
 
-        nights = (validated_data["check_out"] - validated_data["check_in"]).days
-
-        # ✅ Calculate base total and tax
-        price_per_night = Decimal(listing.price_per_night)
-        subtotal = Decimal(nights) * price_per_night
-        tax_rate = Decimal("0.18")  # 18% GST
-        tax_amount = subtotal * tax_rate
-        total_price = subtotal 
-
         validated_data["user"] = user
-        validated_data["total_price"] = total_price
+        # whatever total_price the client sent, the stay is priced here
+        validated_data.update(pricing.quote(listing.price_per_night, validated_data["check_in"], validated_data["check_out"]).booking_fields())
 
         booking = Booking.objects.create(**validated_data)
-
-        # Attach tax amount to serializer output (not saved in DB)
-        booking.tax_amount = tax_amount
-
-        if payment_data:
-            payment_data["booking"] = booking
-            payment = Payment.objects.create(**payment_data)
-            if payment.status == PaymentStatus.PAID:
-                booking.status = BookingStatus.CONFIRMED
-                booking.save(update_fields=["status"])
-            if payment.status == PaymentStatus.FAILED or payment.status == PaymentStatus.REFUNDED :
-                booking.status = BookingStatus.CANCELLED
-                booking.save(update_fields=["status"])
-            if payment.status == PaymentStatus.PENDING:
-                booking.status = BookingStatus.PENDING
-                booking.save(update_fields=["status"])
         return booking
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-
-        # Recalculate tax for display (ensures correct value even when fetched later)
-        try:
-            nights = instance.nights
-            price_per_night = Decimal(instance.listing.price_per_night)
-            subtotal = Decimal(nights) * price_per_night
-            tax_amount = subtotal * Decimal("0.18")
-            data["tax_amount"] = round(tax_amount, 2)
-        except Exception:
-            data["tax_amount"] = None
-
-        return data
-
     def update(self, instance, validated_data):
-        payment_data = validated_data.pop("payment", None)
-
+        repriced = any(
+            field in validated_data and validated_data[field] != getattr(instance, field)
+            for field in ("listing", "check_in", "check_out")
+        )
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
+        if repriced:
+            for attr, value in pricing.quote(instance.listing.price_per_night, instance.check_in, instance.check_out).booking_fields().items():
+                setattr(instance, attr, value)
         instance.save()
+        return instance
 
-        if payment_data:
-            payment, created = Payment.objects.update_or_create(
-                booking=instance, defaults=payment_data
-            )
-            if payment.status == PaymentStatus.PAID:
-                instance.status = BookingStatus.CONFIRMED
-                instance.save(update_fields=["status"])
-            if payment.status == PaymentStatus.FAILED or payment.status == PaymentStatus.REFUNDED :
-                instance.status = BookingStatus.CANCELLED
-                instance.save(update_fields=["status"])
-            if payment.status == PaymentStatus.PENDING:
-                instance.status = BookingStatus.PENDING
-                instance.save(update_fields=["status"])
-                
 
-        return instance
+class HostAnalyticsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    listing = serializers.IntegerField(required=False)
+
+    max_days = 731
+
+    def validate(self, attrs):
+        today = date.today()
+        attrs.setdefault("end", attrs["start"] + timedelta(days=364) if "start" in attrs else today + timedelta(days=90))
+        attrs.setdefault("start", attrs["end"] - timedelta(days=364))
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("end must not be before start.")
+        if (attrs["end"] - attrs["start"]).days >= self.max_days:
+            raise serializers.ValidationError(f"The range can span at most {self.max_days} days.")
+        return attrs
+
+
+class BatchQuoteQuerySerializer(serializers.Serializer):
+    listings = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    guests = serializers.IntegerField(required=False, min_value=1)
+
+    max_listings = 300
+    max_nights = 365
+
+    def validate_listings(self, value):
+        value = list(dict.fromkeys(value))
+        if len(value) > self.max_listings:
+            raise serializers.ValidationError(f"At most {self.max_listings} listings at a time.")
+        return value
+
+    def validate(self, attrs):
+        if attrs["check_in"] >= attrs["check_out"]:
+            raise serializers.ValidationError("check_out must be after check_in.")
+        if (attrs["check_out"] - attrs["check_in"]).days > self.max_nights:
+            raise serializers.ValidationError(f"A stay can be at most {self.max_nights} nights.")
+        return attrs
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from listings import response_cache
+from . import analytics
+from .availability import AVAILABILITY_FIELDS, release, sync_booking
+from .models import BookedNight, Booking
+
+
+@receiver(post_save, sender=Booking)
+def keep_booked_nights_in_sync(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and not AVAILABILITY_FIELDS.intersection(update_fields):
+        return
+    # raises availability.Unavailable; Booking.save rolls the booking back with it
+    sync_booking(instance, created=created)
+    response_cache.bump_availability()
+
+
+@receiver(pre_delete, sender=Booking)
+def release_deleted_booking(sender, instance, **kwargs):
+    # before the cascade takes the BookedNight rows, so their rooms are given back
+    release(BookedNight.objects.filter(booking=instance))
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    response_cache.bump_availability()
+    analytics.apply_change(before=analytics.snapshot(instance))
+
+
+# Analytics fields an update_fields save can touch (listing_id is saved as "listing")
+ANALYTICS_FIELDS = {"listing", "check_in", "check_out", "status", "total_price"}
+
+
+@receiver(pre_save, sender=Booking)
+def remember_analytics_snapshot(sender, instance, update_fields=None, **kwargs):
+    instance._analytics_before = None
+    if instance.pk is None or (update_fields and not ANALYTICS_FIELDS.intersection(update_fields)):
+        return
+    row = Booking.objects.filter(pk=instance.pk).values(*analytics.SNAPSHOT_FIELDS).first()
+    instance._analytics_before = analytics.snapshot(row) if row else None
+
+
+@receiver(post_save, sender=Booking)
+def keep_analytics_in_sync(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields and not ANALYTICS_FIELDS.intersection(update_fields):
+        return
+    analytics.apply_change(before=getattr(instance, "_analytics_before", None), after=analytics.snapshot(instance))
@@ -1,3 +1,822 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from airbnbapi.pagination import KeysetPagination
+from airbnbapi.testing import ListingFixtureMixin, QueryBudgetMixin
+from listings.models import HotelsListing, ListingReviewStats, Review, RoomList
+from users.models import Users
+from . import analytics, availability, lifecycle, payment_events, pricing
+from .fake_provider import FakePaymentProvider
+from .models import ACTIVE_BOOKING_STATUSES, BookedNight, Booking, BookingStatus, ListingDailySummary, NightInventory, Payment, PaymentEvent, PaymentStatus
 
-# Create your tests here.
+# throughput of the concurrency harness; shown with a DEBUG/INFO log config, never on stdout
+logger = logging.getLogger(__name__)
+
+
+def run_concurrently(attempts):
+    """
+    Start every callable in `attempts` on its own thread (and DB connection)
+    at the same moment. Returns (results in order, seconds elapsed).
+    """
+    barrier = threading.Barrier(len(attempts))
+    results = [None] * len(attempts)
+
+    def worker(i, attempt):
+        try:
+            barrier.wait()
+            results[i] = attempt()
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, attempt)) for i, attempt in enumerate(attempts)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+class ConcurrentReservationTests(ListingFixtureMixin, TransactionTestCase):
+    """Parallel POST /api/bookings/ against one listing; run on Postgres."""
+    guests = 12
+
+    def setUp(self):
+        super().setUp()
+        self.users = [
+            Users.objects.create_user(username=f"guest{i}", email=f"guest{i}@example.com", password="x")
+            for i in range(self.guests)
+        ]
+        self.check_in = date.today() + timedelta(days=30)
+
+    def book(self, user, check_in, nights=3):
+        def attempt():
+            client = APIClient()
+            client.force_authenticate(user)
+            response = client.post("/api/bookings/", {
+                "listing": self.listing.id,
+                "check_in": check_in.isoformat(),
+                "check_out": (check_in + timedelta(days=nights)).isoformat(),
+                "total_price": "3000.00",
+            }, format="json")
+            return response.status_code
+        return attempt
+
+    def test_same_dates_have_exactly_one_winner(self):
+        statuses, elapsed = run_concurrently([self.book(user, self.check_in) for user in self.users])
+
+        self.assertEqual(statuses.count(201), 1, statuses)
+        self.assertEqual(statuses.count(400), self.guests - 1, statuses)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(BookedNight.objects.count(), 3)
+        logger.info("%d attempts on the same nights: 1 winner in %.2fs", self.guests, elapsed)
+
+    def test_multi_room_hotel_sells_every_room_once(self):
+        self.listing.multiple_rooms = 5
+        self.listing.save()
+        statuses, elapsed = run_concurrently([self.book(user, self.check_in) for user in self.users])
+
+        self.assertEqual(statuses.count(201), 5, statuses)
+        self.assertEqual(Booking.objects.count(), 5)
+        self.assertEqual(set(NightInventory.objects.values_list("held", flat=True)), {5})
+        logger.info("%d attempts on a 5-room hotel: 5 winners, %.0f bookings/s", self.guests, 5 / elapsed)
+
+    def test_overlapping_ranges_never_double_book(self):
+        # each guest wants 3 nights starting one day after the previous guest
+        attempts = [self.book(user, self.check_in + timedelta(days=i)) for i, user in enumerate(self.users)]
+        statuses, _ = run_concurrently(attempts)
+
+        nights = list(BookedNight.objects.values_list("night", flat=True))
+        self.assertEqual(len(nights), len(set(nights)))
+        self.assertEqual(len(nights), 3 * statuses.count(201))
+        self.assertEqual(Booking.objects.count(), statuses.count(201))
+        self.assertEqual(max(NightInventory.objects.values_list("held", flat=True)), 1)
+
+    def test_disjoint_dates_throughput(self):
+        # every guest gets their own week on the same listing: all should win
+        attempts = [self.book(user, self.check_in + timedelta(days=7 * i)) for i, user in enumerate(self.users)]
+        statuses, elapsed = run_concurrently(attempts)
+
+        self.assertEqual(statuses, [201] * self.guests)
+        self.assertEqual(BookedNight.objects.count(), 3 * self.guests)
+        logger.info("%d disjoint bookings on one listing: %.0f bookings/s", self.guests, self.guests / elapsed)
+
+
+class BookingWritePathTests(ListingFixtureMixin, TestCase):
+    """Taken dates are a validation error on every write path, never a 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = Users.objects.create_superuser(username="admin", email="admin@example.com", password="x")
+
+    def setUp(self):
+        super().setUp()
+        self.check_in = self.next_check_in
+        self.check_out = self.check_in + timedelta(days=3)
+        self.booking = self.book(nights=3, user=self.admin, payment=False)
+
+    def test_orm_save(self):
+        # the first night is free, the others are taken: nothing at all may stick
+        with self.assertRaises(availability.Unavailable), transaction.atomic():
+            Booking.objects.create(
+                listing=self.listing, user=self.admin, check_in=self.check_in - timedelta(days=1), check_out=self.check_out,
+                total_price="4000.00",
+            )
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertFalse(NightInventory.objects.filter(night=self.check_in - timedelta(days=1), held__gt=0).exists())
+        self.assertEqual(set(NightInventory.objects.values_list("held", flat=True)), {1})
+
+    def test_admin_api_race(self):
+        self.client.force_authenticate(self.admin)
+        # as if another booking took the nights after the serializer's check
+        with mock.patch.object(availability, "is_available", return_value=True):
+            response = self.client.post("/api/admin/booking/", {
+                "listing": self.listing.id, "check_in": self.check_in.isoformat(), "check_out": self.check_out.isoformat(),
+                "total_price": "3000.00",
+            }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["Those dates are not available."]})
+        # rolled back with its booking row
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_django_admin_form(self):
+        self.client.force_login(self.admin)
+        response = self.client.post("/director/bookings/booking/add/", {
+            "listing": self.listing.id, "user": self.admin.id, "check_in": self.check_in, "check_out": self.check_out,
+            "adult": 1, "children": 0, "infant": 0, "total_price": "3000.00", "status": BookingStatus.PENDING,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Those dates are not available.")
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class AutocommitBookingTests(ListingFixtureMixin, TransactionTestCase):
+    """Bookings written outside any transaction, as scripts and the shell do."""
+
+    def setUp(self):
+        super().setUp()
+        self.check_in = self.next_check_in
+        self.booking(self.check_in, self.check_in + timedelta(days=3)).save()
+
+    def booking(self, check_in, check_out):
+        return Booking(listing=self.listing, user=self.guest, check_in=check_in, check_out=check_out, total_price="1000.00")
+
+    def held(self):
+        return sorted(NightInventory.objects.filter(held__gt=0).values_list("night", "held"))
+
+    def test_partly_taken_save_leaves_nothing(self):
+        held = self.held()
+        with self.assertRaises(availability.Unavailable):
+            self.booking(self.check_in - timedelta(days=2), self.check_in + timedelta(days=1)).save()
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.held(), held)
+
+    def test_partly_taken_sync_leaves_nothing(self):
+        held = self.held()
+        # written without signals, the way a bulk_create would
+        booking, = Booking.objects.bulk_create([self.booking(self.check_in - timedelta(days=2), self.check_in + timedelta(days=1))])
+        with self.assertRaises(availability.Unavailable):
+            availability.sync_booking(booking, created=True)
+        self.assertEqual(self.held(), held)
+        self.assertFalse(BookedNight.objects.filter(booking=booking).exists())
+
+
+class NightInventoryTests(ListingFixtureMixin, TestCase):
+    listing_fields = {"multiple_rooms": 2}
+
+    def setUp(self):
+        super().setUp()
+        self.check_in = self.next_check_in
+        self.client.force_authenticate(self.guest)
+
+    def post_booking(self):
+        return self.client.post("/api/bookings/", {
+            "listing": self.listing.id, "check_in": self.check_in.isoformat(),
+            "check_out": (self.check_in + timedelta(days=2)).isoformat(), "total_price": "2000.00",
+        }, format="json")
+
+    def held(self):
+        return sorted(NightInventory.objects.filter(listing=self.listing).values_list("held", flat=True))
+
+    def test_rooms_per_night(self):
+        self.assertEqual(self.post_booking().status_code, 201)
+        self.assertEqual(self.post_booking().status_code, 201)
+        self.assertEqual(self.held(), [2, 2])
+        self.assertEqual(self.post_booking().status_code, 400)
+
+    def test_delete_then_rebook(self):
+        self.listing.multiple_rooms = 1
+        self.listing.save()
+        booking_id = self.post_booking().json()["id"]
+        self.assertEqual(self.client.delete(f"/api/bookings/{booking_id}/").status_code, 204)
+        self.assertEqual(self.held(), [0, 0])
+        self.assertEqual(self.post_booking().status_code, 201)
+
+    def test_cascade_from_user_delete(self):
+        self.post_booking()
+        self.post_booking()
+        self.guest.delete()
+        self.assertEqual(self.held(), [0, 0])
+        self.assertFalse(BookedNight.objects.exists())
+
+
+class HostAnalyticsTests(ListingFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = HotelsListing.objects.create(
+            title="City flat", location=cls.location, address="Main road", price_per_night=500, host_id=cls.host,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.check_in = self.next_check_in
+
+    def summaries(self):
+        return sorted(ListingDailySummary.objects.exclude(
+            room_nights=0, revenue=0, bookings=0, cancellations=0,
+        ).values_list("listing_id", "day", "room_nights", "revenue", "bookings", "cancellations"))
+
+    def assertInStep(self):
+        # what the signals kept must equal a recount from the bookings
+        kept = self.summaries()
+        analytics.rebuild()
+        self.assertEqual(kept, self.summaries())
+        return kept
+
+    def test_summaries_follow_every_booking_write(self):
+        booking = self.book(self.check_in, nights=3, payment=False)
+        # a pending booking counts as booked, not as sold nights
+        self.assertEqual([row[2:] for row in self.assertInStep()], [(0, 0, 1, 0)])
+
+        booking.status = BookingStatus.CONFIRMED
+        booking.save(update_fields=["status"])
+        self.assertEqual(sum(row[2] for row in self.assertInStep()), 3)
+
+        booking.check_out = self.check_in + timedelta(days=2)
+        booking.total_price = Decimal("2000.00")
+        booking.save()
+        kept = self.assertInStep()
+        self.assertEqual((sum(row[2] for row in kept), sum(row[3] for row in kept)), (2, Decimal("2000.00")))
+
+        booking.listing = self.other
+        booking.save()
+        self.assertEqual({row[0] for row in self.assertInStep()}, {self.other.id})
+
+        booking.status = BookingStatus.CANCELLED
+        booking.save()
+        self.assertEqual([row[2:] for row in self.assertInStep()], [(0, 0, 1, 1)])
+
+        booking.delete()
+        self.assertEqual(self.assertInStep(), [])
+
+    def test_endpoint_totals(self):
+        for nights, status in ((3, BookingStatus.CONFIRMED), (2, BookingStatus.CANCELLED)):
+            self.book(nights=nights, status=status, payment=False)
+        self.client.force_authenticate(self.host)
+        response = self.client.get("/api/bookings/analytics/")
+        self.assertEqual(response.status_code, 200)
+        totals = response.json()["totals"]
+        self.assertEqual(
+            (totals["room_nights"], totals["revenue"], totals["bookings"], totals["cancellations"]),
+            (3, "3000.00", 2, 1),
+        )
+        self.assertEqual(self.client.get(f"/api/bookings/analytics/?listing={self.other.id}").json()["totals"]["bookings"], 0)
+
+
+class ExportTests(ListingFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = Users.objects.create_superuser(username="admin", email="admin@example.com", password="x")
+        other_host = Users.objects.create_user(username="other", email="other@example.com", password="x", role="HO")
+        cls.listings = [cls.listing] + [
+            HotelsListing.objects.create(title=title, location=cls.location, address="Main road", host_id=host)
+            for title, host in (("City flat", cls.host), ("Hill view", other_host))
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.bookings = [
+            self.book(self.next_check_in, listing=listing, tax_amount="360.00", total_amount="2360.00") for listing in self.listings
+        ]
+
+    def get(self, user, url):
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        body = b"".join(response.streaming_content).decode() if response.streaming else response.content.decode()
+        return response, body
+
+    def test_host_export_ndjson(self):
+        response, body = self.get(self.host, "/api/bookings/export/?format=ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        rows = [json.loads(line) for line in body.splitlines()]
+        # only the caller's listings, in id order
+        self.assertEqual([row["id"] for row in rows], [booking.id for booking in self.bookings[:2]])
+        self.assertEqual(
+            (rows[0]["nights"], rows[0]["total_amount"], rows[0]["payment_status"], rows[0]["check_in"]),
+            (2, "2360.00", PaymentStatus.PENDING, self.bookings[0].check_in.isoformat()),
+        )
+
+    def test_admin_export_csv(self):
+        response, body = self.get(self.admin, "/api/admin/export/bookings/?format=csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="bookings-', response["Content-Disposition"])
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual((rows[2]["listing_title"], rows[2]["total_price"]), ("Hill view", "2000.00"))
+
+        _, body = self.get(self.admin, "/api/admin/export/listings/?format=csv")
+        self.assertEqual(len(list(csv.DictReader(body.splitlines()))), 3)
+        future = (date.today() + timedelta(days=1)).isoformat()
+        _, body = self.get(self.admin, f"/api/admin/export/users/?format=ndjson&start={future}")
+        self.assertEqual(body, "")
+
+    def test_errors(self):
+        self.assertEqual(self.get(self.admin, "/api/admin/export/nothing/?format=ndjson")[0].status_code, 404)
+        self.assertEqual(self.get(self.host, "/api/admin/export/bookings/?format=ndjson")[0].status_code, 403)
+        response, _ = self.get(self.host, "/api/bookings/export/?format=csv&start=2030-01-02&end=2030-01-01")
+        self.assertEqual(response.status_code, 400)
+
+
+class SeedAndBenchCommandTests(TestCase):
+    SMALL = {"hosts": 2, "guests": 20, "locations": 3, "listings": 8, "bookings": 80, "seed": 3}
+
+    def seed(self, **options):
+        call_command("seed_scale", stdout=io.StringIO(), **{**self.SMALL, **options})
+
+    def test_seed_scale_builds_consistent_data(self):
+        self.seed()
+        self.assertEqual(Users.objects.filter(username__startswith="seed-").count(), 22)
+        self.assertEqual(HotelsListing.objects.count(), 8)
+        self.assertGreater(Booking.objects.count(), 0)
+        self.assertEqual(Payment.objects.count(), Booking.objects.count())
+
+        # every active booking holds its nights, and no night is sold past its rooms
+        active = Booking.objects.filter(status__in=ACTIVE_BOOKING_STATUSES)
+        self.assertEqual(BookedNight.objects.count(), sum((b.check_out - b.check_in).days for b in active))
+        self.assertFalse(NightInventory.objects.filter(held__gt=availability.rooms_per_night()).exists())
+        inventory = sorted(NightInventory.objects.values_list("listing_id", "night", "held"))
+        availability.rebuild_inventory()
+        self.assertEqual(inventory, sorted(NightInventory.objects.values_list("listing_id", "night", "held")))
+
+        stats = ListingReviewStats.objects.aggregate(n=Sum("review_count"))["n"] or 0
+        self.assertEqual(stats, Review.objects.count())
+        nights = ListingDailySummary.objects.aggregate(n=Sum("room_nights"))["n"] or 0
+        self.assertEqual(nights, Booking.objects.filter(status__in=analytics.SOLD_STATUSES).aggregate(
+            n=Sum(F("check_out") - F("check_in")))["n"].days)
+
+    def test_seed_scale_repeats_for_a_seed(self):
+        self.seed(tag="one")
+        self.seed(tag="two")
+
+        def rows(tag):
+            listings = HotelsListing.objects.filter(host_id__username__startswith=f"{tag}-").order_by("id")
+            return list(listings.values_list("title", "price_per_night", "multiple_rooms", "offersOrExtras"))
+
+        self.assertEqual(rows("one"), rows("two"))
+
+        with self.assertRaises(CommandError):
+            self.seed(tag="one")
+
+    def test_bench_endpoints_reports_without_writing(self):
+        self.seed()
+        bookings = Booking.objects.count()
+        out = io.StringIO()
+        call_command(
+            "bench_endpoints", requests=3, warmup=1, writes=True,
+            only=["listings_auth", "bookings", "booking_detail", "booking_create"], stdout=out, stderr=io.StringIO(),
+        )
+        report = json.loads(out.getvalue())
+        results = {row["name"]: row for row in report["endpoints"]}
+        self.assertEqual(set(results), {"listings_auth", "bookings", "booking_detail", "booking_create"})
+        for row in results.values():
+            self.assertEqual(row["errors"], 0, row)
+            self.assertEqual(row["requests"], 3)
+            self.assertIsNotNone(row["queries_avg"])
+        self.assertEqual(results["booking_create"]["statuses"], [201])
+        self.assertEqual(report["meta"]["rows"]["bookings"], bookings)
+        # the bookings it made were rolled back
+        self.assertEqual(Booking.objects.count(), bookings)
+
+        with self.assertRaises(CommandError):
+            call_command("bench_endpoints", only=["nope"], stdout=io.StringIO(), stderr=io.StringIO())
+
+
+class KeysetPaginationTests(ListingFixtureMixin, TestCase):
+    listing_fields = {"multiple_rooms": 20}
+
+    def setUp(self):
+        super().setUp()
+        for _ in range(11):
+            self.book(self.next_check_in, nights=1, payment=False)
+        # ties on created_at must be broken by id, not skipped or repeated
+        ids = list(Booking.objects.order_by("id").values_list("id", flat=True))
+        tied = timezone.now() - timedelta(days=1)
+        Booking.objects.filter(id__in=ids[2:8]).update(created_at=tied)
+        self.expected = list(Booking.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.client.force_authenticate(self.guest)
+
+    def walk(self, url):
+        seen, sql = [], []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            seen += [row["id"] for row in response.data["results"]]
+            sql += [query["sql"] for query in queries]
+            url = response.data["next"]
+        return seen, sql
+
+    def test_every_page_in_order(self):
+        seen, sql = self.walk("/api/bookings/?cursor=&page_size=3")
+        self.assertEqual(seen, self.expected)
+        self.assertFalse([query for query in sql if "COUNT(" in query.upper() or "OFFSET" in query.upper()])
+        # later pages seek with one row comparison on the (created_at, id) index
+        self.assertTrue(any('("bookings_booking"."created_at", "bookings_booking"."id") <' in query for query in sql))
+
+    def test_page_sizes(self):
+        for size in (1, 4, 11, 50):
+            self.assertEqual(self.walk(f"/api/bookings/?cursor=&page_size={size}")[0], self.expected)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get("/api/bookings/?cursor=nonsense").status_code, 404)
+
+    def test_mixed_directions(self):
+        view = mock.Mock(keyset_ordering=("created_at", "-id"))
+        expected = list(Booking.objects.order_by("created_at", "-id").values_list("id", flat=True))
+        seen, cursor = [], ""
+        while cursor is not None:
+            request = Request(APIRequestFactory().get("/", {"cursor": cursor, "page_size": 2}))
+            paginator = KeysetPagination()
+            seen += [booking.id for booking in paginator.paginate_queryset(Booking.objects.all(), request, view)]
+            cursor = paginator.encode_cursor(paginator.last) if paginator.has_next else None
+        self.assertEqual(seen, expected)
+
+
+class BookingQueryBudgetTests(ListingFixtureMixin, QueryBudgetMixin, TestCase):
+    """Queries per booking and payment endpoint, before and after more rows exist."""
+
+    def setUp(self):
+        super().setUp()
+        self.booking = self.book()
+        self.add_rows(2)
+        self.client.force_authenticate(self.guest)
+
+    def add_rows(self, n=3):
+        for _ in range(n):
+            self.book()
+
+    def test_booking_list(self):
+        self.assertQueryBudget(2, lambda: self.client.get("/api/bookings/"), self.add_rows)
+
+    def test_host_booking_list(self):
+        self.client.force_authenticate(self.host)
+        self.assertQueryBudget(2, lambda: self.client.get("/api/bookings/?role=host"), self.add_rows)
+
+    def test_booking_detail(self):
+        self.assertQueryBudget(1, lambda: self.client.get(f"/api/bookings/{self.booking.id}/"), self.add_rows)
+
+    def test_booking_create(self):
+        def book():
+            check_in = self.next_check_in
+            self.next_check_in += timedelta(days=3)
+            return self.client.post("/api/bookings/", {
+                "listing": self.listing.id,
+                "check_in": check_in.isoformat(),
+                "check_out": (check_in + timedelta(days=2)).isoformat(),
+                "total_price": "1.00",
+            }, format="json")
+        self.assertQueryBudget(16, book, self.add_rows, status=201)
+
+    def test_payment_retrieve(self):
+        self.assertQueryBudget(1, lambda: self.client.get(f"/api/bookings/payments/{self.booking.id}/"), self.add_rows)
+
+    def test_payment_update(self):
+        unpaid = iter([self.booking, self.book()])
+
+        def pay():
+            return self.client.put(f"/api/bookings/payments/{next(unpaid).id}/", {
+                "status": "paid", "payment_method": "card", "amount": "2000.00",
+            }, format="json")
+        self.assertQueryBudget(13, pay, self.add_rows)
+
+    def test_batch_quotes(self):
+        ids = [self.listing.id]
+
+        def more_listings(n=3):
+            for i in range(n):
+                ids.append(HotelsListing.objects.create(
+                    title=f"Room {i}", location=self.listing.location, address="Beach road", host_id=self.host,
+                ).id)
+
+        def quote():
+            return self.client.get(f"/api/bookings/quotes/?listings={','.join(map(str, ids))}&check_in={self.booking.check_in}&check_out={self.booking.check_out}&guests=2")
+        self.assertQueryBudget(2, quote, more_listings)
+
+    def test_admin_booking_list(self):
+        admin = Users.objects.create_superuser(username="admin", email="admin@example.com", password="x")
+        self.client.force_authenticate(admin)
+        self.assertQueryBudget(2, lambda: self.client.get("/api/admin/booking/"), self.add_rows)
+
+
+class FastBookingSerializerTests(ListingFixtureMixin, TestCase):
+    """The precompiled booking list renders the same bytes as the DRF serializer."""
+
+    def setUp(self):
+        super().setUp()
+        self.book()
+        self.book(status=BookingStatus.CANCELLED, payment=False)
+        self.client.force_authenticate(self.guest)
+
+    def test_same_output(self):
+        for url in ("/api/bookings/", "/api/bookings/?cursor="):
+            with self.settings(FAST_READ_SERIALIZERS=True):
+                fast = self.client.get(url)
+            with self.settings(FAST_READ_SERIALIZERS=False):
+                drf = self.client.get(url)
+            self.assertEqual(fast.status_code, 200)
+            self.assertEqual(fast.content, drf.content, url)
+
+
+class BookingLifecycleTests(ListingFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+
+    def book(self, check_in, age=timedelta(0), **fields):
+        booking = super().book(check_in, **fields)
+        Booking.objects.filter(pk=booking.pk).update(created_at=timezone.now() - age)
+        return booking
+
+    def summaries(self):
+        return sorted(ListingDailySummary.objects.exclude(
+            room_nights=0, revenue=0, bookings=0, cancellations=0,
+        ).values_list("day", "room_nights", "revenue", "bookings", "cancellations"))
+
+    def test_expires_stale_pending_and_completes_past_stays(self):
+        stale = self.book(self.today + timedelta(days=10), age=timedelta(hours=3))
+        fresh = self.book(self.today + timedelta(days=20), age=timedelta(minutes=5))
+        stayed = self.book(self.today - timedelta(days=3), status=BookingStatus.CONFIRMED, age=timedelta(days=30))
+        # book() backdates created_at with update(), which analytics doesn't see
+        analytics.rebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = lifecycle.run(batch_size=1, hold=timedelta(hours=1))
+
+        self.assertEqual(report["expired"]["rows"], 1)
+        self.assertEqual(report["completed"]["rows"], 1)
+        self.assertEqual(report["pruned"]["rows"], 2)
+        statuses = dict(Booking.objects.values_list("id", "status"))
+        self.assertEqual(statuses, {stale.id: "cancelled", fresh.id: "pending", stayed.id: "completed"})
+        self.assertEqual(Payment.objects.get(booking=stale).status, PaymentStatus.FAILED)
+        # only the fresh hold still has nights, and the stale one's dates are free again
+        self.assertEqual(set(BookedNight.objects.values_list("booking_id", flat=True)), {fresh.id})
+        self.assertEqual(NightInventory.objects.filter(night__lt=self.today).count(), 0)
+        self.assertFalse(NightInventory.objects.filter(held__gt=0, night=stale.check_in).exists())
+
+        incremental = self.summaries()
+        analytics.rebuild()
+        self.assertEqual(incremental, self.summaries())
+
+    def test_batches_are_bounded(self):
+        for i in range(5):
+            self.book(self.today + timedelta(days=10 + 3 * i), age=timedelta(days=1))
+        self.assertEqual(lifecycle.expire_pending(batch_size=2, max_batches=2), (4, 2))
+        self.assertEqual(lifecycle.expire_pending(batch_size=2), (1, 1))
+
+
+@override_settings(PAYMENT_WEBHOOK_SECRET="test-secret")
+class PaymentEventTests(ListingFixtureMixin, TestCase):
+
+    def post(self, events, signature=None):
+        body, headers = FakePaymentProvider(secret="test-secret").signed(events)
+        return self.client.post(
+            "/api/bookings/payments/events/", body, content_type="application/json",
+            HTTP_X_PAYMENT_SIGNATURE=signature if signature is not None else headers["X-Payment-Signature"],
+        )
+
+    def test_replayed_bursts_apply_each_event_once(self):
+        bookings = [self.book() for _ in range(30)]
+        provider = FakePaymentProvider(seed=3, failure_rate=0.3, refund_rate=0.2, duplicate_rate=0.5, secret="test-secret")
+        timelines = provider.events_for([(b.id, b.total_price) for b in bookings])
+        batches = list(provider.burst(timelines, batch_size=7))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = [result for batch in batches for result in self.post(batch).json()["results"]]
+            again = [result for batch in batches for result in self.post(batch).json()["results"]]
+
+        unique = sum(len(events) for events in timelines)
+        self.assertEqual(sum(r["result"] == "applied" for r in first), unique)
+        self.assertEqual({r["result"] for r in again}, {"duplicate"})
+        self.assertEqual(PaymentEvent.objects.count(), unique)
+        self.assertEqual(dict(Payment.objects.values_list("booking_id", "status")), provider.expected())
+
+        expected_booking = {"paid": "confirmed", "refunded": "cancelled"}
+        self.assertEqual(
+            dict(Booking.objects.values_list("id", "status")),
+            {booking_id: expected_booking[status] for booking_id, status in provider.expected().items()},
+        )
+        # refunds freed their nights; summaries match a full rebuild
+        self.assertFalse(BookedNight.objects.filter(booking__status=BookingStatus.CANCELLED).exists())
+        summaries = lambda: sorted(ListingDailySummary.objects.exclude(  # noqa: E731
+            room_nights=0, revenue=0, bookings=0, cancellations=0,
+        ).values_list("day", "room_nights", "revenue", "bookings", "cancellations"))
+        incremental = summaries()
+        analytics.rebuild()
+        self.assertEqual(incremental, summaries())
+
+    def test_batch_results(self):
+        booking, paid = self.book(), self.book()
+        payment_events.ingest([{"booking": paid.id, "status": "paid", "provider_payment_id": "pay_1"}])
+        results = payment_events.ingest([
+            {"event_id": "a", "booking": booking.id, "status": "paid", "provider_payment_id": "pay_2"},
+            {"event_id": "a", "booking": booking.id, "status": "paid"},
+            {"event_id": "b", "provider_payment_id": "pay_1", "status": "failed"},
+            {"event_id": "c", "booking": 0, "status": "paid"},
+            {"event_id": "d", "booking": booking.id, "status": "sold"},
+            {"event_id": "e", "booking": booking.id, "status": "paid", "provider_payment_id": "pay_1"},
+        ])
+        self.assertEqual(
+            [r["result"] for r in results],
+            ["applied", "duplicate", "ignored", "rejected", "rejected", "rejected"],
+        )
+        self.assertEqual(Payment.objects.get(booking=booking).provider_payment_id, "pay_2")
+        self.assertEqual(Payment.objects.get(booking=paid).status, PaymentStatus.PAID)
+
+    def test_events_need_a_signature_or_superuser(self):
+        booking = self.book()
+        event = [{"booking": booking.id, "status": "paid"}]
+        self.assertEqual(self.post(event, signature="").status_code, 401)
+        self.assertEqual(self.post(event, signature="0" * 64).status_code, 401)
+        self.assertEqual(self.post(event).status_code, 200)
+
+        admin = Users.objects.create_superuser(username="admin", email="admin@example.com", password="x")
+        self.client.force_authenticate(admin)
+        response = self.client.post("/api/bookings/payments/events/", {"booking": booking.id, "status": "paid"}, format="json")
+        self.assertEqual(response.json()["counts"], {"duplicate": 1})
+
+    def test_payment_update_is_idempotent(self):
+        booking = self.book()
+        self.client.force_authenticate(self.guest)
+        pay = lambda: self.client.put(  # noqa: E731
+            f"/api/bookings/payments/{booking.id}/",
+            {"status": "paid", "payment_method": "upiID", "amount": "2000.00"},
+            format="json", HTTP_IDEMPOTENCY_KEY="checkout-1",
+        )
+        self.assertEqual(pay().json()["status"], "paid")
+        self.assertEqual(pay().json()["status"], "paid")
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, BookingStatus.CONFIRMED)
+        self.assertEqual(list(PaymentEvent.objects.values_list("event_id", flat=True)), ["checkout-1"])
+
+    def test_payment_update_statuses(self):
+        booking = self.book()
+        self.client.force_authenticate(self.guest)
+        pay = lambda status: self.client.put(f"/api/bookings/payments/{booking.id}/", {"status": status}, format="json")  # noqa: E731
+        for status in ("pending", "piad", ""):
+            self.assertEqual(pay(status).status_code, 400, status)
+        booking.refresh_from_db()
+        self.assertEqual((booking.status, booking.payment.status), (BookingStatus.PENDING, PaymentStatus.PENDING))
+
+        self.assertEqual(pay("paid").json()["status"], "paid")
+        self.assertEqual(pay("refunded").json()["status"], "refunded")
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, BookingStatus.CANCELLED)
+        self.assertFalse(BookedNight.objects.filter(booking=booking).exists())
+        self.assertEqual(self.client.put("/api/bookings/payments/999999/", {"status": "paid"}, format="json").status_code, 404)
+
+    def test_nested_payment_is_an_event(self):
+        booking = self.book()
+        self.client.force_authenticate(self.guest)
+        body = {"payment": {"status": "paid", "payment_method": "card"}}
+        for _ in range(2):
+            response = self.client.patch(f"/api/bookings/{booking.id}/", body, format="json", HTTP_IDEMPOTENCY_KEY="nested-1")
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual((response.data["status"], response.data["payment"]["status"]), ("confirmed", "paid"))
+        self.assertEqual(list(PaymentEvent.objects.values_list("event_id", flat=True)), ["nested-1"])
+
+    def test_rejected_nested_payment_rolls_back_the_booking(self):
+        booking = self.book()
+        self.client.force_authenticate(self.guest)
+        check_out = booking.check_out + timedelta(days=1)
+        response = self.client.patch(f"/api/bookings/{booking.id}/", {
+            "check_out": check_out.isoformat(),
+            "payment": {"status": "pending"},
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data)
+        booking.refresh_from_db()
+        self.assertNotEqual(booking.check_out, check_out)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+
+class PricingTests(ListingFixtureMixin, TestCase):
+    listing_fields = {"price_per_night": 1333}
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.guest)
+        self.check_in = self.next_check_in
+
+    def test_quote(self):
+        quote = pricing.quote(1333, self.check_in, self.check_in + timedelta(days=3))
+        self.assertEqual(quote, pricing.Quote(3, Decimal("1333.00"), Decimal("3999.00"), Decimal("719.82"), Decimal("4718.82")))
+        with self.assertRaises(AttributeError):
+            quote.total = Decimal("1")
+
+    def test_booking_stores_its_quote(self):
+        response = self.client.post("/api/bookings/", {
+            "listing": self.listing.id, "check_in": self.check_in.isoformat(),
+            "check_out": (self.check_in + timedelta(days=3)).isoformat(), "total_price": "1.00",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            (response.data["total_price"], response.data["tax_amount"], response.data["total_amount"]),
+            ("3999.00", "719.82", "4718.82"),
+        )
+        booking = Booking.objects.get(pk=response.data["id"])
+        self.assertEqual(booking.payment.amount, Decimal("4718.82"))
+
+        # a later price change doesn't reprice the booking, and reads don't write
+        HotelsListing.objects.filter(pk=self.listing.pk).update(price_per_night=2000)
+        with self.assertNumQueries(1):
+            payment = self.client.get(f"/api/bookings/payments/{booking.id}/").data
+        self.assertEqual(payment["amount"], "4718.82")
+        self.assertEqual(self.client.get(f"/api/bookings/{booking.id}/").data["total_amount"], "4718.82")
+
+    def test_backfill(self):
+        booking = self.book(nights=1)
+        self.assertEqual(pricing.backfill(), 1)
+        booking.refresh_from_db()
+        self.assertEqual((booking.tax_amount, booking.total_amount), (Decimal("239.94"), Decimal("1572.94")))
+        self.assertEqual(Payment.objects.get(booking=booking).amount, Decimal("1572.94"))
+        self.assertEqual(pricing.backfill(), 0)
+
+
+class BatchQuoteTests(ListingFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.small = cls.listing
+        cls.hotel = HotelsListing.objects.create(
+            title="Hotel", location=cls.location, address="Beach road", price_per_night=2500, host_id=cls.host, multiple_rooms=2,
+        )
+        cls.small.rooms.add(RoomList.objects.create(guest=2))
+        cls.hotel.rooms.add(RoomList.objects.create(guest=4), RoomList.objects.create(guest=4))
+
+    def setUp(self):
+        super().setUp()
+        self.check_in = self.next_check_in
+        for listing in (self.small, self.hotel):
+            self.book(self.check_in + timedelta(days=1), nights=1, listing=listing, payment=False)
+
+    def quote(self, **params):
+        params = {"listings": [self.small.id, self.hotel.id, 999999], "check_in": self.check_in,
+                  "check_out": self.check_in + timedelta(days=3), **params}
+        return self.client.post("/api/bookings/quotes/", {k: str(v) if isinstance(v, date) else v for k, v in params.items()}, format="json")
+
+    def test_availability_and_quotes(self):
+        response = self.quote()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["missing"], [999999])
+        small, hotel = response.data["results"]
+        # the cabin's only room is taken on the middle night; the hotel has a second one
+        self.assertEqual((small["listing"], small["available"], small["full_nights"]), (self.small.id, False, 1))
+        self.assertEqual((hotel["listing"], hotel["available"], hotel["full_nights"]), (self.hotel.id, True, 0))
+        self.assertEqual(hotel["quote"], {
+            "nights": 3, "price_per_night": "2500.00", "subtotal": "7500.00", "tax_amount": "1350.00", "total_amount": "8850.00",
+        })
+        self.assertEqual(hotel["max_guests"], 8)
+
+        self.assertFalse(self.quote(guests=9).data["results"][1]["available"])
+        later = self.quote(check_in=self.check_in + timedelta(days=2), check_out=self.check_in + timedelta(days=4))
+        self.assertTrue(later.data["results"][0]["available"])
+
+    def test_get_and_validation(self):
+        ids = f"{self.hotel.id},{self.small.id}"
+        response = self.client.get(f"/api/bookings/quotes/?listings={ids}&check_in={self.check_in}&check_out={self.check_in + timedelta(days=1)}")
+        self.assertEqual([row["listing"] for row in response.data["results"]], [self.hotel.id, self.small.id])
+        self.assertEqual(self.quote(check_out=self.check_in).status_code, 400)
+        self.assertEqual(self.quote(listings=list(range(1, 302))).status_code, 400)
+        self.assertEqual(self.quote(listings=[]).status_code, 400)
@@ -8,6 +8,11 @@ router.register(r"payments", views.PaymentViewSet, basename="payment")
 
 
 urlpatterns = [
+    # before the router, whose detail route would take "analytics" as a booking id
+    path("analytics/", views.HostAnalyticsView.as_view(), name="host-analytics"),
+    path("export/", views.HostBookingExportView.as_view(), name="host-booking-export"),
+    path("quotes/", views.BatchQuoteView.as_view(), name="batch-quotes"),
+    path("payments/events/", views.PaymentEventView.as_view(), name="payment-events"),
     path("", include(router.urls)), 
 
 ]
\ No newline at end of file
@@ -2,34 +2,99 @@ from django.shortcuts import render , redirect
 from datetime import date
 from rest_framework import viewsets, status 
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated  
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response 
 from rest_framework.decorators import permission_classes
-from rest_framework_simplejwt import authentication
+from airbnbapi.authentication import CachedJWTAuthentication
+from airbnbapi import exports
 from .models import Booking, BookingStatus, Payment , PaymentStatus
-from .serializers import BookingSerializer, PaymentSerializer
-from .permissions import IsBookingOwnerOrHost
-from django.db.models import Q
-from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
+from listings.models import HotelsListing
+from .serializers import BatchQuoteQuerySerializer, BookingSerializer, HostAnalyticsQuerySerializer, PaymentSerializer
+from .permissions import IsBookingOwnerOrHost, IsHost, IsPaymentProvider
+from . import analytics, availability, payment_events, pricing
+from airbnbapi.fast_serializers import FastListMixin
+from airbnbapi.metrics import SerializeTimingMixin
+from airbnbapi.pagination import KeysetPagination
+from .fast_serializers import FastBookingSerializer
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.settings import api_settings
 from datetime import date
 from django.urls import reverse
 from decimal import Decimal
+from collections import Counter
 
 # Create your views here.
 
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+def reserve(write):
+    """availability.reserve(), with nights taken meanwhile answered as a 400."""
+    try:
+        return availability.reserve(write)
+    except availability.Unavailable:
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ["Those dates are not available."]}) from None
+
+
+def apply_payment(request, booking_id, data):
+    """
+    Apply a client's payment result to a booking like a provider event
+    (see payment_events.py): the status must be paid, failed or refunded, and
+    an Idempotency-Key header, if sent, is the event id. Raises ValidationError
+    or NotFound when the event is rejected.
+    """
+    event = {
+        "booking": booking_id,
+        **{key: data[key] for key in ("status", "payment_method", "provider_payment_id", "amount") if key in data},
+    }
+    if request.headers.get("Idempotency-Key"):
+        event["event_id"] = request.headers["Idempotency-Key"]
+    result = payment_events.ingest([event])[0]
+    if result["result"] == payment_events.REJECTED:
+        if "errors" in result:
+            raise ValidationError(result["errors"])
+        raise NotFound("No Payment matches the given query.")
+    return result
+
+
+class ReserveOnSaveMixin:
+    """
+    Save bookings through reserve(): in one transaction, so a booking whose
+    nights were taken meanwhile is rolled back with its 400. An update's nested
+    `payment` is applied as a payment event in that same transaction.
+    """
+
+    def perform_create(self, serializer):
+        reserve(serializer.save)
+
+    def perform_update(self, serializer):
+        payment = self.request.data.get("payment")
+
+        def save():
+            booking = serializer.save()
+            if payment:
+                apply_payment(self.request, booking.pk, payment)
+                # the event may have moved the booking's status and its payment
+                booking.refresh_from_db()
+            return booking
+
+        return reserve(save)
+
+
+class BookingViewSet(ReserveOnSaveMixin, FastListMixin, SerializeTimingMixin, viewsets.ModelViewSet):
     serializer_class = BookingSerializer
-    authentication_classes = [authentication.JWTAuthentication]
+    fast_serializer_class = FastBookingSerializer
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         role = self.request.query_params.get("role")
         qs = (
-            Booking.objects.select_related("listing", "user", "listing__host_id")
+            Booking.objects.select_related("listing", "user", "listing__host_id", "payment")
             .all()
-            .order_by("-created_at")
+            .order_by("-created_at", "-id")
         )
         if role == "host":
             return qs.filter(listing__host_id=self.request.user)
@@ -38,7 +103,6 @@ class BookingViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         check_in = serializer.validated_data["check_in"]
         check_out = serializer.validated_data["check_out"]
-        listing = serializer.validated_data["listing"]
 
         # ❌ Check-in in the past
         if check_in < date.today():
@@ -48,89 +112,117 @@ class BookingViewSet(viewsets.ModelViewSet):
         if check_out <= check_in:
             raise ValidationError({"detail": "Check-out must be after check-in."})
 
-        # ❌ Overlapping bookings
-        overlap = Booking.objects.filter(
-            listing=listing,
-            status__in=[BookingStatus.CONFIRMED, BookingStatus.PENDING],
-        ).filter(Q(check_in__lt=check_out) & Q(check_out__gt=check_in))
+        # Overlapping bookings are rejected once, in BookingSerializer.validate
 
-        if overlap.exists():
-            raise ValidationError(
-                {"detail": "This listing is already booked for the selected dates."}
+        def save():
+            # ✅ Save booking; BookingSerializer.create stores its quote (bookings/pricing.py)
+            booking = serializer.save(
+                user=self.request.user,
+                status=BookingStatus.PENDING,
             )
 
-        # ✅ Calculate total and tax
-        nights = (check_out - check_in).days
-        subtotal = listing.price_per_night * nights
-        tax_rate = 0.18
-        tax_amount = subtotal * tax_rate
-        total_amount = subtotal + tax_amount
-
-        # ✅ Save booking
-        booking = serializer.save(
-            user=self.request.user,
-            status=BookingStatus.PENDING,
-            total_price=total_amount,
-        )
-
-        # ✅ Create pending payment if not exists
-        Payment.objects.get_or_create(
-            booking=booking,
-            defaults={
-                "amount": total_amount,
-                "status": PaymentStatus.PENDING,
-                "payment_method": "upi",  # optional default
-            },
-        )
-
-        return booking
-
-    def perform_update(self, serializer):
-        """
-        ✅ Allow partial booking update — example: confirming payment or changing dates.
-        """
-        booking = serializer.save()
-
-        # ✅ If payment data is nested, update it inside serializer (handled automatically)
-        payment_data = self.request.data.get("payment")
-        if payment_data:
-            payment, _ = Payment.objects.update_or_create(
+            # ✅ Create pending payment if not exists
+            Payment.objects.get_or_create(
                 booking=booking,
                 defaults={
-                    "amount": payment_data.get("amount", str(Decimal(booking.total_price) + Decimal(booking.total_price * Decimal(0.18)) )),
-                    "status": payment_data.get("status", PaymentStatus.PENDING),
-                    "payment_method": payment_data.get("payment_method", "upi"),
-                    "provider_payment_id": payment_data.get("provider_payment_id"),
+                    "amount": booking.total_amount,
+                    "status": PaymentStatus.PENDING,
+                    "payment_method": "upi",  # optional default
                 },
             )
+            return booking
 
-            # ✅ Auto-confirm booking if payment is PAID
-            if payment.status == PaymentStatus.PAID:
-                booking.status = BookingStatus.CONFIRMED
-                booking.save(update_fields=["status"])
-                
-                return serializer
-            return serializer
+        # the availability check in validate() can race; the night constraint settles it
+        booking = reserve(save)
 
+        return booking
 
 
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class HostAnalyticsView(APIView):
+    """
+    Occupancy, revenue by month, average daily rate and cancellation rate for
+    the caller's listings, read from the daily summaries (?start=&end=&listing=).
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsHost]
+
+    def get(self, request):
+        params = HostAnalyticsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        listings = HotelsListing.objects.filter(host_id=request.user).only("id", "title", "multiple_rooms").order_by("id")
+        if "listing" in query:
+            listings = listings.filter(pk=query["listing"])
+        return Response(analytics.report(list(listings), query["start"], query["end"]))
+
+
+class HostBookingExportView(APIView):
+    """
+    Stream every booking on the caller's listings as NDJSON or CSV
+    (?format=ndjson|csv, optional ?start=&end= on created_at).
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsHost]
+    renderer_classes = [exports.NDJSONRenderer, exports.CSVRenderer]
+
+    def get(self, request):
+        params = exports.ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        export = exports.EXPORTS["bookings"]
+        return exports.stream(
+            export,
+            request.accepted_renderer.format,
+            queryset=export.queryset().filter(listing__host_id=request.user),
+            filename=f"bookings-host-{request.user.pk}-{date.today().isoformat()}",
+            **params.validated_data,
+        )
+
+
+class BatchQuoteView(APIView):
+    """
+    Availability and the price of one stay for many listings at once, for
+    result and trip pages: GET ?listings=1,2,3&check_in=&check_out=&guests=
+    or the same fields as a JSON body in a POST. Two queries in all.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        data = request.query_params.dict()
+        data["listings"] = [pk for value in request.query_params.getlist("listings") for pk in value.split(",") if pk]
+        return self.quote(data)
+
+    def post(self, request):
+        return self.quote(request.data)
+
+    def quote(self, data):
+        params = BatchQuoteQuerySerializer(data=data)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        results, missing = pricing.quote_listings(query["listings"], query["check_in"], query["check_out"], query.get("guests"))
+        return Response({
+            "check_in": query["check_in"],
+            "check_out": query["check_out"],
+            "guests": query.get("guests"),
+            "results": [results[pk] for pk in query["listings"] if pk in results],
+            "missing": missing,
+        })
+
+
+class PaymentViewSet(SerializeTimingMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
-    authentication_classes = [authentication.JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
     def retrieve(self , request, pk):
         try :
+            # the amount was fixed when the booking was quoted; reading it never writes
             payment = Payment.objects.get(booking_id = pk)
-            booking = payment.booking
-            price = int(booking.total_price)
-            payment.amount = price
-           
-            payment.save(update_fields=["amount"])
-            serializer = PaymentSerializer(payment)
+            serializer = self.get_serializer(payment)
             
             return Response(serializer.data)
             
@@ -138,36 +230,28 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Response({"detail": "No Payment matches the given query."}, status=status.HTTP_404_NOT_FOUND)
     
     def update(self, request, pk):
-        
-        try:
-            
-            payment = Payment.objects.get(booking_id=pk)
-            
-            status = request.data.get("status")
-            payment_method =  request.data.get("payment_method")
-            provider_payment_id =  request.data.get("provider_payment_id")
-            amount = request.data.get("amount")
-            if status == "paid":
-                payment.status = PaymentStatus.PAID
-                payment.payment_method = payment_method
-                payment.provider_payment_id = provider_payment_id
-                payment.amount = amount
-                payment.save(update_fields=["status" ,'payment_method','provider_payment_id'])
-                booking = payment.booking
-                booking.status = BookingStatus.CONFIRMED
-                booking.total_price = str(amount)
-                
-                
-                booking.save(update_fields=["status" , "total_price"])
-            else:
-                payment.status = PaymentStatus.FAILED
-                payment.save(update_fields=["status"])
-                
-            serializer = PaymentSerializer(payment) 
-            return Response(serializer.data)
-        except Payment.DoesNotExist:
-            return Response({"detail": "No Payment matches the given query."}, status=status.HTTP_404_NOT_FOUND) 
-        
+        apply_payment(request, pk, request.data)
+        return Response(self.get_serializer(Payment.objects.get(booking_id=pk)).data)
+
+
+class PaymentEventView(APIView):
+    """
+    POST one payment provider event, or a list of up to max_events, each
+    applied once however often it is delivered (bookings/payment_events.py).
+    A single event may carry its id in an Idempotency-Key header instead.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsPaymentProvider]
+    max_events = 1000
 
-        
-        
+    def post(self, request):
+        if isinstance(request.data, list):
+            events = request.data
+        else:
+            events = [dict(request.data)]
+            if request.headers.get("Idempotency-Key"):
+                events[0].setdefault("event_id", request.headers["Idempotency-Key"])
+        if not events or len(events) > self.max_events:
+            raise ValidationError({"detail": f"Send between 1 and {self.max_events} events."})
+        results = payment_events.ingest(events)
+        return Response({"results": results, "counts": Counter(result["result"] for result in results)})
@@ -1,8 +1,9 @@
 from django.contrib import admin
-from listings.models import RoomList , HotelImages , HotelsListing , Location , Review
+from listings.models import RoomList , HotelImages , HotelsListing , Location , Review , ListingReviewStats
 # Register your models here.
 admin.site.register(RoomList)
 admin.site.register(HotelImages)
 admin.site.register(HotelsListing)
 admin.site.register(Location)
-admin.site.register(Review)
\ No newline at end of file
+admin.site.register(Review)
+admin.site.register(ListingReviewStats)
\ No newline at end of file
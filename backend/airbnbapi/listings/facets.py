@@ -0,0 +1,97 @@
+"""
+Amenity filters and filter-sidebar counts for listing searches.
+
+offersOrExtras is an array under a GIN index, so both amenity filters are
+index lookups:
+
+    ?amenities=wifi,pool       every one of them     offersOrExtras @> ARRAY[...]
+    ?amenities_any=wifi,pool   at least one of them  offersOrExtras && ARRAY[...]
+
+Amenities match exactly as stored (case and spacing included), which is what
+lets Postgres use the index; counts() returns the stored spellings to pick from.
+
+counts() answers a whole sidebar for the listings a search matches (total,
+per amenity, per city, per price bucket) in a single query: the matching
+rows are gathered once in a CTE and each facet is a GROUP BY over it, joined
+with UNION ALL.
+"""
+
+from django.conf import settings
+from django.db import connection
+from .models import HotelsListing, Location
+
+# Lower edges of the price buckets; the last bucket is open-ended
+PRICE_BUCKETS = (0, 1000, 2500, 5000, 10000, 20000)
+# Most values returned per facet, most common first
+MAX_VALUES = 50
+
+
+def price_buckets():
+    return tuple(getattr(settings, "LISTING_PRICE_BUCKETS", PRICE_BUCKETS))
+
+
+def filter_amenities(queryset, all_of=None, any_of=None):
+    """Listings offering every amenity in `all_of` and at least one in `any_of`."""
+    if all_of:
+        queryset = queryset.filter(offersOrExtras__contains=list(all_of))
+    if any_of:
+        queryset = queryset.filter(offersOrExtras__overlap=list(any_of))
+    return queryset
+
+
+def _values(rows):
+    rows = sorted(rows, key=lambda row: (-row[1], row[0]))
+    return [{"value": value, "count": count} for value, count in rows[:MAX_VALUES]]
+
+
+def counts(queryset):
+    """
+    Facet counts over the listings in `queryset`, in one query:
+    {"total", "amenities": [{value, count}], "cities": [{value, count}],
+    "price_buckets": [{min, max, count}]}. Every price bucket is listed, empty
+    ones with a count of 0; listings below the first edge count in the first.
+    """
+    edges = price_buckets()
+    matching, params = queryset.order_by().values("pk").query.sql_with_params()
+    qn = connection.ops.quote_name
+    listing, location = HotelsListing._meta, Location._meta
+    sql = f"""
+        WITH matched AS (
+            SELECT l.{qn(listing.get_field("offersOrExtras").column)} AS amenities,
+                   loc.{qn("city")} AS city,
+                   l.{qn(listing.get_field("price_per_night").column)} AS price
+            FROM {qn(listing.db_table)} l
+            JOIN {qn(location.db_table)} loc ON loc.{qn(location.pk.column)} = l.{qn(listing.get_field("location").column)}
+            WHERE l.{qn(listing.pk.column)} IN ({matching})
+        )
+        SELECT 'total', NULL, COUNT(*) FROM matched
+        UNION ALL
+        SELECT 'amenity', amenity, COUNT(*) FROM matched, unnest(amenities) AS amenity GROUP BY amenity
+        UNION ALL
+        SELECT 'city', city, COUNT(*) FROM matched GROUP BY city
+        UNION ALL
+        SELECT 'price', GREATEST(width_bucket(price, %s::integer[]), 1)::text, COUNT(*) FROM matched GROUP BY 2
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*params, list(edges)))
+        rows = cursor.fetchall()
+
+    total, amenities, cities, buckets = 0, [], [], {}
+    for facet, value, count in rows:
+        if facet == "total":
+            total = count
+        elif facet == "amenity":
+            amenities.append((value, count))
+        elif facet == "city":
+            cities.append((value, count))
+        else:
+            buckets[int(value)] = count
+    return {
+        "total": total,
+        "amenities": _values(amenities),
+        "cities": _values(cities),
+        "price_buckets": [
+            {"min": low, "max": edges[i + 1] if i + 1 < len(edges) else None, "count": buckets.get(i + 1, 0)}
+            for i, low in enumerate(edges)
+        ],
+    }
@@ -0,0 +1,71 @@
+from airbnbapi.fast_serializers import (
+    FastSerializer, as_bool, as_date, as_datetime, as_float, as_int, as_str, attr, nested, nested_many,
+)
+from . import review_stats
+
+# Plans mirror the DRF serializers in listings.serializers field for field.
+
+ROOM_PLAN = (
+    ("id", attr("id", as_int)),
+    ("bedroom", attr("bedroom", as_int)),
+    ("bathroom", attr("bathroom", as_int)),
+    ("beds", attr("beds", as_int)),
+    ("guest", attr("guest", as_int)),
+    ("booked_from", attr("booked_from", as_date)),
+    ("booked_to", attr("booked_to", as_date)),
+    ("is_reserved", attr("is_reserved", as_bool)),
+)
+
+LOCATION_PLAN = (
+    ("id", attr("id", as_int)),
+    ("city", attr("city", as_str)),
+    ("state", attr("state", as_str)),
+    ("country", attr("country", as_str)),
+    ("lat", attr("lat", as_float)),
+    ("lon", attr("lon", as_float)),
+)
+
+IMAGE_PLAN = (
+    ("id", attr("id", as_int)),
+    ("url", lambda image: image.image.url if image.image else None),
+    ("variants", attr("variants")),
+)
+
+
+def host_of(listing):
+    host = listing.host_id
+    if not host:
+        return None
+    return {"id": host.id, "username": host.username, "email": host.email, "role": host.role}
+
+
+def string_list(value):
+    return None if value is None else [str(item) for item in value]
+
+
+LISTING_PLAN = (
+    ("id", attr("id", as_int)),
+    ("title", attr("title", as_str)),
+    ("description", attr("description", as_str)),
+    ("multiple_rooms", attr("multiple_rooms", as_int)),
+    ("rooms", nested_many("rooms", ROOM_PLAN)),
+    ("location", nested("location", LOCATION_PLAN)),
+    ("address", attr("address", as_str)),
+    ("price_per_night", attr("price_per_night", as_int)),
+    ("offersOrExtras", attr("offersOrExtras", string_list)),
+    ("review_summary", review_stats.summary),
+    ("created_at", attr("created_at", as_datetime)),
+    ("updated_at", attr("updated_at", as_datetime)),
+    ("host", host_of),
+    ("images", nested_many("images", IMAGE_PLAN)),
+)
+
+
+class FastListingSerializer(FastSerializer):
+    """HotelsListingSerializer, read-only."""
+    plan = LISTING_PLAN
+
+
+class FastNearbyListingSerializer(FastSerializer):
+    """NearbyListingSerializer, read-only."""
+    plan = LISTING_PLAN + (("distance_km", attr("distance_km", as_float)),)
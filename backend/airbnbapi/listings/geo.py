@@ -0,0 +1,78 @@
+import math
+from django.db.models import F
+from django.db.models.functions import Cos, Power, Radians, Round, Sqrt
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Location.geo_cell splits the globe into CELL_DEGREES x CELL_DEGREES squares (~11 km at the equator).
+CELL_DEGREES = 0.1
+CELL_COLUMNS = round(360 / CELL_DEGREES)
+
+# Past this many cells an IN (...) list stops paying off and the (lat, lon) index is used alone.
+MAX_CELLS = 400
+
+
+def _row(lat):
+    return min(int((lat + 90) // CELL_DEGREES), round(180 / CELL_DEGREES) - 1)
+
+
+def _column(lon):
+    return int((lon + 180) // CELL_DEGREES) % CELL_COLUMNS
+
+
+def cell_for(lat, lon):
+    if lat is None or lon is None:
+        return None
+    return _row(lat) * CELL_COLUMNS + _column(lon)
+
+
+def cells_in_box(south, west, north, east):
+    """Grid cells covering the box, or None when there are too many to be worth listing."""
+    rows = range(_row(south), _row(north) + 1)
+    first, last = _column(west), _column(east)
+    if first <= last:
+        columns = list(range(first, last + 1))
+    else:  # box crosses the antimeridian
+        columns = list(range(first, CELL_COLUMNS)) + list(range(0, last + 1))
+    if len(rows) * len(columns) > MAX_CELLS:
+        return None
+    return [row * CELL_COLUMNS + column for row in rows for column in columns]
+
+
+def box_around(lat, lon, radius_km):
+    """(south, west, north, east) of the smallest box containing the circle."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if dlon >= 180:
+        return south, -180.0, north, 180.0
+    west = (lon - dlon + 180) % 360 - 180
+    east = (lon + dlon + 180) % 360 - 180
+    return south, west, north, east
+
+
+def in_box(queryset, south, west, north, east, prefix="location__"):
+    queryset = queryset.filter(**{f"{prefix}lat__gte": south, f"{prefix}lat__lte": north})
+    if west <= east:
+        queryset = queryset.filter(**{f"{prefix}lon__gte": west, f"{prefix}lon__lte": east})
+    else:
+        queryset = queryset.filter(**{f"{prefix}lon__gte": west}) | queryset.filter(**{f"{prefix}lon__lte": east})
+    cells = cells_in_box(south, west, north, east)
+    if cells is not None:
+        queryset = queryset.filter(**{f"{prefix}geo_cell__in": cells})
+    return queryset
+
+
+def distance_km(lat, lon, prefix="location__"):
+    """
+    Equirectangular distance from (lat, lon) as a database expression.
+    Accurate to well under 1% at city and region scale, and cheap enough to sort on.
+    The longitude difference is taken the short way round, across the antimeridian
+    if need be, to match box_around.
+    """
+    dlon = F(f"{prefix}lon") - lon
+    dlon = dlon - Round(dlon / 360.0) * 360.0
+    x = Radians(dlon) * Cos(Radians((F(f"{prefix}lat") + lat) / 2))
+    y = Radians(F(f"{prefix}lat") - lat)
+    return Sqrt(Power(x, 2) + Power(y, 2)) * EARTH_RADIUS_KM
@@ -0,0 +1,92 @@
+"""
+Where listing photos go.
+
+LISTING_IMAGE_STORAGE names the backend class. Backends implement
+upload(file, public_id=None) -> CloudinaryResource, so the result can be
+assigned to HotelImages.image directly (re-uploading to the same public_id
+replaces the file), and read(resource) -> bytes. CloudinaryImageStorage is the real one;
+LocalImageStorage writes to disk and is meant for tests and benchmarks.
+"""
+
+import os
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import cloudinary.uploader
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class CloudinaryImageStorage:
+    def upload(self, file, public_id=None):
+        # the same options CloudinaryField.pre_save would use
+        field = self.image_field()
+        options = {"type": field.type, "resource_type": field.resource_type, **field.options}
+        if public_id:
+            options.update(public_id=public_id, overwrite=True)
+        if hasattr(file, "seekable") and file.seekable():
+            file.seek(0)
+        return cloudinary.uploader.upload_resource(file, **options)
+
+    def read(self, resource):
+        with urllib.request.urlopen(resource.build_url(), timeout=30) as response:
+            return response.read()
+
+    @staticmethod
+    def image_field():
+        from .models import HotelImages
+        return HotelImages._meta.get_field("image")
+
+
+class LocalImageStorage:
+    """Write files under LISTING_IMAGE_LOCAL_ROOT; `latency` simulates a remote round trip."""
+
+    def __init__(self, root=None, latency=0):
+        self.root = root or getattr(settings, "LISTING_IMAGE_LOCAL_ROOT", os.path.join(settings.MEDIA_ROOT, "listing-images"))
+        self.latency = latency
+
+    def upload(self, file, public_id=None):
+        if self.latency:
+            time.sleep(self.latency)
+        ext = os.path.splitext(getattr(file, "name", "") or "")[1]
+        public_id = public_id or f"listings/{uuid.uuid4().hex}"
+        path = os.path.join(self.root, f"{public_id}{ext}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if hasattr(file, "seekable") and file.seekable():
+            file.seek(0)
+        with open(path, "wb") as out:
+            for chunk in file.chunks():
+                out.write(chunk)
+        return CloudinaryResource(public_id=public_id, format=ext.lstrip(".") or None, version="1", type="upload", resource_type="image")
+
+    def read(self, resource):
+        name = f"{resource.public_id}.{resource.format}" if resource.format else resource.public_id
+        with open(os.path.join(self.root, name), "rb") as f:
+            return f.read()
+
+
+def get_storage():
+    return import_string(getattr(settings, "LISTING_IMAGE_STORAGE", "listings.image_storage.CloudinaryImageStorage"))()
+
+
+def upload_many(files, storage=None, workers=None):
+    """
+    Upload `files` concurrently on a bounded thread pool.
+    Returns one (file, resource, error) per file, in the order given; exactly
+    one of resource/error is None.
+    """
+    storage = storage or get_storage()
+    workers = workers or getattr(settings, "LISTING_IMAGE_UPLOAD_WORKERS", 8)
+
+    def upload(file):
+        try:
+            return file, storage.upload(file), None
+        except Exception as exc:
+            return file, None, str(exc) or exc.__class__.__name__
+
+    if len(files) <= 1:
+        return [upload(file) for file in files]
+    with ThreadPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        return list(pool.map(upload, files))
@@ -0,0 +1,128 @@
+"""
+Resized copies of listing photos.
+
+Every HotelImages row gets the SIZES below in JPEG and WebP, uploaded next
+to the original under "<public_id>_<size>_<format>" and recorded in
+HotelImages.variants as {size: {"width", "height", "jpeg", "webp"}}.
+Generation runs after the upload response (LISTING_IMAGE_VARIANTS), and
+re-running it for an image overwrites the same files, so the backfill
+command can be repeated safely.
+
+Background jobs live in the worker's thread pool only: a job queued when
+the process exits or restarts is lost, and its images are left without
+variants (their `variants` stays {}). pending() finds those images and
+`manage.py backfill_image_variants` generates them; run it after deploys
+or on a schedule.
+"""
+
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from . import image_storage, response_cache
+from .models import HotelImages
+
+logger = logging.getLogger(__name__)
+
+# name: bounding box; images are scaled down to fit, never up
+SIZES = {
+    "thumb": (160, 160),
+    "card": (480, 360),
+    "gallery": (1280, 960),
+}
+FORMATS = {"jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}), "webp": ("WEBP", {"quality": 80, "method": 4})}
+
+_executor = None
+
+
+def render(data):
+    """Resize the original `data` (bytes) into {size: (width, height, {format: bytes})}."""
+    with Image.open(io.BytesIO(data)) as original:
+        original = ImageOps.exif_transpose(original).convert("RGB")
+        rendered = {}
+        for name, box in SIZES.items():
+            image = original.copy()
+            image.thumbnail(box, Image.LANCZOS)
+            encoded = {}
+            for key, (fmt, options) in FORMATS.items():
+                out = io.BytesIO()
+                image.save(out, fmt, **options)
+                encoded[key] = out.getvalue()
+            rendered[name] = (image.width, image.height, encoded)
+        return rendered
+
+
+def is_complete(variants):
+    return all(name in (variants or {}) and all(key in variants[name] for key in FORMATS) for name in SIZES)
+
+
+def pending():
+    """Images with an original but no complete set of variants, e.g. from a lost job."""
+    return (
+        HotelImages.objects.exclude(image__isnull=True).exclude(image="")
+        .exclude(variants__has_keys=list(SIZES)).order_by("pk")
+    )
+
+
+def generate(image, data=None, storage=None, force=False):
+    """Create and record the variants of one HotelImages row; skipped if it already has them."""
+    if not image.image or (is_complete(image.variants) and not force):
+        return False
+    storage = storage or image_storage.get_storage()
+    if data is None:
+        data = storage.read(image.image)
+
+    variants = {}
+    for name, (width, height, encoded) in render(data).items():
+        variants[name] = {"width": width, "height": height}
+        for key, payload in encoded.items():
+            # one public_id per file: Cloudinary ids ignore the extension
+            public_id = f"{image.image.public_id}_{name}_{key}"
+            resource = storage.upload(ContentFile(payload, name=f"{name}.{key}"), public_id=public_id)
+            variants[name][key] = resource.build_url()
+
+    HotelImages.objects.filter(pk=image.pk).update(variants=variants)
+    image.variants = variants
+    response_cache.bump_listings([image.hotel_id])
+    return True
+
+
+def _generate_all(image_ids):
+    storage = image_storage.get_storage()
+    for image in HotelImages.objects.filter(pk__in=image_ids):
+        try:
+            generate(image, storage=storage)
+        except Exception:
+            logger.exception("Could not generate variants for image %s", image.pk)
+
+
+def _generate_in_background(image_ids):
+    # worker threads get their own connection; don't leave it open between jobs
+    close_old_connections()
+    try:
+        _generate_all(image_ids)
+    finally:
+        close_old_connections()
+
+
+def schedule(images):
+    """
+    Generate variants for freshly uploaded `images` once the transaction commits.
+    Jobs hold image ids only and read each original back from storage, so
+    queued jobs don't keep upload bytes in memory.
+    """
+    mode = getattr(settings, "LISTING_IMAGE_VARIANTS", "background")
+    if mode == "off" or not images:
+        return
+    image_ids = [image.pk for image in images]
+    if mode == "inline":
+        transaction.on_commit(lambda: _generate_all(image_ids))
+        return
+
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=getattr(settings, "LISTING_IMAGE_VARIANT_WORKERS", 2), thread_name_prefix="image-variants")
+    transaction.on_commit(lambda: _executor.submit(_generate_in_background, image_ids))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from listings import image_storage, image_variants
+from listings.models import HotelImages
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized variants for listing images that don't have them yet, "
+        "including images whose background job was lost to a worker restart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--force", action="store_true", help="Regenerate images that already have variants.")
+
+    def handle(self, *args, **options):
+        storage = image_storage.get_storage()
+        if options["force"]:
+            images = HotelImages.objects.exclude(image__isnull=True).exclude(image="").order_by("pk")
+        else:
+            images = image_variants.pending()
+        done = failed = 0
+        for image in images.iterator(chunk_size=options["batch_size"]):
+            try:
+                generated = image_variants.generate(image, storage=storage, force=options["force"])
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"Image {image.pk}: {exc}")
+                continue
+            done += generated
+            if done and done % options["batch_size"] == 0:
+                self.stdout.write(f"{done} images done...")
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {done} images ({failed} failed)."))
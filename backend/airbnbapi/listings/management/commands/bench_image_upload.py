@@ -0,0 +1,37 @@
+import tempfile
+import time
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from listings.image_storage import LocalImageStorage, upload_many
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a multi-photo upload serially and through the upload pool, using the "
+        "local storage stand-in with a simulated per-file latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--files", type=int, default=20)
+        parser.add_argument("--size-kb", type=int, default=500)
+        parser.add_argument("--latency", type=float, default=0.3, help="Seconds per upload, like a Cloudinary round trip.")
+        parser.add_argument("--workers", type=int, default=8)
+
+    def handle(self, *args, **options):
+        payload = b"\0" * options["size_kb"] * 1024
+        files = [SimpleUploadedFile(f"photo{i}.jpg", payload, "image/jpeg") for i in range(options["files"])]
+
+        with tempfile.TemporaryDirectory() as root:
+            storage = LocalImageStorage(root=root, latency=options["latency"])
+            serial = self.timed(lambda: upload_many(files, storage, workers=1))
+            pooled = self.timed(lambda: upload_many(files, storage, workers=options["workers"]))
+
+        self.stdout.write(
+            f"{options['files']} files: serial {serial:.2f}s, "
+            f"{options['workers']} workers {pooled:.2f}s ({serial / pooled:.1f}x)"
+        )
+
+    def timed(self, run):
+        started = time.perf_counter()
+        run()
+        return time.perf_counter() - started
@@ -0,0 +1,124 @@
+import json
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from bookings.fast_serializers import FastBookingSerializer
+from bookings.models import Booking, Payment, PaymentStatus
+from bookings.serializers import BookingSerializer
+from listings.fast_serializers import FastListingSerializer
+from listings.models import HotelImages, HotelsListing, ListingReviewStats, Location, RoomList
+from listings.serializers import HotelsListingSerializer
+
+Users = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/second of the DRF serializers and the fast read path for "
+        "listings and bookings. Seeds rows inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+        parser.add_argument("--repeat", type=int, default=3, help="Best of N runs per serializer.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options["sizes"]:
+            with transaction.atomic():
+                listing_ids, booking_ids = self.seed(size)
+                listings = list(
+                    HotelsListing.objects.filter(pk__in=listing_ids)
+                    .select_related("location", "host_id", "review_stats")
+                    .prefetch_related("rooms", "images")
+                    .order_by("id")
+                )
+                bookings = list(
+                    Booking.objects.filter(pk__in=booking_ids)
+                    .select_related("listing", "user", "listing__host_id", "payment")
+                    .order_by("id")
+                )
+                results.append(self.compare("listings", size, listings, HotelsListingSerializer, FastListingSerializer, options["repeat"]))
+                results.append(self.compare("bookings", size, bookings, BookingSerializer, FastBookingSerializer, options["repeat"]))
+                transaction.set_rollback(True)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'kind':<10}{'rows':>8}{'drf rows/s':>14}{'fast rows/s':>14}{'speed-up':>10}  identical")
+        for r in results:
+            self.stdout.write(
+                f"{r['kind']:<10}{r['rows']:>8}{r['drf_rows_per_sec']:>14.0f}{r['fast_rows_per_sec']:>14.0f}"
+                f"{r['speedup']:>9.1f}x  {r['identical']}"
+            )
+
+    def compare(self, kind, size, objects, drf_class, fast_class, repeat):
+        renderer = JSONRenderer()
+        drf_time, drf_body = self.best_of(repeat, lambda: renderer.render(drf_class(objects, many=True).data))
+        fast_time, fast_body = self.best_of(repeat, lambda: renderer.render(fast_class(objects).data))
+        return {
+            "kind": kind,
+            "rows": size,
+            "drf_rows_per_sec": size / drf_time,
+            "fast_rows_per_sec": size / fast_time,
+            "speedup": drf_time / fast_time,
+            "identical": drf_body == fast_body,
+        }
+
+    def best_of(self, repeat, render):
+        best, body = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = render()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, body
+
+    def seed(self, size):
+        tag = f"bench{time.time_ns()}"
+        host = Users.objects.create_user(username=f"{tag}-host", email=f"{tag}-host@example.com", password=tag, role="HO")
+        guest = Users.objects.create_user(username=f"{tag}-guest", email=f"{tag}-guest@example.com", password=tag)
+        locations = Location.objects.bulk_create([
+            Location(city=f"City {i}", state="State", country="India", lat=10 + i, lon=70 + i) for i in range(20)
+        ])
+
+        listings = HotelsListing.objects.bulk_create([
+            HotelsListing(
+                title=f"Listing {i}", description="A quiet place to stay.", location=locations[i % 20],
+                address=f"{i} Main Road", price_per_night=1000 + i % 500, host_id=host,
+                offersOrExtras=["Wifi", "Kitchen"],
+            )
+            for i in range(size)
+        ], batch_size=1000)
+        rooms = RoomList.objects.bulk_create([RoomList(guest=2 + i % 3) for i in range(size)], batch_size=1000)
+        HotelsListing.rooms.through.objects.bulk_create([
+            HotelsListing.rooms.through(hotelslisting_id=listing.id, roomlist_id=room.id)
+            for listing, room in zip(listings, rooms)
+        ], batch_size=1000)
+        HotelImages.objects.bulk_create([
+            HotelImages(hotel=listing, image=f"bench/{listing.id}.jpg") for listing in listings
+        ], batch_size=1000)
+        ListingReviewStats.objects.bulk_create([
+            ListingReviewStats(listing=listing, review_count=3, rating_sum=13, cleanliness_sum=9, cleanliness_count=2, rating_4=2, rating_5=1)
+            for listing in listings[::2]
+        ], batch_size=1000)
+
+        check_in = date.today() + timedelta(days=30)
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                listing=listings[i % size], user=guest, check_in=check_in + timedelta(days=i % 300),
+                check_out=check_in + timedelta(days=i % 300 + 2),
+                total_price=Decimal("2000.00"), tax_amount=Decimal("360.00"), total_amount=Decimal("2360.00"),
+            )
+            for i in range(size)
+        ], batch_size=1000)
+        Payment.objects.bulk_create([
+            Payment(booking=booking, amount=booking.total_amount, status=PaymentStatus.PAID, payment_method="card")
+            for booking in bookings[::2]
+        ], batch_size=1000)
+        return [listing.id for listing in listings], [booking.id for booking in bookings]
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from listings.models import RoomList
+
+
+class Command(BaseCommand):
+    help = "Delete RoomList rows that no listing uses any more, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the orphaned rooms.")
+
+    def handle(self, *args, **options):
+        orphans = RoomList.objects.filter(hotels__isnull=True)
+        if options["dry_run"]:
+            self.stdout.write(f"{orphans.count()} orphaned rooms.")
+            return
+
+        batch_size = options["batch_size"]
+        deleted, last_id = 0, 0
+        while True:
+            ids = list(orphans.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                # re-check inside the transaction in case a listing picked one up meanwhile
+                _, per_model = orphans.filter(pk__in=ids).delete()
+            deleted += per_model.get(RoomList._meta.label, 0)
+            self.stdout.write(f"Deleted {deleted} orphaned rooms so far.")
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} orphaned rooms."))
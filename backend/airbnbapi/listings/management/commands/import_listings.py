@@ -0,0 +1,163 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from listings import response_cache, text_search
+from listings.geo import cell_for
+from listings.models import HotelsListing, Location, RoomList
+from listings.serializers import HotelsListingSerializer
+
+Users = get_user_model()
+
+LOCATION_FIELDS = ("city", "state", "country", "lat", "lon")
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import listings from a CSV or JSONL file in chunks. Rows use the same "
+        "shape as POST /api/listings/ (CSV: flat city/state/country/lat/lon columns, "
+        "'|'-separated offersOrExtras, rooms as JSON). Progress is checkpointed after "
+        "each chunk so an interrupted import can be continued with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--host", help="Username of the host for rows without a 'host' column.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--resume", action="store_true", help="Skip the rows a previous run already imported.")
+        parser.add_argument("--state-file", help="Checkpoint file (default: <path>.import-state).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        chunk_size = options["chunk_size"]
+        self.state_file = options["state_file"] or f"{path}.import-state"
+
+        self.locations = {
+            tuple(values[1:]): values[0]
+            for values in Location.objects.order_by("-id").values_list("id", *LOCATION_FIELDS).iterator()
+        }
+        self.hosts = {}
+        # one bound serializer validates every row; building its fields per row costs more than the inserts
+        self.validator = HotelsListingSerializer()
+        self.default_host = None
+        if options["host"]:
+            self.default_host = self.host_id(options["host"])
+            if self.default_host is None:
+                raise CommandError(f"Unknown host '{options['host']}'.")
+
+        state = {"rows": 0, "imported": 0, "skipped": 0}
+        if options["resume"] and os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+            self.stdout.write(f"Resuming after row {state['rows']}.")
+
+        started = time.perf_counter()
+        imported_now = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = self.read_rows(f, fmt)
+            rows = islice(rows, state["rows"], None)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                listings, skipped = self.import_chunk(chunk, first_row=state["rows"] + 1)
+                state["rows"] += len(chunk)
+                state["imported"] += listings
+                state["skipped"] += skipped
+                imported_now += listings
+                self.save_state(state)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{state['rows']} rows read, {state['imported']} imported, {state['skipped']} skipped "
+                    f"({imported_now / elapsed:.0f} listings/s)"
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported_now} listings in {elapsed:.1f}s ({imported_now / max(elapsed, 1e-9):.0f} listings/s); "
+            f"{state['imported']} imported and {state['skipped']} skipped in total."
+        ))
+
+    def read_rows(self, f, fmt):
+        if fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        for row in csv.DictReader(f):
+            row = {key: value for key, value in row.items() if value not in (None, "")}
+            row["location"] = {field: row.pop(field) for field in LOCATION_FIELDS if field in row}
+            if "offersOrExtras" in row:
+                row["offersOrExtras"] = [item.strip() for item in row["offersOrExtras"].split("|") if item.strip()]
+            if "rooms" in row:
+                row["rooms"] = json.loads(row["rooms"])
+            yield row
+
+    def host_id(self, username):
+        if username not in self.hosts:
+            self.hosts[username] = Users.objects.filter(username=username).values_list("id", flat=True).first()
+        return self.hosts[username]
+
+    def import_chunk(self, chunk, first_row):
+        valid, skipped = [], 0
+        for number, row in enumerate(chunk, start=first_row):
+            host_id = self.host_id(row["host"]) if row.get("host") else self.default_host
+            try:
+                data = self.validator.run_validation(row)
+            except ValidationError as exc:
+                self.stderr.write(f"Row {number}: {json.dumps(exc.detail)}")
+                skipped += 1
+                continue
+            if host_id is None:
+                self.stderr.write(f"Row {number}: unknown host {row.get('host')!r}")
+                skipped += 1
+                continue
+            valid.append((data, host_id))
+
+        with transaction.atomic():
+            new_locations = {}
+            for data, _ in valid:
+                key = tuple(data["location"].get(field, None if field in ("lat", "lon") else "") for field in LOCATION_FIELDS)
+                if key not in self.locations and key not in new_locations:
+                    # bulk_create skips Location.save(), so fill in the grid cell here
+                    values = dict(zip(LOCATION_FIELDS, key))
+                    new_locations[key] = Location(**values, geo_cell=cell_for(values["lat"], values["lon"]))
+                data["location_key"] = key
+            Location.objects.bulk_create(new_locations.values())
+
+            listings, rooms = [], []
+            for data, host_id in valid:
+                key = data.pop("location_key")
+                location_id = self.locations[key] if key in self.locations else new_locations[key].id
+                room_rows = data.pop("rooms")
+                data.pop("location")
+                listings.append(HotelsListing(location_id=location_id, host_id_id=host_id, **data))
+                rooms.append([RoomList(**{k: v for k, v in room.items() if k != "id"}) for room in room_rows])
+            HotelsListing.objects.bulk_create(listings)
+            RoomList.objects.bulk_create([room for listing_rooms in rooms for room in listing_rooms])
+            HotelsListing.rooms.through.objects.bulk_create([
+                HotelsListing.rooms.through(hotelslisting_id=listing.id, roomlist_id=room.id)
+                for listing, listing_rooms in zip(listings, rooms)
+                for room in listing_rooms
+            ])
+            # bulk_create sends no signals: index the new text and invalidate cached listing reads wholesale
+            text_search.update([listing.id for listing in listings])
+            response_cache.bump_all()
+
+        # only remember new locations once their transaction has committed
+        self.locations.update({key: location.id for key, location in new_locations.items()})
+        return len(listings), skipped
+
+    def save_state(self, state):
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
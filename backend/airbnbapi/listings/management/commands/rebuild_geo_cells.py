@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from listings.geo import cell_for
+from listings.models import Location
+
+
+class Command(BaseCommand):
+    help = "Recompute Location.geo_cell from lat/lon (after importing coordinates or changing the grid)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        batch, changed = [], 0
+        for location in Location.objects.only("id", "lat", "lon", "geo_cell").iterator(chunk_size=batch_size):
+            cell = cell_for(location.lat, location.lon)
+            if cell != location.geo_cell:
+                location.geo_cell = cell
+                batch.append(location)
+            if len(batch) >= batch_size:
+                changed += Location.objects.bulk_update(batch, ["geo_cell"])
+                batch = []
+        changed += Location.objects.bulk_update(batch, ["geo_cell"])
+        self.stdout.write(self.style.SUCCESS(f"Updated geo_cell on {changed} locations."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from listings import review_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-listing review totals from the Review table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("listing_ids", nargs="*", type=int, help="Only rebuild these listings.")
+
+    def handle(self, *args, **options):
+        rebuilt = review_stats.rebuild(options["listing_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt review stats for {rebuilt} listings."))
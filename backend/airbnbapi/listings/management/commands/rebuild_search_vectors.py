@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from listings import text_search
+
+
+class Command(BaseCommand):
+    help = "Recompute the full-text search document of every listing (?q= search)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not text_search.is_supported():
+            self.stdout.write("This database has no tsvector; ?q= search scans the text columns instead.")
+            return
+        rows = text_search.rebuild(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search vectors for {rows} listings."))
@@ -1,10 +1,14 @@
 from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
 import cloudinary
 import cloudinary.uploader
 import cloudinary.models
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 # Create your models here.
 from django.contrib.auth import get_user_model
+from .geo import cell_for
 
 Users=get_user_model()
 
@@ -29,11 +33,27 @@ class Location(models.Model):
     city = models.CharField(max_length=100,blank=True)
     state = models.CharField(max_length=100,blank=True)
     country = models.CharField(max_length=100,blank=True)
-    lat = models.CharField(default="20.648605079085772")
-    lon = models.CharField(default="85.58521124492003")
+    lat = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    lon = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    # Grid cell of (lat, lon), see listings.geo
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["geo_cell"]),
+            models.Index(fields=["lat", "lon"]),
+        ]
+
     def __str__(self):
 
         return ", ".join([p for p in [self.city, self.state, self.country] if p])
+
+    def save(self, *args, **kwargs):
+        self.geo_cell = cell_for(self.lat, self.lon)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"lat", "lon"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geo_cell"}
+        super().save(*args, **kwargs)
   
 
 class HotelsListing(models.Model):
@@ -53,7 +73,16 @@ class HotelsListing(models.Model):
         blank=True,
         default=list
     )
-    
+    # weighted title/location/description/address document, kept by listings.text_search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="listing_search_vector"),
+            # ?amenities= / ?amenities_any= (contains / overlaps), see listings.facets
+            GinIndex(fields=["offersOrExtras"], name="listing_offers_gin"),
+        ]
+
     def __str__(self):
         return f'{self.title} --- {self.host_id.username}'
     
@@ -64,6 +93,8 @@ class HotelsListing(models.Model):
 class HotelImages(models.Model):
     hotel = models.ForeignKey(HotelsListing , on_delete=models.CASCADE , related_name="images")
     image =cloudinary.models.CloudinaryField('image', blank=True, null=True)  # Cloudinary image
+    # resized copies, filled in after upload by listings.image_variants
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f'Images of {self.hotel.title}'
@@ -84,13 +115,43 @@ class Review(models.Model):
     cleanliness = models.IntegerField(null=True, blank=True)
     location = models.IntegerField(null=True, blank=True)
     service = models.IntegerField(null=True, blank=True) 
-    rating = models.PositiveSmallIntegerField(default=3)  # 1-5 scale
+    rating = models.PositiveSmallIntegerField(default=3, validators=[MinValueValidator(1), MaxValueValidator(5)])  # 1-5 scale
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ("hotel", "user")  # ❌ one user cannot review same hotel twice
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["hotel", "-created_at", "-id"]),
+        ]
 
     def __str__(self):
         return f"Review({self.user.username} -- {self.hotel.title})"
+
+
+
+class ListingReviewStats(models.Model):
+    """
+    Running review totals for a listing, kept in step with Review writes by
+    listings.review_stats so list endpoints never aggregate reviews per request.
+    """
+    listing = models.OneToOneField(HotelsListing, on_delete=models.CASCADE, primary_key=True, related_name="review_stats")
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # sub-scores are optional, so each keeps its own count
+    cleanliness_sum = models.IntegerField(default=0)
+    cleanliness_count = models.PositiveIntegerField(default=0)
+    location_sum = models.IntegerField(default=0)
+    location_count = models.PositiveIntegerField(default=0)
+    service_sum = models.IntegerField(default=0)
+    service_count = models.PositiveIntegerField(default=0)
+    # rating histogram
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Review stats for listing {self.listing_id}"
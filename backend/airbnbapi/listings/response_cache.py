@@ -0,0 +1,125 @@
+"""
+Rendered-response cache for anonymous listing reads.
+
+Entries are never deleted one by one. Each cached view reads a few version
+counters ("scopes") and puts them in its key, and writes bump the counters:
+
+    listings        any listing, room, image, review or location change
+    listing:<id>    a change to that one listing (detail pages)
+    availability    a booking that holds or frees nights (search results)
+    epoch           bulk rebuilds and imports; part of every key
+
+Bumping a counter makes every key built from the old value unreachable, and
+the cache backend expires those entries on its own.
+"""
+
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+from airbnbapi import metrics
+
+PREFIX = "listing-cache"
+ALL_LISTINGS = "listings"
+AVAILABILITY = "availability"
+EPOCH = "epoch"
+
+
+def listing_scope(listing_id):
+    return f"listing:{listing_id}"
+
+
+def _version_key(scope):
+    return f"{PREFIX}:v:{scope}"
+
+
+def versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, 1, timeout=None)
+            found[key] = cache.get(key, 1)
+    return [found[key] for key in keys]
+
+
+def _incr(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+
+
+def bump(*scopes):
+    # After commit, so a concurrent read can't re-cache the old rows under the new version
+    keys = [_version_key(scope) for scope in scopes]
+    transaction.on_commit(lambda: _incr(keys))
+
+
+def bump_listings(listing_ids=()):
+    bump(ALL_LISTINGS, *(listing_scope(listing_id) for listing_id in set(listing_ids)))
+
+
+def bump_availability():
+    bump(AVAILABILITY)
+
+
+def bump_all():
+    bump(EPOCH)
+
+
+class CachedReadMixin:
+    """
+    Serve GETs from the response cache and answer `If-None-Match` with 304.
+
+    Only anonymous JSON reads are cached, unless the view sets `cache_shared`
+    (its response is the same for every caller); the key covers the view, the
+    full query string, the caller's role and the version of every scope the
+    view depends on (see `get_cache_scopes`).
+    """
+    cache_scopes = (ALL_LISTINGS,)
+    cache_shared = False
+
+    def get_cache_scopes(self):
+        return self.cache_scopes
+
+    def get_cache_timeout(self):
+        return getattr(settings, "LISTING_CACHE_TIMEOUT", 300)
+
+    def get_cache_key(self, request):
+        if (request.user.is_authenticated and not self.cache_shared) or request.accepted_renderer.format != "json":
+            return None
+        params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.lists()))
+        digest = hashlib.sha1(f"{request.path}?{params}".encode()).hexdigest()
+        scope_versions = ".".join(str(v) for v in versions((EPOCH, *self.get_cache_scopes())))
+        role = "all" if self.cache_shared else "anon"
+        return f"{PREFIX}:{self.__class__.__name__}:{role}:{scope_versions}:{digest}"
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        if key is None:
+            return super().get(request, *args, **kwargs)
+
+        cached = cache.get(key)
+        if cached is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            with metrics.timing():
+                body = JSONRenderer().render(response.data)
+            cached = (quote_etag(hashlib.sha1(body).hexdigest()), body)
+            cache.set(key, cached, timeout=self.get_cache_timeout())
+
+        etag, body = cached
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Vary"] = "Accept, Authorization"
+        response["Cache-Control"] = "no-cache"
+        return response
@@ -0,0 +1,87 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from .models import ListingReviewStats, Review
+from . import response_cache
+
+SUB_SCORES = ("cleanliness", "location", "service")
+RATINGS = range(1, 6)
+
+
+def contribution(review):
+    """What a single review adds to its listing's totals."""
+    if review is None:
+        return {}
+    totals = {"review_count": 1, "rating_sum": review.rating, f"rating_{review.rating}": 1}
+    for score in SUB_SCORES:
+        value = getattr(review, score)
+        if value is not None:
+            totals[f"{score}_sum"] = value
+            totals[f"{score}_count"] = 1
+    return totals
+
+
+def apply_change(listing_id, before=None, after=None):
+    """
+    Move a listing's totals from `before` to `after`, both results of contribution().
+    Pass before={} for a new review and after={} for a deleted one. The Review
+    signals call this on every save and delete (listings/signals.py).
+    """
+    before, after = before or {}, after or {}
+    deltas = {field: after.get(field, 0) - before.get(field, 0) for field in {*before, *after}}
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    with transaction.atomic():
+        if ListingReviewStats.objects.filter(listing_id=listing_id).update(**changes) or not after:
+            # nothing to take away from a missing row (e.g. the listing is being deleted too)
+            return
+        ListingReviewStats.objects.get_or_create(listing_id=listing_id)
+        ListingReviewStats.objects.filter(listing_id=listing_id).update(**changes)
+
+
+def rebuild(listing_ids=None):
+    """Recompute totals from the Review table, for all listings or the given ones."""
+    reviews = Review.objects.all()
+    if listing_ids is not None:
+        reviews = reviews.filter(hotel_id__in=listing_ids)
+
+    aggregates = {
+        "review_count": Count("id"),
+        "rating_sum": Sum("rating"),
+        **{f"rating_{r}": Count("id", filter=Q(rating=r)) for r in RATINGS},
+    }
+    for score in SUB_SCORES:
+        aggregates[f"{score}_sum"] = Sum(score)
+        aggregates[f"{score}_count"] = Count(score)
+
+    rows = [
+        ListingReviewStats(listing_id=row.pop("hotel_id"), **{k: v or 0 for k, v in row.items()})
+        for row in reviews.order_by().values("hotel_id").annotate(**aggregates)
+    ]
+    stale = ListingReviewStats.objects.all()
+    if listing_ids is not None:
+        stale = stale.filter(listing_id__in=listing_ids)
+    with transaction.atomic():
+        stale.delete()
+        ListingReviewStats.objects.bulk_create(rows, batch_size=1000)
+    response_cache.bump_all()
+    return len(rows)
+
+
+def _average(total, count):
+    return round(total / count, 2) if count else None
+
+
+def summary(listing):
+    try:
+        stats = listing.review_stats
+    except ObjectDoesNotExist:
+        stats = ListingReviewStats()
+    return {
+        "count": stats.review_count,
+        "rating": _average(stats.rating_sum, stats.review_count),
+        **{score: _average(getattr(stats, f"{score}_sum"), getattr(stats, f"{score}_count")) for score in SUB_SCORES},
+        "histogram": {str(r): getattr(stats, f"rating_{r}") for r in RATINGS},
+    }
@@ -1,5 +1,8 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import HotelsListing, HotelImages, Location, RoomList , Review
+from . import response_cache, review_stats
 
 
 class LocationSerializer(serializers.ModelSerializer):
@@ -7,8 +10,17 @@ class LocationSerializer(serializers.ModelSerializer):
         model = Location
         fields = ["id", "city", "state", "country" , "lat","lon"]
 
+    def to_internal_value(self, data):
+        # the host form sends "" for coordinates it doesn't know yet
+        if hasattr(data, "get") and (data.get("lat") == "" or data.get("lon") == ""):
+            data = {**data, "lat": data.get("lat") or None, "lon": data.get("lon") or None}
+        return super().to_internal_value(data)
+
 
 class RoomSerializer(serializers.ModelSerializer):
+    # writable so a listing update can say which existing room an entry edits
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = RoomList
         fields = ["id", "bedroom", "bathroom", "beds", "guest", "booked_from", "booked_to", "is_reserved"]
@@ -16,10 +28,12 @@ class RoomSerializer(serializers.ModelSerializer):
 
 class HotelImageSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
+    # {"thumb"|"card"|"gallery": {"width", "height", "jpeg", "webp"}}, empty until generated
+    variants = serializers.JSONField(read_only=True)
 
     class Meta:
         model = HotelImages
-        fields = ["id", "url"]
+        fields = ["id", "url", "variants"]
 
     def get_url(self, obj):
         return obj.image.url if obj.image else None
@@ -51,17 +65,74 @@ class HotelsListingSerializer(serializers.ModelSerializer):
     location = LocationSerializer()
     rooms = RoomSerializer(many=True)  # ✅ allow nested input
     host = serializers.SerializerMethodField(read_only=True)
-    reviews = ReviewSerializer(many=True, read_only=True)
+    review_summary = serializers.SerializerMethodField(read_only=True)
     class Meta:
         model = HotelsListing
         fields = [
             "id", "title", "description", "multiple_rooms",
             "rooms", "location", "address",
-            "price_per_night", "offersOrExtras","reviews",
+            "price_per_night", "offersOrExtras","review_summary",
             "created_at", "updated_at",
             "host", "images"
         ]
-        read_only_fields = ["created_at", "updated_at", "host", "images"]
+        read_only_fields = ["created_at", "updated_at", "host", "images", "review_summary"]
+
+    # What each output field needs from the database: (columns, select_related, prefetch_related)
+    field_plan = {
+        "id": ((), (), ()),
+        "title": (("title",), (), ()),
+        "description": (("description",), (), ()),
+        "multiple_rooms": (("multiple_rooms",), (), ()),
+        "rooms": ((), (), ("rooms",)),
+        "location": (("location",), ("location",), ()),
+        "address": (("address",), (), ()),
+        "price_per_night": (("price_per_night",), (), ()),
+        "offersOrExtras": (("offersOrExtras",), (), ()),
+        "review_summary": (("review_stats",), ("review_stats",), ()),
+        "created_at": (("created_at",), (), ()),
+        "updated_at": (("updated_at",), (), ()),
+        "host": (
+            ("host_id__id", "host_id__username", "host_id__email", "host_id__role"),
+            ("host_id",),
+            (),
+        ),
+        "images": ((), (), ("images",)),
+        "reviews": ((), (), (Prefetch("reviews", queryset=Review.objects.select_related("user")),)),
+    }
+    expandable_fields = ("reviews",)
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if "reviews" in {*expand, *(fields or ())} and "reviews" not in self.fields:
+            self.fields["reviews"] = ReviewSerializer(many=True, read_only=True)
+        if fields:
+            for name in set(self.fields) - set(fields) - set(expand):
+                self.fields.pop(name)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=()):
+        """
+        Load only what the (possibly sparse) field set will read: deferred columns
+        and skipped joins/prefetches for every field that isn't rendered.
+        """
+        names = [name for name in (fields or cls.Meta.fields) if name in cls.field_plan]
+        names += [name for name in expand if name in cls.expandable_fields]
+        # a name can come twice (the detail fields already hold "reviews"); a Prefetch must not
+        names = list(dict.fromkeys(names))
+        columns, joins, prefetches = ["id"], [], []
+        for name in names:
+            plan_columns, plan_joins, plan_prefetches = cls.field_plan[name]
+            columns += plan_columns
+            joins += plan_joins
+            prefetches += plan_prefetches
+        return (
+            queryset.select_related(None).prefetch_related(None)
+            .select_related(*joins).prefetch_related(*prefetches)
+            .only(*columns)
+        )
+
+    def get_review_summary(self, obj):
+        return review_stats.summary(obj)
 
     def get_host(self, obj):
         host = getattr(obj, "host_id", None)
@@ -86,22 +157,16 @@ class HotelsListingSerializer(serializers.ModelSerializer):
 
         hotel = HotelsListing.objects.create(location=location, **validated_data)
 
-        # ✅ handle rooms (create each)
-        for room_data in rooms_data:
-            if isinstance(room_data, dict):
-                room_obj = RoomList.objects.create(**room_data)
-                hotel.rooms.add(room_obj)
-            elif isinstance(room_data, int):
-                try:
-                    room_obj = RoomList.objects.get(pk=room_data)
-                    hotel.rooms.add(room_obj)
-                except RoomList.DoesNotExist:
-                    return serializers.ValidationError("Those Rooms are not available.")
+        # ✅ handle rooms (new rows in one insert)
+        rooms = RoomList.objects.bulk_create([
+            RoomList(**{k: v for k, v in room_data.items() if k != "id"}) for room_data in rooms_data
+        ])
+        hotel.rooms.add(*rooms)
 
         return hotel
 
     def update(self, instance, validated_data):
-        rooms_data = validated_data.pop("rooms", [{"bedroom":2,"bathroom":2,"beds":4 , "guest":4}])
+        rooms_data = validated_data.pop("rooms", None)
         location_data = validated_data.pop("location", None)
 
         # ✅ update location
@@ -118,21 +183,170 @@ class HotelsListingSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        # ✅ update rooms
-        if rooms_data:
-            instance.rooms.clear()
-            for room_data in rooms_data:
-                if isinstance(room_data, dict):
-                    room_obj = RoomList.objects.create(**room_data)
-                    instance.rooms.add(room_obj)
-                elif isinstance(room_data, int):
-                    try:
-                        room_obj = RoomList.objects.get(pk=room_data)
-                        instance.rooms.add(room_obj)
-                    except RoomList.DoesNotExist:
-                        return serializers.ValidationError("Those Room's are not available.")
-
-        instance.save()
+        # ✅ update rooms, only when they were sent
+        with transaction.atomic():
+            if rooms_data is not None:
+                self.update_rooms(instance, rooms_data)
+            instance.save()
         return instance
 
+    def update_rooms(self, instance, rooms_data):
+        """
+        Make the listing's rooms match `rooms_data`: entries with the id of one of
+        its rooms edit that room in place, entries without an id are new rooms,
+        and rooms left out are detached (and deleted once no listing uses them).
+        """
+        existing = {room.id: room for room in instance.rooms.all()}
+        unknown = [data["id"] for data in rooms_data if "id" in data and data["id"] not in existing]
+        if unknown:
+            raise serializers.ValidationError({"rooms": f"Rooms {unknown} do not belong to this listing."})
+
+        changed, changed_fields, new_rooms, kept = [], set(), [], set()
+        for data in rooms_data:
+            data = dict(data)
+            room_id = data.pop("id", None)
+            if room_id is None:
+                new_rooms.append(RoomList(**data))
+                continue
+            room = existing[room_id]
+            kept.add(room_id)
+            fields = {field for field, value in data.items() if getattr(room, field) != value}
+            if fields:
+                for field in fields:
+                    setattr(room, field, data[field])
+                changed.append(room)
+                changed_fields |= fields
+
+        if changed:
+            RoomList.objects.bulk_update(changed, sorted(changed_fields))
+            # bulk_update sends no signals; other listings sharing these rooms need a bump too
+            response_cache.bump_listings(
+                HotelsListing.rooms.through.objects.filter(roomlist_id__in=[room.id for room in changed])
+                .values_list("hotelslisting_id", flat=True)
+            )
+        if new_rooms:
+            instance.rooms.add(*RoomList.objects.bulk_create(new_rooms))
+        removed = set(existing) - kept
+        if removed:
+            instance.rooms.remove(*removed)
+            RoomList.objects.filter(pk__in=removed, hotels__isnull=True).delete()
+
+
+
+
+class ListingCardSerializer(serializers.ModelSerializer):
+    """Compact projection for search results, map pins and admin tables."""
+    city = serializers.CharField(source="location.city", read_only=True)
+    lat = serializers.FloatField(source="location.lat", read_only=True)
+    lon = serializers.FloatField(source="location.lon", read_only=True)
+    image = serializers.SerializerMethodField()
+    rating = serializers.SerializerMethodField()
+    review_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = HotelsListing
+        fields = ["id", "title", "price_per_night", "city", "lat", "lon", "image", "rating", "review_count"]
+        read_only_fields = fields
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=()):
+        first_image = Prefetch("images", queryset=HotelImages.objects.order_by("id")[:1], to_attr="card_images")
+        return (
+            queryset.select_related(None).prefetch_related(None)
+            .select_related("location", "review_stats")
+            .prefetch_related(first_image)
+            .only("id", "title", "price_per_night", "location__city", "location__lat", "location__lon", "review_stats")
+        )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, "distance_km"):
+            data["distance_km"] = instance.distance_km
+        return data
+
+    def get_image(self, obj):
+        images = getattr(obj, "card_images", None)
+        if images is None:
+            images = obj.images.order_by("id")[:1]
+        if not images:
+            return None
+        card = images[0].variants.get("card")
+        if card:
+            return card["jpeg"]
+        return images[0].image.url if images[0].image else None
+
+    def get_rating(self, obj):
+        return review_stats.summary(obj)["rating"]
+
+    def get_review_count(self, obj):
+        return review_stats.summary(obj)["count"]
+
+
+class HotelsListingDetailSerializer(HotelsListingSerializer):
+    # Full reviews only on the single-listing view; lists carry review_summary.
+    reviews = ReviewSerializer(many=True, read_only=True)
+
+    class Meta(HotelsListingSerializer.Meta):
+        fields = HotelsListingSerializer.Meta.fields + ["reviews"]
+
+
+class CommaListField(serializers.ListField):
+    """A query-param list, repeated and/or comma-separated: ?amenities=wifi,pool."""
+
+    def get_value(self, dictionary):
+        if self.field_name not in dictionary:
+            return serializers.empty
+        values = dictionary.getlist(self.field_name) if hasattr(dictionary, "getlist") else dictionary[self.field_name]
+        if isinstance(values, str):
+            values = [values]
+        return [item.strip() for value in values for item in str(value).split(",") if item.strip()]
+
+
+class AmenityQuerySerializer(serializers.Serializer):
+    amenities = CommaListField(child=serializers.CharField(max_length=50), required=False, max_length=20)
+    amenities_any = CommaListField(child=serializers.CharField(max_length=50), required=False, max_length=20)
+
+
+class ListingSearchQuerySerializer(AmenityQuerySerializer):
+    q = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    city = serializers.CharField(required=False, allow_blank=True)
+    state = serializers.CharField(required=False, allow_blank=True)
+    country = serializers.CharField(required=False, allow_blank=True)
+    check_in = serializers.DateField(required=False)
+    check_out = serializers.DateField(required=False)
+    guests = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        check_in = attrs.get("check_in")
+        check_out = attrs.get("check_out")
+        if bool(check_in) != bool(check_out):
+            raise serializers.ValidationError("check_in and check_out must be sent together.")
+        if check_in and check_in >= check_out:
+            raise serializers.ValidationError("check_out must be after check_in.")
+        return attrs
+
+
+class NearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(required=False, default=10, min_value=0.1, max_value=200)
+
+
+class BoundsQuerySerializer(serializers.Serializer):
+    south = serializers.FloatField(min_value=-90, max_value=90)
+    west = serializers.FloatField(min_value=-180, max_value=180)
+    north = serializers.FloatField(min_value=-90, max_value=90)
+    east = serializers.FloatField(min_value=-180, max_value=180)
+
+    def validate(self, attrs):
+        if attrs["south"] > attrs["north"]:
+            raise serializers.ValidationError("south must not be greater than north.")
+        return attrs
+
+
+class NearbyListingSerializer(HotelsListingSerializer):
+    distance_km = serializers.FloatField(read_only=True)
+    field_plan = {**HotelsListingSerializer.field_plan, "distance_km": ((), (), ())}
 
+    class Meta(HotelsListingSerializer.Meta):
+        fields = HotelsListingSerializer.Meta.fields + ["distance_km"]
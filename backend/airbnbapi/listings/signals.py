@@ -0,0 +1,76 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import response_cache, review_stats, text_search
+from .models import HotelImages, HotelsListing, Location, Review, RoomList
+
+
+@receiver(post_save, sender=HotelsListing)
+@receiver(post_delete, sender=HotelsListing)
+def listing_changed(sender, instance, **kwargs):
+    response_cache.bump_listings([instance.pk])
+
+
+@receiver(post_save, sender=HotelsListing)
+def listing_text_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or text_search.TEXT_FIELDS & set(update_fields):
+        text_search.update([instance.pk])
+
+
+@receiver(m2m_changed, sender=HotelsListing.rooms.through)
+def listing_rooms_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        # instance is a RoomList, pk_set holds listing ids (None on clear)
+        response_cache.bump_listings(pk_set or instance.hotels.values_list("id", flat=True))
+    else:
+        response_cache.bump_listings([instance.pk])
+
+
+@receiver(post_save, sender=RoomList)
+@receiver(pre_delete, sender=RoomList)
+def room_changed(sender, instance, **kwargs):
+    response_cache.bump_listings(instance.hotels.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=HotelImages)
+@receiver(post_delete, sender=HotelImages)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def listing_child_changed(sender, instance, **kwargs):
+    response_cache.bump_listings([instance.hotel_id])
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_contribution(sender, instance, **kwargs):
+    # the stored row, so the totals can be moved from it however the review is saved
+    old = None
+    if instance.pk is not None:
+        old = Review.objects.filter(pk=instance.pk).only("hotel_id", "rating", *review_stats.SUB_SCORES).first()
+    instance._stats_before = (old.hotel_id, review_stats.contribution(old)) if old else None
+
+
+@receiver(post_save, sender=Review)
+def keep_review_stats_in_sync(sender, instance, **kwargs):
+    after = review_stats.contribution(instance)
+    before = getattr(instance, "_stats_before", None)
+    if before is None:
+        review_stats.apply_change(instance.hotel_id, {}, after)
+    elif before[0] != instance.hotel_id:
+        review_stats.apply_change(before[0], before[1], {})
+        review_stats.apply_change(instance.hotel_id, {}, after)
+    else:
+        review_stats.apply_change(instance.hotel_id, before[1], after)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    review_stats.apply_change(instance.hotel_id, review_stats.contribution(instance), {})
+
+
+@receiver(post_save, sender=Location)
+def location_changed(sender, instance, created, **kwargs):
+    if not created:
+        listing_ids = list(HotelsListing.objects.filter(location=instance).values_list("id", flat=True))
+        response_cache.bump_listings(listing_ids)
+        text_search.update(listing_ids)
@@ -1,3 +1,763 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from airbnbapi.testing import ListingFixtureMixin, QueryBudgetMixin
+from users.models import Users
+from . import image_variants, review_stats, text_search
+from .image_storage import LocalImageStorage
+from .serializers import HotelImageSerializer
+from .models import HotelImages, HotelsListing, ListingReviewStats, Location, Review, RoomList
 
-# Create your tests here.
+
+class ResponseCacheTests(ListingFixtureMixin, TestCase):
+    """Anonymous listing reads: ETag, 304, the authenticated bypass and invalidation by writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.room = RoomList.objects.create(bedroom=1, bathroom=1, beds=1, guest=2)
+        cls.listing.rooms.add(cls.room)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def assertCached(self, url, cached=True):
+        count = self.count_queries(url)
+        self.assertEqual(count == 0, cached, f"{url}: {count} queries")
+
+    def assertInvalidates(self, write, *urls):
+        for url in urls:
+            self.count_queries(url)
+            self.assertCached(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        for url in urls:
+            self.assertCached(url, False)
+
+    def test_etag_and_not_modified(self):
+        url = f"/api/listings/{self.listing.id}/"
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertIn("Authorization", response["Vary"])
+        # the second read is answered from the cache
+        with self.assertNumQueries(0):
+            again = self.client.get(url)
+        self.assertEqual((again.content, again["ETag"]), (response.content, etag))
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+        # a change to what the response shows gives a new ETag
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.title = "Sea view villa"
+            self.listing.save(update_fields=["title"])
+        self.assertNotEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_authenticated_reads_bypass_the_cache(self):
+        self.client.get("/api/listings/")
+        self.client.force_authenticate(self.host)
+        response = self.client.get("/api/listings/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertCached("/api/listings/", False)
+
+    def test_writes_invalidate(self):
+        def save_listing():
+            self.listing.title = "Sea view villa"
+            self.listing.save()
+
+        def save_room():
+            self.room.beds = 3
+            self.room.save()
+
+        def save_location():
+            self.location.city = "North Goa"
+            self.location.save()
+
+        writes = [
+            save_listing,
+            save_room,
+            lambda: self.listing.rooms.add(RoomList.objects.create(bedroom=2, bathroom=1, beds=2, guest=4)),
+            lambda: HotelImages.objects.create(hotel=self.listing, image="listing/one"),
+            lambda: Review.objects.create(hotel=self.listing, user=self.guest, rating=5, comment="Lovely"),
+            save_location,
+        ]
+        for write in writes:
+            self.assertInvalidates(write, f"/api/listings/{self.listing.id}/", "/api/listings/", "/api/listings/search/?city=goa")
+
+    def test_bookings_invalidate_search_only(self):
+        check_in = self.next_check_in
+        search = f"/api/listings/search/?check_in={check_in}&check_out={check_in + timedelta(days=2)}"
+        detail = f"/api/listings/{self.listing.id}/"
+        self.count_queries(detail)
+        self.assertInvalidates(lambda: self.book(payment=False), search)
+        self.assertCached(detail)
+
+    def test_other_listings_keep_their_entries(self):
+        other = HotelsListing.objects.create(
+            title="Hill view", location=self.location, address="Hill road", price_per_night=800, host_id=self.host,
+        )
+        self.count_queries(f"/api/listings/{other.id}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            HotelImages.objects.create(hotel=self.listing, image="listing/two")
+        self.assertCached(f"/api/listings/{other.id}/")
+
+
+class ListingQueryBudgetTests(ListingFixtureMixin, QueryBudgetMixin, TestCase):
+    """Queries per listing and review endpoint, before and after more rows exist."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.furnish(cls.listing)
+
+    def setUp(self):
+        super().setUp()
+        self.add_rows(2)
+        # authenticated requests skip the anonymous response cache
+        self.client.force_authenticate(self.guest)
+
+    @staticmethod
+    def furnish(listing):
+        listing.rooms.add(RoomList.objects.create(guest=2), RoomList.objects.create(guest=4))
+        HotelImages.objects.create(hotel=listing, image="sample")
+
+    def add_listing(self):
+        listing = HotelsListing.objects.create(
+            title="Sea view", location=self.location, address="Beach road", host_id=self.host,
+        )
+        self.furnish(listing)
+        return listing
+
+    def add_rows(self, n=3):
+        # more listings (each with rooms and images) and more reviews on self.listing
+        for _ in range(n):
+            self.add_listing()
+            i = Users.objects.count()
+            reviewer = Users.objects.create_user(username=f"reviewer{i}", email=f"reviewer{i}@example.com", password="x")
+            Review.objects.create(hotel=self.listing, user=reviewer, rating=4, comment="Nice")
+        review_stats.rebuild([self.listing.id])
+
+    def test_listing_list(self):
+        self.assertQueryBudget(4, lambda: self.client.get("/api/listings/"), self.add_rows)
+
+    def test_listing_list_with_reviews(self):
+        self.assertQueryBudget(5, lambda: self.client.get("/api/listings/?expand=reviews"), self.add_rows)
+
+    def test_listing_detail(self):
+        self.assertQueryBudget(4, lambda: self.client.get(f"/api/listings/{self.listing.id}/"), self.add_rows)
+
+    def test_all_hotels(self):
+        self.assertQueryBudget(3, lambda: self.client.get("/api/listings/hotels/"), self.add_rows)
+
+    def test_search(self):
+        self.assertQueryBudget(4, lambda: self.client.get("/api/listings/search/?city=goa&guests=2"), self.add_rows)
+
+    def test_text_search(self):
+        self.assertQueryBudget(4, lambda: self.client.get("/api/listings/?q=sea+view"), self.add_rows)
+        self.assertQueryBudget(4, lambda: self.client.get("/api/listings/search/?q=goa&guests=2"), self.add_rows)
+
+    def test_amenity_filters(self):
+        self.assertQueryBudget(4, lambda: self.client.get("/api/listings/?amenities=wifi,pool"), self.add_rows)
+        self.assertQueryBudget(4, lambda: self.client.get("/api/listings/search/?amenities_any=wifi&guests=2"), self.add_rows)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+    def test_facets(self):
+        self.assertQueryBudget(1, lambda: self.client.get("/api/listings/facets/?q=sea&city=goa&guests=2&amenities=wifi"), self.add_rows)
+
+    def test_review_list(self):
+        self.assertQueryBudget(2, lambda: self.client.get(f"/api/listings/{self.listing.id}/reviews/"), self.add_rows)
+
+    def test_review_create(self):
+        reviewers = iter([
+            Users.objects.create_user(username=f"new{i}", email=f"new{i}@example.com", password="x") for i in range(2)
+        ])
+
+        def review():
+            self.client.force_authenticate(next(reviewers))
+            return self.client.post(f"/api/listings/{self.listing.id}/reviews/", {"rating": 5, "comment": "Great"}, format="json")
+        self.assertQueryBudget(9, review, self.add_rows, status=201)
+
+    def test_admin_listing_list(self):
+        admin = Users.objects.create_superuser(username="admin", email="admin@example.com", password="x")
+        self.client.force_authenticate(admin)
+        self.assertQueryBudget(4, lambda: self.client.get("/api/admin/listings/"), self.add_rows)
+
+
+class FastSerializerTests(ListingFixtureMixin, TestCase):
+    """The precompiled list serializers render the same bytes as the DRF ones."""
+    listing_fields = {
+        "title": "Sea view \u00e9t\u00e9", "description": "Pool", "price_per_night": 4000, "offersOrExtras": ["wifi", "pool"],
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.listing.rooms.add(RoomList.objects.create(guest=2), RoomList.objects.create(guest=4))
+        HotelImages.objects.create(hotel=cls.listing, image="sample")
+        Review.objects.create(hotel=cls.listing, user=cls.guest, rating=4, cleanliness=5)
+        nowhere = Location.objects.create(city="Nowhere", state="", country="")
+        HotelsListing.objects.create(title="Bare", location=nowhere, address="", host_id=cls.host)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.guest)
+
+    def test_same_output(self):
+        for url in (
+            "/api/listings/",
+            "/api/listings/?cursor=",
+            "/api/listings/hotels/",
+            "/api/listings/search/?city=goa&guests=2",
+            "/api/listings/nearby/?lat=15.5&lon=73.8",
+            "/api/listings/bounds/?south=15&west=73&north=16&east=74",
+        ):
+            with self.settings(FAST_READ_SERIALIZERS=True):
+                fast = self.client.get(url)
+            with self.settings(FAST_READ_SERIALIZERS=False):
+                drf = self.client.get(url)
+            self.assertEqual(fast.status_code, 200, url)
+            self.assertEqual(fast.content, drf.content, url)
+
+
+def png(width=64, height=48, color=(200, 80, 40)):
+    out = BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "PNG")
+    return out.getvalue()
+
+
+class LocalStorageMixin:
+    """Listing photos on a temporary LocalImageStorage, variants off unless a test turns them on."""
+
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        storage_settings = override_settings(
+            LISTING_IMAGE_STORAGE="listings.image_storage.LocalImageStorage",
+            LISTING_IMAGE_LOCAL_ROOT=self.dir.name,
+            LISTING_IMAGE_VARIANTS="off",
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+
+class ImageUploadTests(ListingFixtureMixin, LocalStorageMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.host)
+
+    def upload(self, *names):
+        files = [SimpleUploadedFile(name, png(), content_type="image/png") for name in names]
+        return self.client.post(f"/api/listings/{self.listing.id}/images/", {"image": files}, format="multipart")
+
+    def test_upload(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload("a.png", "b.png", "c.png")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((len(response.data["uploaded"]), response.data["failed"]), (3, []))
+        images = list(HotelImages.objects.filter(hotel=self.listing))
+        self.assertEqual(len(images), 3)
+        storage = LocalImageStorage()
+        self.assertEqual({storage.read(image.image) for image in images}, {png()})
+        # every row in one INSERT
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "listings_hotelimages"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_uploads_run_in_parallel(self):
+        threads, upload = set(), LocalImageStorage.upload
+
+        def slow(storage, file, public_id=None):
+            threads.add(threading.get_ident())
+            time.sleep(0.05)
+            return upload(storage, file, public_id)
+
+        with mock.patch.object(LocalImageStorage, "upload", slow):
+            self.assertEqual(self.upload("a.png", "b.png", "c.png", "d.png").status_code, 201)
+        self.assertGreater(len(threads), 1)
+
+    def test_failed_files_are_reported(self):
+        upload = LocalImageStorage.upload
+
+        def flaky(storage, file, public_id=None):
+            if file.name.startswith("bad"):
+                raise OSError("storage is down")
+            return upload(storage, file, public_id)
+
+        with mock.patch.object(LocalImageStorage, "upload", flaky):
+            response = self.upload("good.png", "bad.png")
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data["uploaded"]), 1)
+            self.assertEqual(response.data["failed"], [{"name": "bad.png", "error": "storage is down"}])
+
+            response = self.upload("bad1.png", "bad2.png")
+            self.assertEqual(response.status_code, 502)
+            self.assertEqual([row["name"] for row in response.data["failed"]], ["bad1.png", "bad2.png"])
+        self.assertEqual(HotelImages.objects.count(), 1)
+
+    def test_needs_files_and_the_owner(self):
+        self.assertEqual(self.client.post(f"/api/listings/{self.listing.id}/images/", {}, format="multipart").status_code, 400)
+        other = Users.objects.create_user(username="other", email="other@example.com", password="x", role="HO")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.upload("a.png").status_code, 403)
+
+    @override_settings(LISTING_IMAGE_VARIANTS="inline")
+    def test_variants_read_the_stored_original(self):
+        with mock.patch.object(LocalImageStorage, "read", wraps=LocalImageStorage().read) as read:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.upload("a.png")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(read.call_count, 1)
+        image = HotelImages.objects.get()
+        self.assertTrue(image_variants.is_complete(image.variants))
+
+
+class ImageVariantTests(ListingFixtureMixin, LocalStorageMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.storage = LocalImageStorage()
+
+    def add_image(self, data=None):
+        resource = self.storage.upload(ContentFile(data or png(2000, 1000), name="photo.png"))
+        return HotelImages.objects.create(hotel=self.listing, image=resource)
+
+    def test_render(self):
+        rendered = image_variants.render(png(2000, 1000))
+        self.assertEqual(
+            {name: (width, height) for name, (width, height, _) in rendered.items()},
+            {"thumb": (160, 80), "card": (480, 240), "gallery": (1280, 640)},
+        )
+        for _, _, encoded in rendered.values():
+            self.assertEqual({key: Image.open(BytesIO(data)).format for key, data in encoded.items()}, {"jpeg": "JPEG", "webp": "WEBP"})
+        # never scaled up
+        small = image_variants.render(png(100, 50))
+        self.assertEqual({(width, height) for width, height, _ in small.values()}, {(100, 50)})
+
+    def test_generate_once(self):
+        image = self.add_image()
+        self.assertTrue(image_variants.generate(image, storage=self.storage))
+        image.refresh_from_db()
+        self.assertTrue(image_variants.is_complete(image.variants))
+        self.assertEqual(image.variants["card"]["width"], 480)
+        self.assertEqual(len(os.listdir(os.path.join(self.dir.name, "listings"))), 1 + 6)
+
+        with mock.patch.object(LocalImageStorage, "upload") as upload:
+            self.assertFalse(image_variants.generate(image, storage=self.storage))
+        upload.assert_not_called()
+        self.assertTrue(image_variants.generate(image, storage=self.storage, force=True))
+
+    def test_serializer_variants(self):
+        image = self.add_image()
+        self.assertEqual(HotelImageSerializer(image).data["variants"], {})
+        image_variants.generate(image, storage=self.storage)
+        data = HotelImageSerializer(image).data
+        self.assertEqual(set(data["variants"]), {"thumb", "card", "gallery"})
+        self.assertEqual(data["variants"]["thumb"]["jpeg"], image.variants["thumb"]["jpeg"])
+
+    def test_backfill(self):
+        done, pending = self.add_image(), self.add_image()
+        image_variants.generate(done, storage=self.storage)
+        missing = HotelImages.objects.create(hotel=self.listing, image="listings/gone.png")
+        out, err = StringIO(), StringIO()
+        call_command("backfill_image_variants", stdout=out, stderr=err)
+        self.assertIn("Generated variants for 1 images (1 failed).", out.getvalue())
+        self.assertIn(f"Image {missing.pk}:", err.getvalue())
+        pending.refresh_from_db()
+        self.assertTrue(image_variants.is_complete(pending.variants))
+
+    def test_pending(self):
+        done, pending = self.add_image(), self.add_image()
+        image_variants.generate(done, storage=self.storage)
+        self.assertEqual(list(image_variants.pending()), [pending])
+
+
+class ImportListingsTests(TestCase):
+
+    def setUp(self):
+        self.host = Users.objects.create_user(username="host", email="host@example.com", password="x", role="HO")
+        self.goa = Location.objects.create(city="Goa", state="Goa", country="India")
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_listings", path, "--host", "host", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import(self):
+        path = self.write("listings.csv", (
+            "title,address,price_per_night,city,state,country,lat,lon,offersOrExtras,rooms\n"
+            'Sea view,Beach road,4000,Goa,Goa,India,,,wifi|pool,"[{""guest"": 2}, {""guest"": 3}]"\n'
+            'Bad row,Main road,not-a-number,Goa,Goa,India,,,,[]\n'
+            "City flat,Main road,2000,Pune,Maharashtra,India,18.5,73.85,,[]\n"
+        ))
+        out, err = self.run_import(path, "--chunk-size", "2")
+        self.assertIn("Imported 2 listings", out)
+        self.assertIn("Row 2:", err)
+
+        villa = HotelsListing.objects.get(title="Sea view")
+        # an existing location is reused, a new one gets its grid cell
+        self.assertEqual((villa.location_id, villa.offersOrExtras), (self.goa.id, ["wifi", "pool"]))
+        self.assertEqual(sorted(villa.rooms.values_list("guest", flat=True)), [2, 3])
+        pune = HotelsListing.objects.get(title="City flat").location
+        self.assertIsNotNone(pune.geo_cell)
+        self.assertEqual(Location.objects.count(), 2)
+        # text search sees the imported rows
+        self.assertEqual(list(text_search.search(HotelsListing.objects.all(), "pune").values_list("id", flat=True)), [pune.hotelslisting_set.get().id])
+
+    def test_jsonl_resume(self):
+        rows = [{"title": f"Listing {i}", "address": "Main road", "location": {"city": "Goa", "state": "Goa", "country": "India"}, "rooms": []} for i in range(5)]
+        path = self.write("listings.jsonl", "\n".join(json.dumps(row) for row in rows[:3]) + "\n")
+        self.run_import(path, "--chunk-size", "2")
+        self.assertEqual(HotelsListing.objects.count(), 3)
+
+        # the file grows; --resume picks up after the rows already imported
+        path = self.write("listings.jsonl", "\n".join(json.dumps(row) for row in rows) + "\n")
+        out, _ = self.run_import(path, "--resume")
+        self.assertIn("Resuming after row 3", out)
+        self.assertEqual(sorted(HotelsListing.objects.values_list("title", flat=True)), [f"Listing {i}" for i in range(5)])
+
+
+class RoomUpdateTests(ListingFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.small, cls.large = RoomList.objects.create(guest=2, beds=1), RoomList.objects.create(guest=4, beds=2)
+        cls.listing.rooms.add(cls.small, cls.large)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.host)
+
+    def patch(self, data):
+        return self.client.patch(f"/api/listings/{self.listing.id}/", data, format="json")
+
+    def test_rooms_diffed_by_id(self):
+        response = self.patch({"rooms": [{"id": self.small.id, "guest": 3, "beds": 1}, {"guest": 6, "beds": 3}]})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        rooms = {room.id: room for room in self.listing.rooms.all()}
+        # edited in place, added, and the one left out detached and deleted
+        self.assertEqual(rooms[self.small.id].guest, 3)
+        self.assertEqual(sorted(room.guest for room in rooms.values()), [3, 6])
+        self.assertFalse(RoomList.objects.filter(pk=self.large.id).exists())
+
+        # without "rooms" the rooms are left alone
+        self.assertEqual(self.patch({"title": "Sea view villa"}).status_code, 200)
+        self.assertEqual(set(self.listing.rooms.values_list("id", flat=True)), set(rooms))
+
+    def test_room_of_another_listing(self):
+        other = RoomList.objects.create(guest=1)
+        response = self.patch({"rooms": [{"id": other.id, "guest": 8}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(RoomList.objects.get(pk=other.id).guest, 1)
+        self.assertEqual(self.listing.rooms.count(), 2)
+
+    def test_gc_rooms(self):
+        RoomList.objects.bulk_create([RoomList(guest=1) for _ in range(5)])
+        out = StringIO()
+        call_command("gc_rooms", "--dry-run", stdout=out)
+        self.assertIn("5 orphaned rooms", out.getvalue())
+
+        call_command("gc_rooms", "--batch-size", "2", stdout=StringIO())
+        self.assertEqual(set(RoomList.objects.values_list("id", flat=True)), {self.small.id, self.large.id})
+
+
+class ProjectionTests(ListingFixtureMixin, TestCase):
+    listing_fields = {"price_per_night": 4000}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Review.objects.create(hotel=cls.listing, user=cls.guest, rating=4, comment="Nice")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.guest)
+
+    def get(self, url, status=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def test_card_view(self):
+        card = self.get("/api/listings/?view=card")["results"][0]
+        self.assertEqual(set(card), {"id", "title", "price_per_night", "city", "lat", "lon", "image", "rating", "review_count"})
+        self.assertEqual((card["city"], card["rating"], card["review_count"]), ("Goa", 4.0, 1))
+
+    def test_sparse_fields(self):
+        row = self.get("/api/listings/?fields=id,title,location")["results"][0]
+        self.assertEqual(set(row), {"id", "title", "location"})
+        self.assertEqual(row["location"]["city"], "Goa")
+        self.assertEqual(self.get(f"/api/listings/{self.listing.id}/?fields=price_per_night"), {"price_per_night": 4000})
+        row = self.get("/api/listings/nearby/?lat=15.5&lon=73.8&fields=id,distance_km")["results"][0]
+        self.assertEqual(set(row), {"id", "distance_km"})
+
+    def test_unknown_fields_are_rejected(self):
+        for url in (
+            "/api/listings/?fields=bogus",
+            f"/api/listings/{self.listing.id}/?fields=id,bogus",
+            "/api/listings/search/?fields=bogus",
+            "/api/listings/nearby/?lat=15.5&lon=73.8&fields=bogus",
+            "/api/listings/?expand=host",
+        ):
+            errors = self.get(url, status=400)
+            self.assertIn("Valid:", str(errors), url)
+
+    def test_expand_reviews(self):
+        row = self.get("/api/listings/?expand=reviews")["results"][0]
+        self.assertEqual([review["comment"] for review in row["reviews"]], ["Nice"])
+        # the detail fields already include reviews
+        detail = self.get(f"/api/listings/{self.listing.id}/?expand=reviews")
+        self.assertEqual((detail["title"], len(detail["reviews"])), ("Sea view", 1))
+        self.assertEqual(set(self.get("/api/listings/?fields=id,reviews")["results"][0]), {"id", "reviews"})
+
+
+class ReviewStatsTests(ListingFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.guests = [cls.guest, Users.objects.create_user(username="guest1", email="guest1@example.com", password="x")]
+
+    def summary(self):
+        self.listing.refresh_from_db()
+        return review_stats.summary(self.listing)
+
+    def post(self, user, **review):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(f"/api/listings/{self.listing.id}/reviews/", review, format="json")
+
+    def test_api_create_update_delete(self):
+        self.assertEqual(self.post(self.guests[0], rating=5, cleanliness=4).status_code, 201)
+        self.assertEqual(self.post(self.guests[1], rating=2).status_code, 201)
+        summary = self.summary()
+        self.assertEqual((summary["count"], summary["rating"], summary["cleanliness"]), (2, 3.5, 4.0))
+
+        # posting again updates the guest's review
+        self.post(self.guests[0], rating=3, cleanliness=2)
+        summary = self.summary()
+        self.assertEqual((summary["count"], summary["rating"], summary["cleanliness"]), (2, 2.5, 2.0))
+        self.assertEqual(summary["histogram"], {"1": 0, "2": 1, "3": 1, "4": 0, "5": 0})
+
+        client = APIClient()
+        client.force_authenticate(self.guests[1])
+        review = Review.objects.get(user=self.guests[1])
+        self.assertEqual(client.delete(f"/api/listings/{self.listing.id}/reviews/{review.id}/").status_code, 204)
+        self.assertEqual((self.summary()["count"], self.summary()["rating"]), (1, 3.0))
+
+    def test_writes_outside_the_api(self):
+        review = Review.objects.create(hotel=self.listing, user=self.guests[0], rating=4, service=5)
+        Review.objects.create(hotel=self.listing, user=self.guests[1], rating=2)
+        review.rating = 5
+        review.save()
+        self.assertEqual((self.summary()["count"], self.summary()["rating"], self.summary()["service"]), (2, 3.5, 5.0))
+
+        # a user delete cascades to their review
+        self.guests[1].delete()
+        self.assertEqual((self.summary()["count"], self.summary()["rating"]), (1, 5.0))
+        review.delete()
+        self.assertEqual(self.summary()["count"], 0)
+
+        # and a listing delete cascades cleanly through its reviews and totals
+        Review.objects.create(hotel=self.listing, user=self.guests[0], rating=4)
+        self.listing.delete()
+        self.assertFalse(ListingReviewStats.objects.exists())
+
+    def test_rebuild_command(self):
+        Review.objects.create(hotel=self.listing, user=self.guests[0], rating=4, location=3)
+        Review.objects.create(hotel=self.listing, user=self.guests[1], rating=1)
+        expected = self.summary()
+        ListingReviewStats.objects.filter(listing=self.listing).update(review_count=9, rating_sum=40)
+
+        call_command("rebuild_review_stats", self.listing.id, stdout=StringIO())
+        self.assertEqual(self.summary(), expected)
+        self.assertEqual(expected["histogram"]["4"], 1)
+
+
+class NearbyTests(TestCase):
+
+    def setUp(self):
+        self.host = Users.objects.create_user(username="host", email="host@example.com", password="x", role="HO")
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+
+    def add(self, lat, lon):
+        location = Location.objects.create(city="Somewhere", state="", country="", lat=lat, lon=lon)
+        return HotelsListing.objects.create(title="Stay", location=location, address="Main road", host_id=self.host)
+
+    def results(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_closest_first_within_radius(self):
+        near, further = self.add(15.50, 73.83), self.add(15.60, 73.83)
+        self.add(16.5, 73.83)
+        results = self.results("/api/listings/nearby/?lat=15.49&lon=73.82&radius_km=25")
+        self.assertEqual([row["id"] for row in results], [near.id, further.id])
+        self.assertLess(results[0]["distance_km"], 2)
+
+    def test_across_the_antimeridian(self):
+        listing = self.add(-17.0, 179.9)
+        results = self.results("/api/listings/nearby/?lat=-17.0&lon=-179.9&radius_km=50")
+        self.assertEqual([row["id"] for row in results], [listing.id])
+        self.assertAlmostEqual(results[0]["distance_km"], 21.3, delta=0.5)
+        results = self.results("/api/listings/bounds/?south=-18&west=179.5&north=-16&east=-179.5")
+        self.assertEqual([row["id"] for row in results], [listing.id])
+
+
+class TextSearchTests(TestCase):
+
+    def setUp(self):
+        self.host = Users.objects.create_user(username="host", email="host@example.com", password="x", role="HO")
+        self.goa = Location.objects.create(city="Goa", state="Goa", country="India")
+        mumbai = Location.objects.create(city="Mumbai", state="Maharashtra", country="India")
+        self.villa = self.add("Sea view villa", self.goa, "Private pool, steps from the beach.", price=9000)
+        self.flat = self.add("City flat", mumbai, "Quiet flat with a view of the sea.", price=3000)
+        self.hostel = self.add("Backpacker hostel", self.goa, "Dorm beds near the market.", price=800)
+        # authenticated requests skip the anonymous response cache
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+
+    def add(self, title, location, description, price):
+        return HotelsListing.objects.create(
+            title=title, location=location, description=description, address="Main road", price_per_night=price, host_id=self.host,
+        )
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"] if isinstance(response.json(), dict) else response.json()
+        return [row["id"] for row in results]
+
+    def test_ranked_across_fields(self):
+        # a title match outranks the same words in a description
+        self.assertEqual(self.ids("/api/listings/?q=sea+view"), [self.villa.id, self.flat.id])
+        # stemming, and the location name counts
+        self.assertEqual(self.ids("/api/listings/?q=villas"), [self.villa.id])
+        self.assertEqual(self.ids("/api/listings/?q=goa+-hostel"), [self.villa.id])
+        self.assertEqual(self.ids("/api/listings/?q=maharashtra"), [self.flat.id])
+
+    def test_combines_with_filters_and_pagination(self):
+        self.assertEqual(self.ids("/api/listings/?q=sea&price_per_night=3000"), [self.flat.id])
+        self.assertEqual(self.ids("/api/listings/?q=sea+view&limit=1&offset=1"), [self.flat.id])
+        self.assertEqual(self.ids("/api/listings/?q=view&cursor="), [self.villa.id, self.flat.id])
+        # equal text rank falls back to search's usual order: rating, then cheaper first
+        self.assertEqual(self.ids("/api/listings/search/?q=goa&city=goa"), [self.hostel.id, self.villa.id])
+
+    def test_vector_follows_edits(self):
+        self.hostel.title = "Boutique villa"
+        self.hostel.save(update_fields=["title"])
+        self.assertEqual(set(self.ids("/api/listings/?q=villa")), {self.villa.id, self.hostel.id})
+
+        self.goa.city = "Panaji"
+        self.goa.save()
+        self.assertEqual(set(self.ids("/api/listings/?q=panaji")), {self.villa.id, self.hostel.id})
+
+        HotelsListing.objects.update(search_vector=None)
+        self.assertEqual(self.ids("/api/listings/?q=villa"), [])
+        self.assertEqual(text_search.rebuild(batch_size=2), 3)
+        self.assertEqual(len(self.ids("/api/listings/?q=villa")), 2)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class FacetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        host = Users.objects.create_user(username="host", email="host@example.com", password="x", role="HO")
+        goa = Location.objects.create(city="Goa", state="Goa", country="India")
+        mumbai = Location.objects.create(city="Mumbai", state="Maharashtra", country="India")
+        rows = [
+            ("Beach villa", goa, 9000, ["wifi", "pool", "sea view"]),
+            ("Pool house", goa, 2500, ["pool", "kitchen"]),
+            ("City flat", mumbai, 999, ["wifi"]),
+            ("Plain room", mumbai, 25000, []),
+        ]
+        self.villa, self.house, self.flat, self.room = [
+            HotelsListing.objects.create(title=title, location=location, address="Main road", price_per_night=price, offersOrExtras=offers, host_id=host)
+            for title, location, price, offers in rows
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(host)
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"] if isinstance(response.json(), dict) else response.json()
+        return sorted(row["id"] for row in results)
+
+    def test_amenity_filters(self):
+        self.assertEqual(self.ids("/api/listings/?amenities=wifi,pool"), [self.villa.id])
+        self.assertEqual(self.ids("/api/listings/?amenities=wifi&amenities=pool"), [self.villa.id])
+        self.assertEqual(self.ids("/api/listings/?amenities_any=wifi,kitchen"), [self.villa.id, self.house.id, self.flat.id])
+        self.assertEqual(self.ids("/api/listings/search/?amenities=pool&amenities_any=kitchen,gym&city=goa"), [self.house.id])
+        # exact match, as stored
+        self.assertEqual(self.ids("/api/listings/?amenities=WiFi"), [])
+        self.assertEqual(self.client.get("/api/listings/?amenities=" + "x" * 51).status_code, 400)
+
+    def test_counts(self):
+        response = self.client.get("/api/listings/facets/")
+        self.assertEqual(response.status_code, 200)
+        facets = response.json()
+        self.assertEqual(facets["total"], 4)
+        self.assertEqual(facets["amenities"], [
+            {"value": "pool", "count": 2}, {"value": "wifi", "count": 2},
+            {"value": "kitchen", "count": 1}, {"value": "sea view", "count": 1},
+        ])
+        self.assertEqual(facets["cities"], [{"value": "Goa", "count": 2}, {"value": "Mumbai", "count": 2}])
+        self.assertEqual([bucket["count"] for bucket in facets["price_buckets"]], [1, 0, 1, 1, 0, 1])
+        self.assertEqual(facets["price_buckets"][-1], {"min": 20000, "max": None, "count": 1})
+
+    def test_counts_follow_the_search(self):
+        facets = self.client.get("/api/listings/facets/?city=goa&amenities_any=wifi,kitchen").json()
+        self.assertEqual(facets["total"], 2)
+        self.assertEqual(facets["cities"], [{"value": "Goa", "count": 2}])
+        facets = self.client.get("/api/listings/facets/?q=villa").json()
+        self.assertEqual((facets["total"], facets["cities"]), (1, [{"value": "Goa", "count": 1}]))
+        self.assertEqual(self.client.get("/api/listings/facets/?check_in=2030-01-01").status_code, 400)
+
+    def test_cached_for_everyone_until_a_write(self):
+        url = "/api/listings/facets/?city=mumbai"
+        self.assertEqual(self.client.get(url).json()["total"], 2)
+        anonymous = APIClient()
+        with self.assertNumQueries(0):
+            self.assertEqual(anonymous.get(url).json()["total"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flat.delete()
+        self.assertEqual(anonymous.get(url).json()["total"], 1)
@@ -0,0 +1,86 @@
+"""
+Ranked full-text search over listings (?q=).
+
+On Postgres each listing keeps a weighted tsvector in
+HotelsListing.search_vector, under a GIN index:
+
+    A  title
+    B  location city, state and country
+    C  description and address
+
+update() rewrites it with one UPDATE; the post_save signals call it when a
+listing's text or its location changes, and bulk writers (import_listings,
+seed_scale) call it for the rows they insert. `rebuild_search_vectors`
+refills every listing. ?q= is parsed as a web search ("sea view villa",
+"beach -hostel", "\"marine drive\"") and results are ordered by ts_rank.
+
+Other databases have no tsvector: search() falls back to requiring every
+word somewhere in the same fields (icontains), unranked.
+"""
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+from . import response_cache
+from .models import HotelsListing, Location
+
+TEXT_FIELDS = {"title", "description", "address", "location"}
+FALLBACK_FIELDS = ("title", "description", "address", "location__city", "location__state", "location__country")
+
+
+def config():
+    """Text search configuration (LISTING_SEARCH_CONFIG), e.g. "english" for stemming."""
+    return getattr(settings, "LISTING_SEARCH_CONFIG", "english")
+
+
+def is_supported():
+    return connection.vendor == "postgresql"
+
+
+def document():
+    """The weighted tsvector of a listing row, usable in UPDATE (no joins)."""
+    place = Location.objects.filter(pk=OuterRef("location_id")).annotate(
+        text=Concat("city", Value(" "), "state", Value(" "), "country"),
+    ).values("text")
+    return (
+        SearchVector("title", weight="A", config=config())
+        + SearchVector(Coalesce(Subquery(place), Value("")), weight="B", config=config())
+        + SearchVector("description", "address", weight="C", config=config())
+    )
+
+
+def update(listing_ids=None):
+    """Recompute search_vector for the given listings (all when None). Returns rows updated."""
+    if not is_supported():
+        return 0
+    listings = HotelsListing.objects.all()
+    if listing_ids is not None:
+        listings = listings.filter(pk__in=listing_ids)
+    return listings.update(search_vector=document())
+
+
+def rebuild(batch_size=1000):
+    """update() every listing, batch_size ids per UPDATE. Returns rows updated."""
+    ids = list(HotelsListing.objects.order_by("id").values_list("id", flat=True))
+    rows = sum(update(ids[start:start + batch_size]) for start in range(0, len(ids), batch_size))
+    response_cache.bump_all()
+    return rows
+
+
+def search(queryset, text):
+    """
+    Listings in `queryset` matching `text`, annotated with search_rank and
+    ordered best first (ties by id). Other filters stay as they are.
+    """
+    if is_supported():
+        query = SearchQuery(text, search_type="websearch", config=config())
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "id")
+        )
+    for word in text.split():
+        queryset = queryset.filter(Q(*[Q(**{f"{field}__icontains": word}) for field in FALLBACK_FIELDS], _connector=Q.OR))
+    return queryset.annotate(search_rank=Value(0.0)).order_by("id")
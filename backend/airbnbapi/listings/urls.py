@@ -9,9 +9,14 @@ router.register(r'', views.ReviewListCreateView)
 urlpatterns = [
     path("",views.ListingListCreateView.as_view(), name="listing-list"),
     path("hotels/",views.ListingAllHotelsView.as_view() , name="all-hotel-listing"),    
+    path("search/", views.ListingSearchView.as_view(), name="listing-search"),
+    path("facets/", views.ListingFacetsView.as_view(), name="listing-facets"),
+    path("nearby/", views.ListingNearbyView.as_view(), name="listing-nearby"),
+    path("bounds/", views.ListingBoundsView.as_view(), name="listing-bounds"),
     path("<int:pk>/", views.ListingDetailView.as_view(), name="listing-detail"),
     path("<int:pk>/images/", views.ListingImageUploadView.as_view(), name="listing-image-upload"),
-    path("<int:pk>/reviews/",  include(router.urls)),
+    # hotel_pk, not pk: the router's detail route adds its own pk (the review id)
+    path("<int:hotel_pk>/reviews/",  include(router.urls)),
     
 
 ]
@@ -1,28 +1,98 @@
 from rest_framework import generics, status , permissions ,viewsets
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework_simplejwt import authentication
+from airbnbapi.authentication import CachedJWTAuthentication
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Exists, F, FloatField, IntegerField, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import HotelsListing, HotelImages , Review
-from .serializers import HotelsListingSerializer, HotelImageSerializer , ReviewSerializer
+from bookings.availability import full_nights
+from .models import HotelsListing, HotelImages , Review, RoomList
+from .serializers import (
+    HotelsListingSerializer, HotelsListingDetailSerializer, ListingCardSerializer, HotelImageSerializer , ReviewSerializer, ListingSearchQuerySerializer,
+    NearbyQuerySerializer, BoundsQuerySerializer, NearbyListingSerializer, AmenityQuerySerializer,
+)
+from . import facets, geo, image_storage, image_variants, response_cache, text_search
+from .response_cache import ALL_LISTINGS, AVAILABILITY, CachedReadMixin, listing_scope
 from .permissions import IsHostOrReadOnly, IsListingOwner
+from airbnbapi.fast_serializers import FastListMixin
+from airbnbapi.metrics import SerializeTimingMixin
+from airbnbapi.pagination import KeysetPagination
+from .fast_serializers import FastListingSerializer, FastNearbyListingSerializer
 
 
 
 
 
-class ListingAllHotelsView(generics.ListAPIView):
+class ListingProjectionMixin:
+    """
+    Read projections for listing endpoints: `?view=card` for the compact card,
+    `?fields=a,b` for a sparse field set and `?expand=reviews` for nested reviews.
+    The projection is applied to the queryset too, so fields that aren't rendered
+    cost no columns, joins or prefetches.
+    """
+
+    def is_projected_read(self):
+        return self.request is not None and self.request.method == "GET"
+
+    def get_projection(self):
+        """(view, fields, expand) from the query string; unknown names are a 400."""
+        params = self.request.query_params
+        fields = [name for name in params.get("fields", "").split(",") if name]
+        expand = [name for name in params.get("expand", "").split(",") if name]
+        serializer_class = super().get_serializer_class()
+        if params.get("view") != "card" and issubclass(serializer_class, HotelsListingSerializer):
+            for param, names, valid in (
+                ("fields", fields, serializer_class.field_plan),
+                ("expand", expand, serializer_class.expandable_fields),
+            ):
+                unknown = [name for name in names if name not in valid]
+                if unknown:
+                    raise ValidationError({param: [f"Unknown: {', '.join(unknown)}. Valid: {', '.join(valid)}."]})
+        return params.get("view"), fields, expand
+
+    def get_serializer_class(self):
+        if self.is_projected_read() and self.get_projection()[0] == "card":
+            return ListingCardSerializer
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        if self.is_projected_read() and issubclass(self.get_serializer_class(), HotelsListingSerializer):
+            _, fields, expand = self.get_projection()
+            kwargs.setdefault("fields", fields)
+            kwargs.setdefault("expand", expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if self.is_projected_read() and hasattr(serializer_class, "setup_eager_loading"):
+            _, fields, expand = self.get_projection()
+            queryset = serializer_class.setup_eager_loading(queryset, fields=fields, expand=expand)
+        return queryset
+
+
+class AllHotelsPagination(KeysetPagination):
+    # without ?cursor= this endpoint keeps returning a bare list
+    fallback_class = None
+
+
+class ListingAllHotelsView(CachedReadMixin, FastListMixin, ListingProjectionMixin, SerializeTimingMixin, generics.ListAPIView):
     serializer_class = HotelsListingSerializer
-    authentication_classes = [authentication.JWTAuthentication]
+    fast_serializer_class = FastListingSerializer
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsHostOrReadOnly]
-    pagination_class = None  
+    pagination_class = AllHotelsPagination
+    keyset_ordering = ("id",)
 
     def get_queryset(self):
         
         queryset = (
-            HotelsListing.objects.select_related("location", "host_id")
+            HotelsListing.objects.select_related("location", "host_id", "review_stats")
             .prefetch_related("rooms", "images")
             .order_by("id")
         )
@@ -31,18 +101,152 @@ class ListingAllHotelsView(generics.ListAPIView):
         if role == 'host' and self.request.user.is_authenticated:
             queryset = queryset.filter(host_id=self.request.user)
             
-            
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.paginator.wants_keyset(self.request):
+            return queryset
         return queryset[:500]
     
     
 
-class ListingListCreateView(generics.ListCreateAPIView):
-    queryset = HotelsListing.objects.select_related("location", "host_id").prefetch_related("rooms", "images")
+def listing_queryset():
+    return HotelsListing.objects.select_related("location", "host_id", "review_stats").prefetch_related("rooms", "images")
+
+
+def search_listings(queryset, search):
+    """
+    Apply validated ListingSearchQuerySerializer filters (place, dates, guests,
+    amenities, q) to `queryset`; shared by the search and facets endpoints.
+    """
+    for field in ("city", "state", "country"):
+        if search.get(field):
+            queryset = queryset.filter(**{f"location__{field}__iexact": search[field]})
+
+    if search.get("check_in"):
+        # Anti-join on the (listing, night) inventory index: drop listings with any full night
+        full = full_nights(search["check_in"], search["check_out"])
+        queryset = queryset.exclude(Exists(full.filter(listing=OuterRef("pk"))))
+
+    if search.get("guests"):
+        capacity = (
+            RoomList.objects.filter(hotels=OuterRef("pk"))
+            .values("hotels")
+            .annotate(total=Sum("guest"))
+            .values("total")
+        )
+        queryset = queryset.annotate(
+            capacity=Coalesce(Subquery(capacity, output_field=IntegerField()), 0)
+        ).filter(capacity__gte=search["guests"])
+
+    queryset = facets.filter_amenities(queryset, search.get("amenities"), search.get("amenities_any"))
+    if search.get("q"):
+        queryset = text_search.search(queryset, search["q"])
+    return queryset
+
+
+class ListingSearchView(CachedReadMixin, FastListMixin, ListingProjectionMixin, SerializeTimingMixin, generics.ListAPIView):
+    """
+    Availability search: filters by place, dates, guest count and amenities in
+    the database and returns a paginated list ranked by review score.
+    """
+    serializer_class = HotelsListingSerializer
+    fast_serializer_class = FastListingSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_scopes = (ALL_LISTINGS, AVAILABILITY)
+
+    def get_queryset(self):
+        params = ListingSearchQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        search = params.validated_data
+
+        queryset = search_listings(listing_queryset(), search)
+        ordering = [F("avg_rating").desc(nulls_last=True), "price_per_night", "id"]
+        if search.get("q"):
+            # best text match first, then the usual ranking
+            ordering.insert(0, F("search_rank").desc())
+
+        avg_rating = Cast("review_stats__rating_sum", FloatField()) / NullIf("review_stats__review_count", 0)
+        return queryset.annotate(avg_rating=avg_rating).order_by(*ordering)
+
+
+class ListingFacetsView(CachedReadMixin, generics.ListAPIView):
+    """
+    Filter-sidebar counts for a search: takes the /search/ parameters and
+    returns the total plus counts per amenity, city and price bucket, from a
+    single query (listings.facets). Cached for everyone, briefly.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+    cache_scopes = (ALL_LISTINGS, AVAILABILITY)
+    cache_shared = True
+
+    def get_cache_timeout(self):
+        return getattr(settings, "LISTING_FACETS_CACHE_TIMEOUT", 60)
+
+    def get_queryset(self):
+        params = ListingSearchQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return search_listings(HotelsListing.objects.all(), params.validated_data)
+
+    def list(self, request, *args, **kwargs):
+        return Response(facets.counts(self.get_queryset()))
+
+
+class ListingNearbyView(CachedReadMixin, FastListMixin, ListingProjectionMixin, SerializeTimingMixin, generics.ListAPIView):
+    """Listings within `radius_km` of a point, closest first."""
+    serializer_class = NearbyListingSerializer
+    fast_serializer_class = FastNearbyListingSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self):
+        params = NearbyQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        lat, lon, radius = (params.validated_data[k] for k in ("lat", "lon", "radius_km"))
+
+        queryset = geo.in_box(listing_queryset(), *geo.box_around(lat, lon, radius))
+        return (
+            queryset.annotate(distance_km=geo.distance_km(lat, lon))
+            .filter(distance_km__lte=radius)
+            .order_by("distance_km", "id")
+        )
+
+
+class ListingBoundsView(CachedReadMixin, FastListMixin, ListingProjectionMixin, SerializeTimingMixin, generics.ListAPIView):
+    """Listings inside the visible map box, closest to its centre first."""
+    serializer_class = NearbyListingSerializer
+    fast_serializer_class = FastNearbyListingSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self):
+        params = BoundsQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        south, west, north, east = (params.validated_data[k] for k in ("south", "west", "north", "east"))
+
+        width = (east - west) % 360
+        centre_lon = (west + width / 2 + 180) % 360 - 180
+        queryset = geo.in_box(listing_queryset(), south, west, north, east)
+        return queryset.annotate(
+            distance_km=geo.distance_km((south + north) / 2, centre_lon)
+        ).order_by("distance_km", "id")
+
+
+
+class ListingListCreateView(CachedReadMixin, FastListMixin, ListingProjectionMixin, SerializeTimingMixin, generics.ListCreateAPIView):
+    queryset = HotelsListing.objects.select_related("location", "host_id", "review_stats").prefetch_related("rooms", "images")
     serializer_class = HotelsListingSerializer
-    authentication_classes = [authentication.JWTAuthentication]
+    fast_serializer_class = FastListingSerializer
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly, IsHostOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["location" , "title" , "price_per_night"]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("id",)
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -50,6 +254,15 @@ class ListingListCreateView(generics.ListCreateAPIView):
         
         if role == 'host' and self.request.user.is_authenticated:
             queryset = queryset.filter(host_id=self.request.user)
+
+        params = AmenityQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        queryset = facets.filter_amenities(queryset, params.validated_data.get("amenities"), params.validated_data.get("amenities_any"))
+
+        # ?q= ranks by text match; with ?cursor= pages still follow keyset_ordering
+        text = self.request.query_params.get("q", "").strip()
+        if text:
+            queryset = text_search.search(queryset, text)
         return queryset
     
     
@@ -59,16 +272,21 @@ class ListingListCreateView(generics.ListCreateAPIView):
         
 
 
-class ListingDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = HotelsListing.objects.select_related("location", "host_id").prefetch_related("rooms", "images")
-    serializer_class = HotelsListingSerializer
-    authentication_classes = [authentication.JWTAuthentication]
+class ListingDetailView(CachedReadMixin, ListingProjectionMixin, SerializeTimingMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = HotelsListing.objects.select_related("location", "host_id", "review_stats").prefetch_related(
+        "rooms", "images", Prefetch("reviews", queryset=Review.objects.select_related("user"))
+    )
+    serializer_class = HotelsListingDetailSerializer
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly, IsHostOrReadOnly, IsListingOwner]
+
+    def get_cache_scopes(self):
+        return (listing_scope(self.kwargs["pk"]),)
     
 
 
-class ListingImageUploadView(generics.ListCreateAPIView):
-    authentication_classes = [authentication.JWTAuthentication]
+class ListingImageUploadView(SerializeTimingMixin, generics.ListCreateAPIView):
+    authentication_classes = [CachedJWTAuthentication]
     serializer_class = HotelImageSerializer
     permission_classes = [IsAuthenticated, IsHostOrReadOnly, IsListingOwner]
     parser_classes = [MultiPartParser, FormParser]
@@ -94,44 +312,58 @@ class ListingImageUploadView(generics.ListCreateAPIView):
         if not files:
             return Response({"detail": "No files found in 'image'."}, status=status.HTTP_400_BAD_REQUEST)
 
-        created = []
-        for f in files:
-            img = HotelImages.objects.create(hotel=listing, image=f)  
-            created.append(HotelImageSerializer(img).data)
+        # upload concurrently, then insert every row that made it in one query
+        results = image_storage.upload_many(files)
+        stored = [(f, resource) for f, resource, error in results if error is None]
+        images = HotelImages.objects.bulk_create([HotelImages(hotel=listing, image=resource) for _, resource in stored])
+        # resized variants are made after the response, from the stored originals
+        image_variants.schedule(images)
+        failed = [{"name": f.name, "error": error} for f, _, error in results if error is not None]
+        if images:
+            # bulk_create sends no post_save
+            response_cache.bump_listings([listing.pk])
 
-        return Response({"uploaded": created}, status=status.HTTP_201_CREATED)
+        return Response(
+            {"uploaded": HotelImageSerializer(images, many=True).data, "failed": failed},
+            status=status.HTTP_201_CREATED if images else status.HTTP_502_BAD_GATEWAY,
+        )
 
 
-class ReviewListCreateView(viewsets.ModelViewSet):
+class ReviewListCreateView(SerializeTimingMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
-    authentication_classes = [authentication.JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly] 
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
-        hotel_id = self.kwargs["pk"]
+        hotel_id = self.kwargs["hotel_pk"]
         return Review.objects.filter(hotel_id=hotel_id).select_related("user")
 
     def perform_create(self, serializer):
-        hotel_id = self.kwargs.get("pk")  # hotel id from URL
-        hotel = HotelsListing.objects.get(pk=hotel_id)
+        hotel_id = self.kwargs.get("hotel_pk")  # hotel id from URL
+        hotel = get_object_or_404(HotelsListing, pk=hotel_id)
         user = self.request.user
         
         existing_review = Review.objects.filter(hotel_id=hotel, user=user).first()
-        if existing_review:
-            # Update instead of creating a duplicate
-            serializer.instance = existing_review
+        # the Review signals move the listing's review_stats; atomic so both commit together
+        with transaction.atomic():
+            if existing_review:
+                # Update instead of creating a duplicate
+                serializer.instance = existing_review
+                serializer.save()
+            else:
+                serializer.save(user=user, hotel=hotel)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
             serializer.save()
-        else:
-            serializer.save(user=user, hotel=hotel)
 
-    
-    def retrieve(self, request, pk ):
-        review = get_object_or_404(Review, pk=pk)
-        
-        serializer = ReviewSerializer(review)
-        
-        return Response(serializer.data)
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
     
     def destroy(self, request, *args, **kwargs):
         review = self.get_object()
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from airbnbapi.authentication import user_cache
+from .models import Users
+
+
+@receiver(post_save, sender=Users)
+@receiver(post_delete, sender=Users)
+def user_changed(sender, instance, **kwargs):
+    user_cache.forget(instance.pk)
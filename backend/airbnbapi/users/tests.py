@@ -1,3 +1,122 @@
+import re
+import time
+from unittest import mock
 from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from airbnbapi.authentication import user_cache
+from rest_framework.test import APIClient
+from airbnbapi import metrics
+from airbnbapi.testing import QueryBudgetMixin
+from .models import Users
+from .serializers import UserSerializer
 
-# Create your tests here.
+
+class AdminUserQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.admin = Users.objects.create_superuser(username="admin", email="admin@example.com", password="x")
+        self.add_rows(2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_rows(self, n=3):
+        for _ in range(n):
+            i = Users.objects.count()
+            Users.objects.create_user(username=f"user{i}", email=f"user{i}@example.com", password="x")
+
+    def test_admin_user_list(self):
+        self.assertQueryBudget(2, lambda: self.client.get("/api/admin/users/"), self.add_rows)
+
+    def test_admin_user_keyset_pages(self):
+        self.add_rows(5)
+        seen, url = [], "/api/admin/users/?cursor=&page_size=3"
+        while url:
+            response, count = self.count_queries(lambda: self.client.get(url))
+            self.assertEqual(count, 1)
+            seen += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(seen, list(Users.objects.order_by("id").values_list("id", flat=True)))
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        user_cache.entries.clear()
+        self.user = Users.objects.create_user(username="guest", email="guest@example.com", password="x")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"AIRBNB {AccessToken.for_user(self.user)}")
+
+    def me(self, status=200):
+        response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_user_row_read_once(self):
+        with self.assertNumQueries(1):
+            self.me()
+        with self.assertNumQueries(0):
+            self.me()
+        with self.settings(AUTH_USER_CACHE_TTL=0), self.assertNumQueries(1):
+            self.me()
+
+    def test_saving_the_user_drops_the_entry(self):
+        self.me()
+        self.user.is_active = False
+        self.user.save()
+        self.me(status=401)
+
+    def test_deleting_the_user_drops_the_entry(self):
+        self.me()
+        self.user.delete()
+        self.me(status=401)
+
+    def test_cached_user_is_a_copy(self):
+        self.assertEqual(self.me().json()["username"], "guest")
+        user_cache.get(self.user.pk).username = "changed"
+        self.assertEqual(self.me().json()["username"], "guest")
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.admin = Users.objects.create_superuser(username="admin", email="admin@example.com", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_header(self):
+        response = self.client.get("/api/admin/users/")
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="2 queries", serialize;dur=[\d.]+, app;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+
+    def test_serializer_data_counts_as_serialize(self):
+        def slow(serializer, instance):
+            time.sleep(0.02)
+            return original(serializer, instance)
+
+        original = UserSerializer.to_representation
+        with mock.patch.object(UserSerializer, "to_representation", slow):
+            for url in ("/api/admin/users/", f"/api/admin/users/{self.admin.id}/", "/api/auth/me/"):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                serialize = float(re.search(r"serialize;dur=([\d.]+)", response["Server-Timing"]).group(1))
+                self.assertGreaterEqual(serialize, 20, url)
+
+    def test_metrics_endpoint(self):
+        for _ in range(3):
+            self.client.get("/api/admin/users/")
+        endpoints = {row["endpoint"]: row for row in self.client.get("/api/admin/metrics/").data["endpoints"]}
+        row = endpoints["GET api/admin/users/"]
+        self.assertEqual(row["requests"], 3)
+        self.assertEqual(row["queries_max"], 2)
+
+        self.assertEqual(self.client.delete("/api/admin/metrics/").status_code, 204)
+        # only the DELETE itself has been recorded since the reset
+        after = self.client.get("/api/admin/metrics/").data["endpoints"]
+        self.assertEqual([row["endpoint"] for row in after], ["DELETE api/admin/metrics/"])
+
+    def test_metrics_need_a_superuser(self):
+        self.client.force_authenticate(Users.objects.create_user(username="guest", email="guest@example.com", password="x"))
+        self.assertEqual(self.client.get("/api/admin/metrics/").status_code, 403)
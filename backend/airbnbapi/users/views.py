@@ -8,7 +8,8 @@ from .models import Users
 from .serializers import UserSerializer
 from django.contrib.auth.hashers import check_password
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt import authentication
+from airbnbapi.authentication import CachedJWTAuthentication
+from airbnbapi import metrics
 
 
 
@@ -56,11 +57,11 @@ class LoginView(APIView):
 
 
 class SelfView(APIView):
-    authentication_classes = [authentication.JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = metrics.timed(UserSerializer(request.user))
         return Response(serializer.data)
 
     def patch(self, request):